@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
 
 from app.core.deps import TenantParams, get_analytics_service
-from app.models.schemas import DocumentStats
+from app.models.schemas import DocumentStats, LLMCacheStats, OCRCacheStats, OCRModelTiming
 from app.services.analytics_service import AnalyticsService
+from app.services.document_intelligence import get_model_timings
+from app.services.llm_cache import get_llm_cache
+from app.services.ocr_cache import get_ocr_cache
 
 router = APIRouter()
 
@@ -16,3 +20,37 @@ async def get_stats(
     stats = service.get_comprehensive_stats(tenant.tenant_id)
 
     return DocumentStats(**stats)
+
+
+@router.get("/llm-cache", response_model=LLMCacheStats)
+async def get_llm_cache_stats():
+    """Get LLM response cache hits and misses across all workers"""
+    cache = get_llm_cache()
+
+    if cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="LLM cache is disabled"
+        )
+
+    return LLMCacheStats(**cache.stats())
+
+
+@router.get("/ocr-cache", response_model=OCRCacheStats)
+async def get_ocr_cache_stats():
+    """Get OCR result cache hits and misses across all workers"""
+    cache = get_ocr_cache()
+
+    if cache is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="OCR cache is disabled"
+        )
+
+    return OCRCacheStats(**cache.stats())
+
+
+@router.get("/ocr-models", response_model=List[OCRModelTiming])
+async def get_ocr_model_timings():
+    """Get Document Intelligence calls and analysis time per model across all workers"""
+    return [OCRModelTiming(**timing) for timing in get_model_timings().stats()]
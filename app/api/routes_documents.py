@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional
+from typing import List, Optional
 
 from app.core.deps import PaginationParams, TenantParams, get_document_service
 from app.models.database import DocumentStatus
 from app.models.schemas import DocumentDetail, DocumentListResponse, DocumentListItem
+from app.services.checkpoint_service import LLM_STAGES, STAGE_VERSIONS
 from app.services.document_service import DocumentService
 
 router = APIRouter()
@@ -69,10 +70,28 @@ async def delete_document(
 @router.post("/{document_id}/reprocess", status_code=status.HTTP_202_ACCEPTED)
 async def reprocess_document(
     document_id: str,
+    stages: List[str] = Query(default=[], description="Stages to re-run even if checkpointed"),
+    bypass_llm_cache: bool = Query(
+        default=False,
+        description="Re-run the LLM stages without cached responses"
+    ),
+    fresh_ocr: bool = Query(default=False, description="Re-run OCR without cached results"),
     service: DocumentService = Depends(get_document_service)
 ):
     """Trigger reprocessing of a document"""
-    document = service.reprocess_document(document_id)
+    unknown_stages = set(stages) - set(STAGE_VERSIONS)
+    if unknown_stages:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown stages: {sorted(unknown_stages)}. Valid stages: {list(STAGE_VERSIONS)}"
+        )
+
+    if bypass_llm_cache:
+        stages = sorted(set(stages) | set(LLM_STAGES))
+    if fresh_ocr:
+        stages = sorted(set(stages) | {"ocr"})
+
+    document = service.reprocess_document(document_id, stages)
 
     if not document:
         raise HTTPException(
@@ -82,6 +101,6 @@ async def reprocess_document(
 
     # Trigger background job
     from app.workers.process_documents import process_document_task
-    process_document_task.delay(document_id)
+    process_document_task.delay(document_id, bypass_llm_cache=bypass_llm_cache, fresh_ocr=fresh_ocr)
 
     return {"message": "Reprocessing triggered", "document_id": document_id}
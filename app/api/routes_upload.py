@@ -1,11 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, status
+from fastapi import (
+    APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request, status
+)
 import structlog
 
 from app.core.config import settings
 from app.core.deps import get_upload_service
-from app.models.schemas import DocumentUploadResponse
-from app.services.upload_service import UploadService, FileValidationError
-from app.workers.process_documents import process_document_task
+from app.models.database import DocumentStatus
+from app.models.schemas import (
+    DirectUploadRequest, DirectUploadResponse, DocumentUploadResponse,
+    UploadSessionRequest, UploadSessionResponse
+)
+from app.services.upload_service import UploadService, FileValidationError, UploadSessionError
+from app.workers.process_documents import enqueue_documents, process_document_task
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -15,6 +21,7 @@ router = APIRouter()
 async def upload_document(
     file: UploadFile = File(...),
     tenant_id: str = Form(default=settings.DEFAULT_TENANT_ID),
+    force_reprocess: bool = Form(default=False),
     service: UploadService = Depends(get_upload_service)
 ):
     """
@@ -22,6 +29,7 @@ async def upload_document(
 
     - **file**: Document file (PDF, image, DOCX)
     - **tenant_id**: Tenant identifier (defaults to 'demo')
+    - **force_reprocess**: Process even if an identical file was already processed
     """
     # Get file size
     file.file.seek(0, 2)  # Seek to end
@@ -35,11 +43,13 @@ async def upload_document(
             filename=file.filename,
             content_type=file.content_type or "application/octet-stream",
             file_size=file_size,
-            tenant_id=tenant_id
+            tenant_id=tenant_id,
+            force_reprocess=force_reprocess
         )
 
-        # Trigger background processing
-        process_document_task.delay(document.id)
+        # Trigger background processing (duplicates arrive already completed)
+        if document.status == DocumentStatus.UPLOADED:
+            process_document_task.delay(document.id)
 
         return DocumentUploadResponse(
             id=document.id,
@@ -61,10 +71,263 @@ async def upload_document(
         )
 
 
+@router.post(
+    "/upload/stream",
+    response_model=DocumentUploadResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def upload_document_stream(
+    request: Request,
+    filename: str = Query(..., description="Original filename"),
+    tenant_id: str = Query(default=settings.DEFAULT_TENANT_ID),
+    force_reprocess: bool = Query(default=False),
+    service: UploadService = Depends(get_upload_service)
+):
+    """
+    Upload a document as the raw request body, streamed straight to blob storage.
+
+    - **body**: Raw file bytes (Content-Type header is stored as the document type)
+    - **filename**: Original filename, used for extension validation
+    - **tenant_id**: Tenant identifier (defaults to 'demo')
+    - **force_reprocess**: Process even if an identical file was already processed
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None and not content_length.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Content-Length: {content_length!r}"
+        )
+
+    try:
+        document = await service.upload_document_stream(
+            chunks=request.stream(),
+            filename=filename,
+            content_type=request.headers.get("content-type") or "application/octet-stream",
+            tenant_id=tenant_id,
+            content_length=int(content_length) if content_length else None,
+            force_reprocess=force_reprocess
+        )
+
+        # Trigger background processing (duplicates arrive already completed)
+        if document.status == DocumentStatus.UPLOADED:
+            process_document_task.delay(document.id)
+
+        return DocumentUploadResponse(
+            id=document.id,
+            filename=document.filename,
+            status=document.status,
+            uploaded_at=document.uploaded_at
+        )
+
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error("upload_failed", error=str(e), filename=filename)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Upload failed: {str(e)}"
+        )
+
+
+@router.post(
+    "/upload/direct",
+    response_model=DirectUploadResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def create_direct_upload(
+    request: DirectUploadRequest,
+    service: UploadService = Depends(get_upload_service)
+):
+    """
+    Start a direct-to-storage upload.
+
+    Returns a short-lived, write-only URL. PUT the file there with the given headers,
+    then call the completion endpoint. File bytes never pass through the API.
+    """
+    try:
+        document, upload_url, expires_at = service.create_direct_upload(
+            filename=request.filename,
+            content_type=request.content_type,
+            file_size=request.file_size_bytes,
+            tenant_id=request.tenant_id
+        )
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return DirectUploadResponse(
+        id=document.id,
+        status=document.status,
+        upload_url=upload_url,
+        upload_headers={
+            "x-ms-blob-type": "BlockBlob",
+            "Content-Type": document.content_type
+        },
+        expires_at=expires_at
+    )
+
+
+@router.post("/upload/direct/{document_id}/complete", response_model=DocumentUploadResponse)
+async def complete_direct_upload(
+    document_id: str,
+    service: UploadService = Depends(get_upload_service)
+):
+    """
+    Finish a direct-to-storage upload: verify the blob and start processing.
+    """
+    try:
+        document, claimed = await service.complete_direct_upload(document_id)
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document {document_id} not found"
+        )
+
+    # Trigger background processing (only for the call that completed the upload;
+    # duplicates arrive already completed)
+    if claimed and document.status == DocumentStatus.UPLOADED:
+        process_document_task.delay(document.id)
+
+    return DocumentUploadResponse(
+        id=document.id,
+        filename=document.filename,
+        status=document.status,
+        uploaded_at=document.uploaded_at
+    )
+
+
+@router.post(
+    "/upload/sessions",
+    response_model=UploadSessionResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def create_upload_session(
+    request: UploadSessionRequest,
+    service: UploadService = Depends(get_upload_service)
+):
+    """
+    Start a resumable upload.
+
+    Send the file as consecutive chunks with PUT, starting at offset 0. After a failed
+    chunk, GET the session to find the offset to resume from, then finalize.
+    """
+    try:
+        session = service.create_upload_session(
+            filename=request.filename,
+            content_type=request.content_type,
+            file_size=request.file_size_bytes,
+            tenant_id=request.tenant_id
+        )
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return UploadSessionResponse.model_validate(session)
+
+
+@router.get("/upload/sessions/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    session_id: str,
+    service: UploadService = Depends(get_upload_service)
+):
+    """Get the current offset of a resumable upload"""
+    session = service.get_upload_session(session_id)
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session {session_id} not found"
+        )
+
+    return UploadSessionResponse.model_validate(session)
+
+
+@router.put("/upload/sessions/{session_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk in the file"),
+    service: UploadService = Depends(get_upload_service)
+):
+    """Upload one chunk (raw request body) of a resumable upload"""
+    try:
+        session = await service.upload_chunk(session_id, offset, await request.body())
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except UploadSessionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session {session_id} not found"
+        )
+
+    return UploadSessionResponse.model_validate(session)
+
+
+@router.post("/upload/sessions/{session_id}/finalize", response_model=DocumentUploadResponse)
+async def finalize_upload_session(
+    session_id: str,
+    service: UploadService = Depends(get_upload_service)
+):
+    """Commit a completed resumable upload and start processing"""
+    try:
+        document, created = await service.finalize_upload_session(session_id)
+    except FileValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except UploadSessionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session {session_id} not found"
+        )
+
+    # Trigger background processing (only once, finalize may be retried;
+    # duplicates arrive already completed)
+    if created and document.status == DocumentStatus.UPLOADED:
+        process_document_task.delay(document.id)
+
+    return DocumentUploadResponse(
+        id=document.id,
+        filename=document.filename,
+        status=document.status,
+        uploaded_at=document.uploaded_at
+    )
+
+
 @router.post("/batch-upload")
 async def batch_upload(
     files: list[UploadFile] = File(...),
     tenant_id: str = Form(default=settings.DEFAULT_TENANT_ID),
+    force_reprocess: bool = Form(default=False),
     service: UploadService = Depends(get_upload_service)
 ):
     """
@@ -85,11 +348,13 @@ async def batch_upload(
         ))
 
     # Upload via service
-    documents, errors = await service.batch_upload_documents(file_data, tenant_id)
+    documents, errors = await service.batch_upload_documents(file_data, tenant_id, force_reprocess)
 
     # Trigger background processing for successful uploads
-    for document in documents:
-        process_document_task.delay(document.id)
+    enqueue_documents([
+        document.id for document in documents
+        if document.status == DocumentStatus.UPLOADED
+    ])
 
     # Convert documents to response format
     results = [
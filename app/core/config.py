@@ -26,16 +26,92 @@ class Settings(BaseSettings):
     # Azure Document Intelligence
     AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT: str = ""
     AZURE_DOCUMENT_INTELLIGENCE_KEY: str = ""
+    AZURE_DOCUMENT_INTELLIGENCE_API_VERSION: str = "2023-07-31"
+    AZURE_DOCUMENT_INTELLIGENCE_MAX_CONNECTIONS: int = 100
+    AZURE_DOCUMENT_INTELLIGENCE_CONNECTION_TIMEOUT: int = 10
+    AZURE_DOCUMENT_INTELLIGENCE_READ_TIMEOUT: int = 60
+    # Seconds between result polls when the service sends no Retry-After
+    AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS: float = 1.0
+    # PDFs above this many pages (0 = never) are analyzed as concurrent page ranges
+    AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGE_THRESHOLD: int = 100
+    AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGES_PER_RANGE: int = 50
+    AZURE_DOCUMENT_INTELLIGENCE_SPLIT_MAX_CONCURRENCY: int = 8
 
     # Azure OpenAI
     AZURE_OPENAI_ENDPOINT: str = ""
     AZURE_OPENAI_API_KEY: str = ""
     AZURE_OPENAI_DEPLOYMENT_CHAT: str = "gpt-4o-mini"
     AZURE_OPENAI_API_VERSION: str = "2024-07-01-preview"
+    AZURE_OPENAI_MAX_CONNECTIONS: int = 100
+    AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AZURE_OPENAI_CONNECTION_TIMEOUT: int = 10
+    AZURE_OPENAI_READ_TIMEOUT: int = 60
+    AZURE_OPENAI_MAX_RETRIES: int = 2
+
+    # Shared quotas, enforced across all workers through Redis
+    RATE_LIMIT_ENABLED: bool = True
+    AZURE_OPENAI_REQUESTS_PER_MINUTE: int = 300
+    AZURE_OPENAI_TOKENS_PER_MINUTE: int = 50000
+    AZURE_DOCUMENT_INTELLIGENCE_REQUESTS_PER_MINUTE: int = 900
+
+    # Prompt size limits for extracted fields
+    PROMPT_TOKEN_BUDGET: int = 3000
+    PROMPT_MAX_VALUE_CHARS: int = 500
+
+    # LLM response cache (in-process LRU in front of Redis at REDIS_URL)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Local text extraction for born-digital PDFs and DOCX, before cloud OCR
+    LOCAL_EXTRACTION_ENABLED: bool = True
+    LOCAL_EXTRACTION_MIN_CONFIDENCE: float = 0.9
+    LOCAL_EXTRACTION_MIN_FIELDS: int = 3
+    # PDF pages with fewer characters are taken as scanned
+    LOCAL_EXTRACTION_MIN_CHARS_PER_PAGE: int = 100
+
+    # Two-pass OCR: the read model on the first pages picks a specialized model
+    OCR_TWO_PASS_ENABLED: bool = True
+    OCR_TWO_PASS_PAGES: int = 2
+    OCR_TWO_PASS_MIN_CONFIDENCE: float = 0.5
+
+    # Scans are shrunk before OCR; the original blob is kept
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_PREPROCESS_MIN_BYTES: int = 1024 * 1024
+    IMAGE_PREPROCESS_TARGET_DPI: int = 200
+    IMAGE_PREPROCESS_JPEG_QUALITY: int = 80
+
+    # OCR result cache (compressed, in Redis at REDIS_URL)
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    OCR_CACHE_COMPRESSION_LEVEL: int = 6
 
     # Azure Storage
     AZURE_STORAGE_CONNECTION_STRING: str = ""
     AZURE_STORAGE_CONTAINER_NAME: str = "documents"
+    AZURE_STORAGE_BLOCK_SIZE_MB: int = 4
+    AZURE_STORAGE_MAX_CONCURRENCY: int = 4
+    AZURE_STORAGE_MAX_CONNECTIONS: int = 100
+    AZURE_STORAGE_KEEPALIVE_SECONDS: int = 30
+    AZURE_STORAGE_CONNECTION_TIMEOUT: int = 10
+    AZURE_STORAGE_READ_TIMEOUT: int = 60
+    AZURE_STORAGE_SAS_EXPIRY_MINUTES: int = 15
+
+    # NER ("local" loads the model in-process, "client" uses the shared NER server)
+    NER_MODE: str = "local"
+    NER_SLIDING_WINDOW: bool = True
+    NER_WINDOW_OVERLAP_TOKENS: int = 64
+    NER_BATCH_SIZE: int = 16
+    NER_SERVER_SOCKET: str = "/tmp/docintel-ner.sock"
+    NER_SERVER_MAX_BATCH_SIZE: int = 16
+    NER_SERVER_MAX_WAIT_MS: int = 10
+    NER_CLIENT_TIMEOUT_SECONDS: float = 30
+    NER_SERVER_READY_FILE: str = "/tmp/docintel-ner-ready"
+    # NER backend for local mode: "pytorch" or "onnx" (int8-quantized, ONNX Runtime)
+    NER_BACKEND: str = "pytorch"
+    NER_ONNX_MODEL_DIR: str = "models/bert-base-NER-int8"
+    NER_ONNX_QUANTIZATION: str = "avx2"
+    NER_ONNX_THREADS: int = 0
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8501"]
@@ -43,11 +119,42 @@ class Settings(BaseSettings):
     # Multi-tenancy
     DEFAULT_TENANT_ID: str = "demo"
     MAX_FILE_SIZE_MB: int = 10
+    BATCH_UPLOAD_CONCURRENCY: int = 8
+    UPLOAD_SESSION_MAX_CHUNK_MB: int = 8
+    UPLOAD_SESSION_EXPIRY_HOURS: int = 24
     ALLOWED_FILE_EXTENSIONS: List[str] = [".pdf", ".png", ".jpg", ".jpeg", ".tiff", ".docx", ".doc"]
 
     # Worker
     CELERY_WORKER_CONCURRENCY: int = 4
+    # prefork (the default) runs one document at a time per child process, each
+    # with its own event loop; "threads" lets one process overlap several
+    # documents' Azure I/O on a single loop. prefork stays the default because
+    # the preloaded NER model is shared with the children copy-on-write
+    CELERY_WORKER_POOL: str = "prefork"
+    # Children are recycled once their resident memory passes this; it includes
+    # the shared model pages, so keep it well above the model size
+    CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB: int = 2048
+    WORKER_PRELOAD_MODELS: bool = True
+    WORKER_READY_FILE: str = "/tmp/docintel-worker-ready"
+    # Port of the worker's Prometheus exporter (0 disables it)
+    WORKER_METRICS_PORT: int = 9100
+
+    # Pipeline
+    PIPELINE_SPLIT_STAGES: bool = False
+    # Classify and summarize in one structured LLM call instead of two
+    PIPELINE_COMBINED_ANALYSIS: bool = True
+    # Skip LLM classification when the local classifier is at least this confident
+    LOCAL_CLASSIFIER_ENABLED: bool = True
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.85
+    LOCAL_CLASSIFIER_MIN_CALIBRATION_SAMPLES: int = 50
+    PIPELINE_IO_QUEUE: str = "celery"
+    PIPELINE_CPU_QUEUE: str = "celery"
     CELERY_TASK_TIME_LIMIT: int = 300
+    # Retries of throttled (429) stages, on top of the tasks' max_retries for
+    # failures; they back off exponentially from the base, up to the max
+    PIPELINE_MAX_THROTTLED_RETRIES: int = 10
+    PIPELINE_THROTTLED_RETRY_BASE_SECONDS: int = 15
+    PIPELINE_THROTTLED_RETRY_MAX_SECONDS: int = 600
 
     class Config:
         env_file = ".env"
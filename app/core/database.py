@@ -1,7 +1,9 @@
+from typing import Any, Callable
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+import asyncio
 
 engine = create_engine(
     settings.DATABASE_URL,
@@ -22,3 +24,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def run_in_thread(func: Callable[..., Any], *args) -> Any:
+    """
+    Run blocking database work in a thread, off the event loop.
+    A thread can't be abandoned, so if the caller is cancelled meanwhile the
+    work is waited for before the cancellation propagates; the caller's session
+    is then never closed while the thread still uses it.
+    """
+    work = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        await asyncio.wait([work])
+        raise
@@ -42,9 +42,10 @@ def get_document_service(db: Session = Depends(get_db)):
 
 
 def get_upload_service(db: Session = Depends(get_db)):
-    """Provide UploadService instance (Scoped)"""
+    """Provide UploadService instance (Scoped) on the shared storage client (Singleton)"""
+    from app.services.storage_service import get_storage_service
     from app.services.upload_service import UploadService
-    return UploadService(db)
+    return UploadService(db, get_storage_service())
 
 
 def get_analytics_service(db: Session = Depends(get_db)):
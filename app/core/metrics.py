@@ -0,0 +1,91 @@
+"""
+Prometheus metrics.
+
+Pipeline stage and external call latency (Document Intelligence per model,
+Azure OpenAI per deployment), retries, failures, cache lookups, documents in
+flight and HTTP route latency. The API serves them on /metrics, Celery
+workers on WORKER_METRICS_PORT (app.workers.metrics_exporter).
+
+Processes that fork (prefork workers, multi-process API servers) need
+PROMETHEUS_MULTIPROC_DIR set to an empty directory, so the metrics of every
+child process are aggregated.
+"""
+from contextlib import contextmanager
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# Azure calls take seconds, whole stages up to the task time limit
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "docintel_pipeline_stage_seconds",
+    "Time to compute a pipeline stage (checkpoint hits excluded)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+    "docintel_external_call_seconds",
+    "Duration of calls to external services, by model or deployment",
+    ["service", "target", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "docintel_cache_lookups_total",
+    "Cache lookups (llm, ocr, checkpoint) by result",
+    ["cache", "result"]
+)
+TASK_RETRIES = Counter(
+    "docintel_task_retries_total",
+    "Pipeline task retries, by reason (throttled or error)",
+    ["task", "reason"]
+)
+DOCUMENTS_FAILED = Counter(
+    "docintel_documents_failed_total",
+    "Documents marked failed after their last retry",
+    ["task"]
+)
+DOCUMENTS_IN_FLIGHT = Gauge(
+    "docintel_documents_in_flight",
+    "Documents being processed, by pipeline task",
+    ["task"],
+    multiprocess_mode="livesum"
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "docintel_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS
+)
+
+
+@contextmanager
+def observe_external_call(service: str, target: str):
+    """Time a call to an external service; outcome is "error" if it raises"""
+    start_time = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        EXTERNAL_CALL_SECONDS.labels(service, target, outcome).observe(
+            time.perf_counter() - start_time
+        )
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: all processes' metrics in multiprocess mode, else this process's"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def latest_metrics() -> bytes:
+    """Metrics in the Prometheus text format"""
+    return generate_latest(metrics_registry())
@@ -1,13 +1,17 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 import structlog
 import time
 import uuid
 
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.metrics import HTTP_REQUEST_SECONDS, latest_metrics
 from app.api import routes_documents, routes_upload, routes_analytics
+from app.services.storage_service import init_storage_service, close_storage_service
 
 # Configure logging
 logger = structlog.get_logger()
@@ -15,13 +19,23 @@ logger = structlog.get_logger()
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients live for the whole process, not per request
+    await init_storage_service()
+    yield
+    await close_storage_service()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Document Intelligence Platform",
     description="AI-powered document processing with OCR, classification, and NER",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -47,6 +61,14 @@ async def add_request_id(request: Request, call_next):
     response.headers["X-Request-ID"] = request_id
     response.headers["X-Process-Time"] = str(process_time)
 
+    # Route template, not the path, so document ids don't become label values
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code
+    ).observe(process_time)
+
     logger.info(
         "request_completed",
         method=request.method,
@@ -88,6 +110,12 @@ async def health_check():
     }
 
 
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(latest_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Include routers
 app.include_router(routes_upload.router, prefix="/api/documents", tags=["upload"])
 app.include_router(routes_documents.router, prefix="/api/documents", tags=["documents"])
@@ -7,6 +7,7 @@ import uuid
 
 
 class DocumentStatus(str, enum.Enum):
+    PENDING = "pending"
     UPLOADED = "uploaded"
     PROCESSING = "processing"
     COMPLETED = "completed"
@@ -35,10 +36,24 @@ class Document(Base):
     content_type = Column(String, nullable=False)
     file_size_bytes = Column(Integer, nullable=False)
     blob_uri = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    # Direct uploads: expiry (naive UTC) of the upload URL; completion is refused after it
+    upload_expires_at = Column(DateTime, nullable=True)
+    # Downscaled/recompressed copy of a scan that OCR analyzed instead of blob_uri
+    optimized_blob_uri = Column(String, nullable=True)
+
+    # Set when the upload reused the results of an identical, already processed document
+    duplicate_of = Column(String, nullable=True)
 
     # Processing status
     status = Column(Enum(DocumentStatus), default=DocumentStatus.UPLOADED, index=True)
     document_type = Column(Enum(DocumentType), nullable=True)
+    # "local" when the local classifier was confident enough to skip the LLM, else "llm"
+    classified_by = Column(String(16), nullable=True)
+    # "local" when the file's own text layer was used, "azure" when it went through OCR
+    extracted_by = Column(String(16), nullable=True)
+    # Type implied by the OCR model that analyzed the document, as given to the local classifier
+    ocr_document_type = Column(String(32), nullable=True)
 
     # Extracted data (JSON)
     extracted_fields = Column(JSON, nullable=True)
@@ -48,6 +63,12 @@ class Document(Base):
     # Quality metrics
     confidence_score = Column(Float, nullable=True)
     processing_time_seconds = Column(Float, nullable=True)
+    # Seconds each pipeline stage took to compute, e.g. {"ocr": 4.2, "ner": 0.3, ...}
+    stage_timings = Column(JSON, nullable=True)
+
+    # LLM usage: prompt tokens sent over llm_calls calls (cached responses count as neither)
+    llm_prompt_tokens = Column(Integer, nullable=True)
+    llm_calls = Column(Integer, nullable=True)
 
     # Error handling
     error_message = Column(Text, nullable=True)
@@ -63,9 +84,48 @@ class Document(Base):
         Index('idx_tenant_status', 'tenant_id', 'status'),
         Index('idx_tenant_type', 'tenant_id', 'document_type'),
         Index('idx_uploaded_at', 'uploaded_at'),
+        Index('idx_tenant_content_hash', 'tenant_id', 'content_hash'),
     )
 
 
+class ProcessingCheckpoint(Base):
+    """Output of one pipeline stage, reused while the stage's inputs are unchanged"""
+    __tablename__ = "processing_checkpoints"
+
+    document_id = Column(String, primary_key=True)
+    stage = Column(String, primary_key=True)
+
+    # Hash of stage version + inputs the output was computed from
+    fingerprint = Column(String(64), nullable=False)
+    output = Column(JSON, nullable=False)
+    duration_seconds = Column(Float, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class UploadSession(Base):
+    """Resumable upload in progress; chunks are staged as blocks of blob_name"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    tenant_id = Column(String, nullable=False, index=True)
+
+    # Target file
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    file_size_bytes = Column(Integer, nullable=False)
+    blob_name = Column(String, nullable=False)
+
+    # Progress
+    received_bytes = Column(Integer, default=0, nullable=False)
+    block_count = Column(Integer, default=0, nullable=False)
+    document_id = Column(String, nullable=True)
+
+    # Timestamps (naive UTC)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
 class Tenant(Base):
     __tablename__ = "tenants"
 
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from app.core.config import settings
 from app.models.database import DocumentStatus, DocumentType
 
 
@@ -15,6 +16,41 @@ class DocumentUploadResponse(BaseModel):
         from_attributes = True
 
 
+class DirectUploadRequest(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    file_size_bytes: int = Field(..., ge=0)
+    tenant_id: str = settings.DEFAULT_TENANT_ID
+
+
+class DirectUploadResponse(BaseModel):
+    id: str
+    status: DocumentStatus
+    upload_url: str
+    upload_headers: Dict[str, str]
+    expires_at: datetime
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    file_size_bytes: int = Field(..., ge=1)
+    tenant_id: str = settings.DEFAULT_TENANT_ID
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    file_size_bytes: int
+    offset: int = Field(validation_alias="received_bytes")
+    max_chunk_bytes: int = settings.UPLOAD_SESSION_MAX_CHUNK_MB * 1024 * 1024
+    expires_at: datetime
+    document_id: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
 class DocumentDetail(BaseModel):
     id: str
     tenant_id: str
@@ -28,7 +64,14 @@ class DocumentDetail(BaseModel):
     summary: Optional[str]
     confidence_score: Optional[float]
     processing_time_seconds: Optional[float]
+    stage_timings: Optional[Dict[str, float]] = None
     error_message: Optional[str]
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    classified_by: Optional[str] = None
+    extracted_by: Optional[str] = None
+    llm_prompt_tokens: Optional[int] = None
+    llm_calls: Optional[int] = None
     uploaded_at: datetime
     processed_at: Optional[datetime]
 
@@ -64,6 +107,32 @@ class DocumentStats(BaseModel):
     avg_confidence: Optional[float]
     avg_processing_time: Optional[float]
     total_storage_mb: float
+    dedup_hit_rate: Optional[float] = None
+    llm_classification_avoided_rate: Optional[float] = None
+    avg_prompt_tokens_per_call: Optional[float] = None
+    local_extraction_rate: Optional[float] = None
+    avg_local_extraction_seconds: Optional[float] = None
+    avg_azure_ocr_seconds: Optional[float] = None
+
+
+class LLMCacheStats(BaseModel):
+    memory_hits: int
+    redis_hits: int
+    misses: int
+    hit_rate: Optional[float]
+
+
+class OCRCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: Optional[float]
+
+
+class OCRModelTiming(BaseModel):
+    model_id: str
+    calls: int
+    total_seconds: float
+    avg_seconds: Optional[float]
 
 
 class TenantStats(BaseModel):
@@ -5,7 +5,7 @@ Encapsulates complex database queries for analytics.
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.models.database import Document, DocumentStatus, DocumentType
+from app.models.database import Document, DocumentStatus, DocumentType, ProcessingCheckpoint
 
 
 class AnalyticsService:
@@ -74,16 +74,86 @@ class AnalyticsService:
 
         return round(total_storage_bytes / (1024 * 1024), 2)
 
+    def get_dedup_hit_rate(self, tenant_id: str) -> float | None:
+        """Get share of hashed uploads that reused an already processed document"""
+        hashed, duplicates = self.db.query(
+            func.count(Document.id),
+            func.count(Document.duplicate_of)
+        ) \
+            .filter(Document.tenant_id == tenant_id) \
+            .filter(Document.content_hash.isnot(None)) \
+            .one()
+
+        return round(duplicates / hashed, 4) if hashed else None
+
+    def get_local_classification_rate(self, tenant_id: str) -> float | None:
+        """Get share of classified documents that didn't need an LLM classification call"""
+        classified, local = self.db.query(
+            func.count(Document.classified_by),
+            func.count(Document.id).filter(Document.classified_by == "local")
+        ) \
+            .filter(Document.tenant_id == tenant_id) \
+            .one()
+
+        return round(local / classified, 4) if classified else None
+
+    def get_average_prompt_tokens_per_call(self, tenant_id: str) -> float | None:
+        """Get average prompt size of the LLM calls made for the tenant's documents"""
+        prompt_tokens, calls = self.db.query(
+            func.sum(Document.llm_prompt_tokens),
+            func.sum(Document.llm_calls)
+        ) \
+            .filter(Document.tenant_id == tenant_id) \
+            .one()
+
+        return round(prompt_tokens / calls, 1) if calls else None
+
+    def get_local_extraction_rate(self, tenant_id: str) -> float | None:
+        """Get share of extracted documents read from their own text layer instead of cloud OCR"""
+        extracted, local = self.db.query(
+            func.count(Document.extracted_by),
+            func.count(Document.id).filter(Document.extracted_by == "local")
+        ) \
+            .filter(Document.tenant_id == tenant_id) \
+            .one()
+
+        return round(local / extracted, 4) if extracted else None
+
+    def get_average_extraction_seconds(self, tenant_id: str) -> dict[str, float]:
+        """Get average OCR stage duration by extraction path ("local", "azure")"""
+        average_seconds = func.avg(ProcessingCheckpoint.duration_seconds)
+        durations = self.db.query(Document.extracted_by, average_seconds) \
+            .join(ProcessingCheckpoint, ProcessingCheckpoint.document_id == Document.id) \
+            .filter(Document.tenant_id == tenant_id) \
+            .filter(ProcessingCheckpoint.stage == "ocr") \
+            .filter(Document.extracted_by.isnot(None)) \
+            .group_by(Document.extracted_by) \
+            .all()
+
+        return {
+            extracted_by: round(float(seconds), 3)
+            for extracted_by, seconds in durations
+            if seconds is not None
+        }
+
     def get_comprehensive_stats(self, tenant_id: str) -> dict:
         """
         Get all statistics in a single call.
         Returns a comprehensive dictionary of all metrics.
         """
+        extraction_seconds = self.get_average_extraction_seconds(tenant_id)
+
         return {
             "total_documents": self.get_total_documents(tenant_id),
             "by_status": self.get_documents_by_status(tenant_id),
             "by_type": self.get_documents_by_type(tenant_id),
             "avg_confidence": self.get_average_confidence(tenant_id),
             "avg_processing_time": self.get_average_processing_time(tenant_id),
-            "total_storage_mb": self.get_total_storage(tenant_id)
+            "total_storage_mb": self.get_total_storage(tenant_id),
+            "dedup_hit_rate": self.get_dedup_hit_rate(tenant_id),
+            "llm_classification_avoided_rate": self.get_local_classification_rate(tenant_id),
+            "avg_prompt_tokens_per_call": self.get_average_prompt_tokens_per_call(tenant_id),
+            "local_extraction_rate": self.get_local_extraction_rate(tenant_id),
+            "avg_local_extraction_seconds": extraction_seconds.get("local"),
+            "avg_azure_ocr_seconds": extraction_seconds.get("azure")
         }
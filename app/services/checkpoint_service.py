@@ -0,0 +1,130 @@
+"""
+Checkpoint service layer - persists pipeline stage outputs.
+Lets retries and reprocessing skip stages whose inputs haven't changed.
+"""
+from typing import Any, Awaitable, Callable, Optional
+from sqlalchemy.orm import Session
+import hashlib
+import json
+import structlog
+import time
+
+from app.core.database import run_in_thread
+from app.core.metrics import CACHE_LOOKUPS, PIPELINE_STAGE_SECONDS
+from app.models.database import ProcessingCheckpoint
+
+logger = structlog.get_logger()
+
+# Bump a stage's version to invalidate its existing checkpoints
+STAGE_VERSIONS = {
+    "ocr": 1,
+    "analyze": 1,
+    "classify": 1,
+    "ner": 2,
+    "summarize": 1,
+}
+
+# Stages answered by the LLM
+LLM_STAGES = ["analyze", "classify", "summarize"]
+
+
+def stage_fingerprint(stage: str, inputs: Any) -> str:
+    """Hash of a stage's version and its inputs"""
+    payload = json.dumps(
+        {"stage": stage, "version": STAGE_VERSIONS[stage], "inputs": inputs},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CheckpointService:
+    """Service for pipeline stage checkpoints"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, document_id: str, stage: str) -> Optional[ProcessingCheckpoint]:
+        """Get the latest checkpoint of a stage, valid or not"""
+        return self.db.get(ProcessingCheckpoint, (document_id, stage))
+
+    def get_output(self, document_id: str, stage: str) -> dict:
+        """Get a stage's checkpointed output; the stage must have run"""
+        checkpoint = self.get(document_id, stage)
+        if checkpoint is None:
+            raise LookupError(f"No {stage} checkpoint for document {document_id}")
+        return checkpoint.output
+
+    def save(
+        self,
+        document_id: str,
+        stage: str,
+        fingerprint: str,
+        output: dict,
+        duration_seconds: Optional[float] = None
+    ) -> ProcessingCheckpoint:
+        """Create or replace a stage's checkpoint"""
+        checkpoint = self.db.merge(ProcessingCheckpoint(
+            document_id=document_id,
+            stage=stage,
+            fingerprint=fingerprint,
+            output=output,
+            duration_seconds=duration_seconds
+        ))
+        self.db.commit()
+        return checkpoint
+
+    def durations(self, document_id: str, stages: list[str]) -> dict[str, Optional[float]]:
+        """Compute time of each stage's checkpointed output"""
+        checkpoints = self.db.query(ProcessingCheckpoint) \
+            .filter(ProcessingCheckpoint.document_id == document_id) \
+            .filter(ProcessingCheckpoint.stage.in_(stages)) \
+            .all()
+        return {checkpoint.stage: checkpoint.duration_seconds for checkpoint in checkpoints}
+
+    def invalidate(self, document_id: str, stages: Optional[list[str]] = None) -> int:
+        """
+        Delete checkpoints of the given stages (all stages if None).
+        Returns the number of checkpoints deleted.
+        """
+        query = self.db.query(ProcessingCheckpoint) \
+            .filter(ProcessingCheckpoint.document_id == document_id)
+
+        if stages is not None:
+            query = query.filter(ProcessingCheckpoint.stage.in_(stages))
+
+        deleted = query.delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+    async def run(
+        self,
+        document_id: str,
+        stage: str,
+        inputs: Any,
+        compute: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        """
+        Return the stage's checkpointed output if it was computed from the same inputs,
+        otherwise compute it and checkpoint the result.
+        Database calls run in a thread, off the event loop the stage runs on.
+        """
+        fingerprint = stage_fingerprint(stage, inputs)
+
+        checkpoint = await run_in_thread(self.get, document_id, stage)
+        if checkpoint is not None and checkpoint.fingerprint == fingerprint:
+            logger.info("stage_checkpoint_hit", document_id=document_id, stage=stage)
+            CACHE_LOOKUPS.labels("checkpoint", "hit").inc()
+            return checkpoint.output
+
+        CACHE_LOOKUPS.labels("checkpoint", "miss").inc()
+
+        start_time = time.time()
+        output = await compute()
+        duration = time.time() - start_time
+        PIPELINE_STAGE_SECONDS.labels(stage).observe(duration)
+
+        await run_in_thread(self.save, document_id, stage, fingerprint, output, duration)
+
+        logger.info("stage_completed", document_id=document_id, stage=stage, duration=duration)
+        return output
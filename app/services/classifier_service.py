@@ -0,0 +1,234 @@
+"""
+Local document classifier - decides the document type from OCR output alone.
+
+Field names (e.g. VendorName/InvoiceTotal -> invoice, MerchantName/Total ->
+receipt), keywords in field values and the Document Intelligence model used
+are scored per type. The margin of the best type over the runner-up is mapped
+to a confidence, calibrated against the types the LLM assigned to past
+documents. Above LOCAL_CLASSIFIER_THRESHOLD the pipeline skips the LLM
+classification.
+"""
+from typing import Optional
+import re
+import threading
+import structlog
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.database import Document, DocumentStatus, DocumentType
+
+logger = structlog.get_logger()
+
+# Normalized (lowercase, alphanumeric only) field names typical of each type
+FIELD_SIGNATURES = {
+    "invoice": {
+        "vendorname", "vendoraddress", "invoiceid", "invoicenumber", "invoicedate", "invoicetotal",
+        "duedate", "amountdue", "customername", "customerid", "billingaddress", "purchaseorder",
+        "previousunpaidbalance", "remittanceaddress",
+    },
+    "receipt": {
+        "merchantname", "merchantaddress", "merchantphonenumber", "transactiondate",
+        "transactiontime", "total", "subtotal", "tip", "items", "receipttype",
+    },
+    "business_card": {
+        "contactnames", "companynames", "jobtitles", "departments", "emails", "websites",
+        "mobilephones", "workphones", "faxes",
+    },
+    "identity": {
+        "documentnumber", "firstname", "lastname", "dateofbirth", "dateofexpiration", "sex",
+        "nationality", "placeofbirth", "machinereadablezone", "countryregion",
+    },
+    "bank_statement": {
+        "accountnumber", "accountholder", "statementperiod", "statementdate", "openingbalance",
+        "closingbalance", "beginningbalance", "endingbalance", "iban", "sortcode", "routingnumber",
+    },
+    "tax_form": {
+        "taxyear", "employeridentificationnumber", "ein", "ssn", "taxpayername",
+        "wagestipsothercompensation", "federalincometaxwithheld", "socialsecuritywages",
+        "filingstatus",
+    },
+    "contract": {
+        "parties", "effectivedate", "term", "terminationdate", "governinglaw", "jurisdiction",
+        "signatory", "renewalterm",
+    },
+}
+
+# Phrases in field values typical of each type
+VALUE_KEYWORDS = {
+    "invoice": ("invoice", "bill to", "amount due", "payment terms"),
+    "receipt": ("receipt", "thank you for", "change due", "cashier"),
+    "bank_statement": ("statement", "opening balance", "closing balance", "iban"),
+    "tax_form": ("w-2", "1099", "internal revenue service", "tax return"),
+    "contract": ("agreement", "hereinafter", "whereas", "governing law"),
+}
+
+# Weight of the Document Intelligence model's type, when a specialized model ran
+OCR_MODEL_WEIGHT = 5.0
+
+# Margins are bucketed by this width for calibration
+CALIBRATION_BUCKET = 0.1
+
+
+def normalize_field_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class LocalClassifier:
+    """Scores document types from OCR output without calling the LLM"""
+
+    def __init__(self):
+        # Observed accuracy per margin bucket; empty until calibrated
+        self.calibration: dict[int, float] = {}
+
+    def score(
+        self,
+        extracted_fields: dict,
+        ocr_document_type: Optional[str] = None
+    ) -> dict[str, float]:
+        """Evidence per document type"""
+        scores = {document_type: 0.0 for document_type in FIELD_SIGNATURES}
+
+        for name in extracted_fields:
+            normalized = normalize_field_name(name)
+            for document_type, signature in FIELD_SIGNATURES.items():
+                if normalized in signature:
+                    scores[document_type] += 1
+
+        values = " ".join(
+            str(field.get("value", "")) if isinstance(field, dict) else str(field)
+            for field in extracted_fields.values()
+        ).lower()
+        for document_type, keywords in VALUE_KEYWORDS.items():
+            scores[document_type] += 0.5 * sum(1 for keyword in keywords if keyword in values)
+
+        if ocr_document_type in scores:
+            scores[ocr_document_type] += OCR_MODEL_WEIGHT
+
+        return scores
+
+    def raw_confidence(self, scores: dict[str, float]) -> tuple[str, float]:
+        """Best type and its margin over the runner-up, in [0, 1)"""
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best_type, best), (_, second) = ranked[0], ranked[1]
+        # +1 smoothing: a single matching field is weak evidence
+        return best_type, (best - second) / (best + 1)
+
+    def classify(
+        self,
+        extracted_fields: dict,
+        ocr_document_type: Optional[str] = None
+    ) -> tuple[str, float]:
+        """
+        Classify a document from its fields.
+
+        Returns: (document_type, confidence); confidence is the historical accuracy
+        at this margin once calibrated
+        """
+        document_type, margin = self.raw_confidence(self.score(extracted_fields, ocr_document_type))
+        if margin <= 0:
+            return DocumentType.OTHER.value, 0.0
+
+        if self.calibration:
+            return document_type, self.calibration[self._bucket(margin)]
+        return document_type, round(margin, 3)
+
+    def classify_text(self, text: str) -> tuple[str, float]:
+        """
+        Classify a document from raw page text (e.g. a read-model pass) instead of
+        extracted fields: "Label: value" lines and short lines are taken as field
+        names, the whole text for keywords.
+
+        Returns: (document_type, raw confidence); not calibrated, calibration is for fields
+        """
+        from app.services.text_extraction import extract_key_values
+
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        fields = {line.rstrip(":"): "" for line in lines if len(line.split()) <= 4}
+        fields.update(extract_key_values(lines))
+        fields["_content"] = text
+
+        document_type, margin = self.raw_confidence(self.score(fields))
+        if margin <= 0:
+            return DocumentType.OTHER.value, 0.0
+        return document_type, round(margin, 3)
+
+    def calibrate(self, samples: list[tuple[dict, Optional[str], str]]):
+        """
+        Fit margin -> accuracy from (fields, ocr_document_type, true type) samples.
+        Accuracy is kept non-decreasing in the margin, so a larger margin never
+        means lower confidence.
+        """
+        correct: dict[int, int] = {}
+        total: dict[int, int] = {}
+        for extracted_fields, ocr_document_type, label in samples:
+            scores = self.score(extracted_fields, ocr_document_type)
+            document_type, margin = self.raw_confidence(scores)
+            if margin <= 0:
+                continue
+            bucket = self._bucket(margin)
+            total[bucket] = total.get(bucket, 0) + 1
+            correct[bucket] = correct.get(bucket, 0) + (document_type == label)
+
+        calibration = {}
+        accuracy = 0.0
+        for bucket in range(self._bucket(1.0) + 1):
+            if bucket in total:
+                accuracy = max(accuracy, correct[bucket] / total[bucket])
+            calibration[bucket] = round(accuracy, 3)
+        self.calibration = calibration
+
+    def calibrate_from_history(self, db: Session, limit: int = 5000) -> int:
+        """
+        Calibrate on recent documents classified by the LLM.
+        Returns the number of samples; calibration is skipped below
+        LOCAL_CLASSIFIER_MIN_CALIBRATION_SAMPLES.
+        """
+        documents = db.query(Document) \
+            .filter(Document.status == DocumentStatus.COMPLETED) \
+            .filter(Document.classified_by == "llm") \
+            .filter(Document.extracted_fields.isnot(None)) \
+            .order_by(Document.processed_at.desc()) \
+            .limit(limit) \
+            .all()
+
+        if len(documents) < settings.LOCAL_CLASSIFIER_MIN_CALIBRATION_SAMPLES:
+            logger.info("local_classifier_uncalibrated", samples=len(documents))
+            return len(documents)
+
+        # Scored as at classification time, OCR model type included
+        self.calibrate([
+            (document.extracted_fields, document.ocr_document_type, document.document_type.value)
+            for document in documents
+        ])
+        logger.info("local_classifier_calibrated", samples=len(documents))
+        return len(documents)
+
+    @staticmethod
+    def _bucket(margin: float) -> int:
+        return min(int(margin / CALIBRATION_BUCKET), int(1 / CALIBRATION_BUCKET) - 1)
+
+
+# Singleton instance
+_local_classifier = None
+# Pipeline stages call this from worker threads; calibrate only once
+_local_classifier_lock = threading.Lock()
+
+
+def get_local_classifier() -> LocalClassifier:
+    """Get or create the local classifier singleton, calibrated on first use"""
+    global _local_classifier
+    with _local_classifier_lock:
+        if _local_classifier is None:
+            from app.core.database import SessionLocal
+
+            classifier = LocalClassifier()
+            db = SessionLocal()
+            try:
+                classifier.calibrate_from_history(db)
+            except Exception as e:
+                logger.warning("local_classifier_calibration_failed", error=str(e))
+            finally:
+                db.close()
+            _local_classifier = classifier
+    return _local_classifier
@@ -1,27 +1,61 @@
+from typing import Optional
 from azure.core.credentials import AzureKeyCredential
-from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient
 from app.core.config import settings
+from app.core.metrics import observe_external_call
+from app.services.classifier_service import get_local_classifier
+from app.services.image_preprocessing import preprocess_image
+from app.services.ocr_cache import get_ocr_cache, ocr_cache_key
+from app.services.rate_limiter import RateLimitedTransport, get_rate_limiter
+import aiohttp
+import asyncio
+import io
+import redis
 import structlog
+import time
 
 logger = structlog.get_logger()
 
+# Text-only model, used to classify documents before the specialized pass
+READ_MODEL_ID = "prebuilt-read"
+
+TIMINGS_KEY = "ocr_model_timings"
+
 
 class DocumentIntelligenceService:
-    def __init__(self):
-        if not settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT:
+    def __init__(self, fresh: bool = False):
+        """
+        fresh skips cached OCR results (fresh results are still cached),
+        for reprocessing that must call Document Intelligence again.
+        """
+        self.client = get_document_analysis_client()
+        if not self.client:
             logger.warning("Azure Document Intelligence not configured, using mock")
-            self.client = None
-        else:
-            self.client = DocumentAnalysisClient(
-                endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
-                credential=AzureKeyCredential(settings.AZURE_DOCUMENT_INTELLIGENCE_KEY)
-            )
+        self.cache = get_ocr_cache()
+        self.fresh = fresh
 
-    async def analyze_document(self, blob_uri: str, document_type_hint: str = None):
+    async def analyze_document(
+        self,
+        blob_uri: str,
+        document_type_hint: str = None,
+        content_hash: str = None,
+        content_type: str = None,
+        page_count: Optional[int] = None
+    ):
         """
-        Analyze document using Azure Document Intelligence
+        Analyze document using Azure Document Intelligence.
+        With the content's hash, results are cached per model and API version.
+        PDFs longer than AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGE_THRESHOLD pages are
+        analyzed as concurrent page ranges and merged; page_count saves counting
+        them when the caller already knows it. Large scans are analyzed as an
+        optimized derivative (IMAGE_PREPROCESS_ENABLED), the original is kept.
 
-        Returns: Dictionary with extracted fields and confidence
+        Without a document_type_hint and with OCR_TWO_PASS_ENABLED, the first
+        pages are read with the cheap read model and classified locally to pick
+        a specialized model.
+
+        Returns: Dictionary with extracted fields, content and confidence
         """
         if not self.client:
             # Mock response for development
@@ -37,42 +71,258 @@ class DocumentIntelligenceService:
             }
 
         try:
+            # Scan derivative to analyze, created on first need:
+            # (source URI, its content type, optimized blob URI or None)
+            source = None
+
+            if document_type_hint is None and settings.OCR_TWO_PASS_ENABLED:
+                read_key = self._read_cache_key(content_hash)
+                first_pages = await self._cache_get(read_key)
+                if first_pages is None:
+                    source = await self._prepare_source(blob_uri, content_type)
+                    first_pages = await self._read_first_pages(source[0], source[1])
+                    await self._cache_set(read_key, first_pages)
+                document_type_hint = await asyncio.to_thread(
+                    self._classify_first_pages, first_pages["content"]
+                )
+
             # Choose model based on document type hint
             model_id = self._get_model_id(document_type_hint)
 
-            logger.info("analyzing_document", blob_uri=blob_uri, model=model_id)
+            key = self._cache_key(content_hash, model_id)
+            cached = await self._cache_get(key)
+            if cached is not None:
+                logger.info("ocr_cache_hit", blob_uri=blob_uri, model=model_id)
+                return cached
 
-            # Analyze document from URL
-            poller = await self.client.begin_analyze_document_from_url(
-                model_id=model_id,
-                document_url=blob_uri
+            if source is None:
+                source = await self._prepare_source(blob_uri, content_type)
+            source_uri, content_type, optimized_blob_uri = source
+            page_ranges = await self._page_ranges(source_uri, content_type, page_count)
+
+            logger.info(
+                "analyzing_document",
+                blob_uri=source_uri,
+                model=model_id,
+                page_ranges=len(page_ranges)
             )
 
-            result = await poller.result()
+            # Ranges run concurrently; gather keeps their results in page order
+            in_flight = asyncio.Semaphore(
+                settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_MAX_CONCURRENCY
+            )
 
-            # Extract fields
-            fields = {}
-            for doc in result.documents:
-                for field_name, field_value in doc.fields.items():
-                    fields[field_name] = {
-                        "value": field_value.content if hasattr(field_value, 'content') else str(field_value.value),
-                        "confidence": field_value.confidence or 0.0
-                    }
+            async def analyze(pages: Optional[str]):
+                async with in_flight:
+                    return await self._analyze(model_id, source_uri, pages)
 
-            # Calculate overall confidence
-            confidences = [f["confidence"] for f in fields.values() if f["confidence"] > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            results = await asyncio.gather(*(analyze(pages) for pages in page_ranges))
 
-            return {
-                "fields": fields,
-                "document_type": self._map_model_to_type(model_id),
-                "confidence": avg_confidence
-            }
+            analysis = self._merge(model_id, results)
+            await self._cache_set(key, analysis)
+
+            # Not cached: the derivative belongs to this document's blob, not to
+            # every document with the same content
+            if optimized_blob_uri:
+                return {**analysis, "optimized_blob_uri": optimized_blob_uri}
+            return analysis
 
         except Exception as e:
             logger.error("document_analysis_failed", error=str(e), blob_uri=blob_uri)
             raise
 
+    async def _analyze(self, model_id: str, blob_uri: str, pages: Optional[str] = None):
+        """One analysis request, of the given pages (e.g. "1-50") or the whole document"""
+        start_time = time.perf_counter()
+        with observe_external_call("document_intelligence", model_id):
+            # Polling waits on the event loop, not a thread
+            poller = await self.client.begin_analyze_document_from_url(
+                model_id=model_id,
+                document_url=blob_uri,
+                **({"pages": pages} if pages else {})
+            )
+            result = await poller.result()
+
+        elapsed = time.perf_counter() - start_time
+        await asyncio.to_thread(get_model_timings().record, model_id, elapsed)
+        return result
+
+    async def _read_first_pages(self, blob_uri: str, content_type: Optional[str]) -> dict:
+        """Text of the first OCR_TWO_PASS_PAGES pages, from the read model"""
+        # Single images have one page; only multi-page formats take a page range
+        pages = f"1-{settings.OCR_TWO_PASS_PAGES}" if content_type == "application/pdf" else None
+        result = await self._analyze(READ_MODEL_ID, blob_uri, pages)
+        return {"content": result.content or ""}
+
+    def _classify_first_pages(self, text: str) -> Optional[str]:
+        """
+        Document type read off the first pages, None unless confident enough to pick a model.
+        Blocking: the shared classifier calibrates from the database on first use.
+        """
+        document_type, confidence = get_local_classifier().classify_text(text)
+        logger.info("first_pages_classified", document_type=document_type, confidence=confidence)
+        if confidence < settings.OCR_TWO_PASS_MIN_CONFIDENCE:
+            return None
+        return document_type
+
+    async def _prepare_source(
+        self,
+        blob_uri: str,
+        content_type: Optional[str]
+    ) -> tuple[str, Optional[str], Optional[str]]:
+        """
+        What to analyze: the scan's optimized derivative if there is one, else the blob.
+        Returns: (source URI, its content type, optimized blob URI or None)
+        """
+        if settings.IMAGE_PREPROCESS_ENABLED and (content_type or "").startswith("image/"):
+            optimized = await self.optimize_image(blob_uri)
+            if optimized is not None:
+                optimized_blob_uri, content_type = optimized
+                return optimized_blob_uri, content_type, optimized_blob_uri
+        return blob_uri, content_type, None
+
+    async def cached_analysis(self, content_hash: Optional[str]) -> Optional[dict]:
+        """
+        The result analyze_document would return from the cache, found without
+        reading the blob or calling Document Intelligence; None on a miss
+        """
+        if not self.client:
+            return None
+
+        document_type_hint = None
+        if settings.OCR_TWO_PASS_ENABLED:
+            first_pages = await self._cache_get(
+                self._read_cache_key(content_hash), count_misses=False
+            )
+            if first_pages is None:
+                return None
+            document_type_hint = await asyncio.to_thread(
+                self._classify_first_pages, first_pages["content"]
+            )
+
+        key = self._cache_key(content_hash, self._get_model_id(document_type_hint))
+        return await self._cache_get(key, count_misses=False)
+
+    def _cache_key(self, content_hash: Optional[str], model_id: str) -> Optional[str]:
+        if not content_hash or self.cache is None:
+            return None
+        return ocr_cache_key(
+            content_hash, model_id, settings.AZURE_DOCUMENT_INTELLIGENCE_API_VERSION
+        )
+
+    def _read_cache_key(self, content_hash: Optional[str]) -> Optional[str]:
+        """Key of the read-model pass over the first OCR_TWO_PASS_PAGES pages"""
+        return self._cache_key(content_hash, f"{READ_MODEL_ID}:{settings.OCR_TWO_PASS_PAGES}")
+
+    async def _cache_get(self, key: Optional[str], count_misses: bool = True) -> Optional[dict]:
+        """Cached result, unless caching is off or fresh results were asked for"""
+        if key is None or self.fresh:
+            return None
+        return await asyncio.to_thread(self.cache.get, key, count_misses)
+
+    async def _cache_set(self, key: Optional[str], value: dict):
+        if key is not None:
+            await asyncio.to_thread(self.cache.set, key, value)
+
+    async def _page_ranges(
+        self,
+        blob_uri: str,
+        content_type: Optional[str],
+        page_count: Optional[int] = None
+    ) -> list[Optional[str]]:
+        """
+        Page ranges to analyze separately: [None] (the whole document) unless it's
+        a PDF above the split threshold, counted locally
+        """
+        threshold = settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGE_THRESHOLD
+        if not threshold or content_type != "application/pdf":
+            return [None]
+
+        if page_count is None:
+            page_count = await self.count_pages(blob_uri)
+        if page_count is None or page_count <= threshold:
+            return [None]
+
+        size = settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGES_PER_RANGE
+        return [
+            f"{first}-{min(first + size - 1, page_count)}"
+            for first in range(1, page_count + 1, size)
+        ]
+
+    async def count_pages(self, blob_uri: str) -> Optional[int]:
+        """Page count of a PDF blob, None if it can't be read"""
+        from app.services.storage_service import init_storage_service
+
+        storage_service = await init_storage_service()
+        if storage_service is None:
+            return None
+        try:
+            data = await storage_service.download_file(blob_uri)
+            return await asyncio.to_thread(count_pdf_pages, data)
+        except Exception as e:
+            logger.warning("page_count_failed", blob_uri=blob_uri, error=str(e))
+            return None
+
+    async def optimize_image(self, blob_uri: str) -> Optional[tuple[str, str]]:
+        """
+        Store a downscaled, recompressed derivative of a large scan next to it.
+        Returns: (derivative blob URI, content type), None if the scan is kept as is
+        """
+        from app.services.storage_service import init_storage_service
+
+        storage_service = await init_storage_service()
+        if storage_service is None:
+            return None
+        try:
+            data = await storage_service.download_file(blob_uri)
+            if len(data) < settings.IMAGE_PREPROCESS_MIN_BYTES:
+                return None
+
+            optimized = await asyncio.to_thread(preprocess_image, data)
+            if optimized is None:
+                return None
+
+            data, content_type = optimized
+            optimized_blob_uri = await storage_service.upload_derivative(
+                blob_uri, "optimized", data, content_type
+            )
+            return optimized_blob_uri, content_type
+        except Exception as e:
+            logger.warning("image_preprocessing_failed", blob_uri=blob_uri, error=str(e))
+            return None
+
+    def _merge(self, model_id: str, results: list) -> dict:
+        """
+        One analysis from per-range results, in page order. When ranges extract a
+        field with the same name, the most confident value wins, the earliest
+        range on ties, so the merge doesn't depend on which range finished first.
+        """
+        fields = {}
+        for result in results:
+            for doc in result.documents:
+                for field_name, field_value in doc.fields.items():
+                    if hasattr(field_value, 'content'):
+                        value = field_value.content
+                    else:
+                        value = str(field_value.value)
+                    field = {"value": value, "confidence": field_value.confidence or 0.0}
+                    best = fields.get(field_name)
+                    if best is None or field["confidence"] > best["confidence"]:
+                        fields[field_name] = field
+
+        # Calculate overall confidence
+        confidences = [f["confidence"] for f in fields.values() if f["confidence"] > 0]
+        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+
+        return {
+            "fields": fields,
+            "content": "\n".join(
+                result.content for result in results if getattr(result, "content", None)
+            ),
+            "document_type": self._map_model_to_type(model_id),
+            "confidence": avg_confidence
+        }
+
     def _get_model_id(self, document_type_hint: str = None) -> str:
         """Map document type to Azure prebuilt model"""
         type_to_model = {
@@ -92,3 +342,119 @@ class DocumentIntelligenceService:
             "prebuilt-idDocument": "identity",
         }
         return model_to_type.get(model_id, "other")
+
+
+class ModelTimings:
+    """Calls and analysis seconds per Document Intelligence model, shared by all workers"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    def record(self, model_id: str, seconds: float):
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.hincrby(TIMINGS_KEY, f"{model_id}:calls", 1)
+            pipeline.hincrbyfloat(TIMINGS_KEY, f"{model_id}:seconds", seconds)
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.warning("ocr_timings_redis_unavailable", error=str(e))
+
+    def stats(self) -> list[dict]:
+        """Calls, total and average seconds per model"""
+        try:
+            counters = self.redis.hgetall(TIMINGS_KEY)
+        except redis.RedisError as e:
+            logger.warning("ocr_timings_redis_unavailable", error=str(e))
+            return []
+
+        models = {}
+        for name, value in counters.items():
+            model_id, _, counter = name.decode().rpartition(":")
+            models.setdefault(model_id, {})[counter] = float(value)
+
+        return [
+            {
+                "model_id": model_id,
+                "calls": int(timing.get("calls", 0)),
+                "total_seconds": round(timing.get("seconds", 0.0), 3),
+                "avg_seconds": (
+                    round(timing.get("seconds", 0.0) / timing["calls"], 3)
+                    if timing.get("calls") else None
+                ),
+            }
+            for model_id, timing in sorted(models.items())
+        ]
+
+
+# Singleton instance
+_model_timings = None
+
+
+def get_model_timings() -> ModelTimings:
+    """Get or create the per-model timing counters"""
+    global _model_timings
+    if _model_timings is None:
+        _model_timings = ModelTimings(redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1))
+    return _model_timings
+
+
+def count_pdf_pages(data: bytes) -> int:
+    """Number of pages of a PDF"""
+    from pypdf import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+# Process-wide client. Its aiohttp session belongs to the event loop it was
+# created on, which in a worker is the process's persistent loop (app.workers.event_loop)
+_document_analysis_client = None
+
+
+def get_document_analysis_client() -> Optional[DocumentAnalysisClient]:
+    """
+    Get or create the shared Document Intelligence client; None if it isn't configured.
+    Must first be called inside the event loop that will use it.
+    """
+    global _document_analysis_client
+    if not settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT:
+        return None
+    if _document_analysis_client is None:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.AZURE_DOCUMENT_INTELLIGENCE_MAX_CONNECTIONS
+            ),
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+        # Timeouts belong to the transport: client-level ones are ignored when a transport is passed
+        transport = AioHttpTransport(
+            session=session,
+            session_owner=True,
+            connection_timeout=settings.AZURE_DOCUMENT_INTELLIGENCE_CONNECTION_TIMEOUT,
+            read_timeout=settings.AZURE_DOCUMENT_INTELLIGENCE_READ_TIMEOUT
+        )
+
+        # Analyze requests, retries included, go through the resource's shared limiter.
+        # Done at the transport: the SDK doesn't accept custom per_retry_policies
+        limiter = get_rate_limiter(
+            f"docintel:{settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT}",
+            requests_per_minute=settings.AZURE_DOCUMENT_INTELLIGENCE_REQUESTS_PER_MINUTE
+        )
+        if limiter:
+            transport = RateLimitedTransport(transport, limiter)
+
+        _document_analysis_client = DocumentAnalysisClient(
+            endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+            credential=AzureKeyCredential(settings.AZURE_DOCUMENT_INTELLIGENCE_KEY),
+            api_version=settings.AZURE_DOCUMENT_INTELLIGENCE_API_VERSION,
+            transport=transport,
+            polling_interval=settings.AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS
+        )
+    return _document_analysis_client
+
+
+async def close_document_analysis_client():
+    """Close the shared client and its connection pool"""
+    global _document_analysis_client
+    if _document_analysis_client is not None:
+        await _document_analysis_client.close()
+        _document_analysis_client = None
@@ -6,6 +6,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from app.models.database import Document, DocumentStatus
+from app.services.checkpoint_service import CheckpointService
 
 
 class DocumentService:
@@ -54,17 +55,26 @@ class DocumentService:
         # TODO: Delete from blob storage as well
         self.db.delete(document)
         self.db.commit()
+        CheckpointService(self.db).invalidate(document_id)
         return True
 
-    def reprocess_document(self, document_id: str) -> Optional[Document]:
+    def reprocess_document(
+        self,
+        document_id: str,
+        stages: Optional[list[str]] = None
+    ) -> Optional[Document]:
         """
         Reset document status and trigger reprocessing.
+        Stages with a still-valid checkpoint are skipped unless listed in stages.
         Returns the document if found, None otherwise.
         """
         document = self.get_by_id(document_id)
         if not document:
             return None
 
+        if stages:
+            CheckpointService(self.db).invalidate(document_id, stages)
+
         # Reset status for reprocessing
         document.status = DocumentStatus.UPLOADED
         document.retry_count += 1
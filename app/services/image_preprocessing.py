@@ -0,0 +1,98 @@
+"""
+Image preprocessing - shrinks scans before OCR.
+
+Phone photos and scanner output are often 20-40 MB at 300-600 DPI, far more
+than OCR needs. Before analysis, scans are auto-oriented from their EXIF
+data, downscaled to IMAGE_PREPROCESS_TARGET_DPI, converted to grayscale when
+they carry no color, and recompressed as JPEG. Multi-page TIFFs become one
+PDF. The original blob is kept; the derivative is what gets analyzed.
+"""
+from typing import Optional
+import io
+
+import structlog
+from PIL import Image, ImageOps, ImageSequence
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Page height assumed for images without scanner DPI information (A4)
+PAGE_HEIGHT_INCHES = 11.7
+
+# Lower DPI values are camera defaults (72/96), not the resolution of a scan
+MIN_SCANNER_DPI = 150
+
+# A scan is treated as black and white when fewer than COLOR_PIXEL_SHARE of its
+# pixels are saturated above COLOR_SATURATION (0-255); paper tint and lighting
+# casts stay below it, while stamps, highlights and logos don't
+COLOR_SATURATION = 64
+COLOR_PIXEL_SHARE = 0.002
+
+
+def _max_side(image: Image.Image) -> int:
+    """Longest side, in pixels, of the image at the target DPI"""
+    long_side = max(image.size)
+    dpi = image.info.get("dpi")
+    if dpi and float(dpi[0]) >= MIN_SCANNER_DPI:
+        target = long_side * settings.IMAGE_PREPROCESS_TARGET_DPI / float(dpi[0])
+    else:
+        target = PAGE_HEIGHT_INCHES * settings.IMAGE_PREPROCESS_TARGET_DPI
+    return min(long_side, round(target))
+
+
+def is_achromatic(image: Image.Image) -> bool:
+    """Whether an image has no meaningful color (colored stamps, highlights, logos keep RGB)"""
+    sample = image.convert("RGB")
+    sample.thumbnail((512, 512))
+    histogram = sample.convert("HSV").getchannel("S").histogram()
+    return sum(histogram[COLOR_SATURATION:]) < COLOR_PIXEL_SHARE * sum(histogram)
+
+
+def optimize_page(image: Image.Image) -> Image.Image:
+    """Downscaled, upright, grayscale-if-safe copy of one page"""
+    max_side = _max_side(image)
+    # For JPEGs, thumbnail decodes at reduced scale (draft mode) instead of decoding in full
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    return image.convert("L") if is_achromatic(image) else image.convert("RGB")
+
+
+def preprocess_image(data: bytes) -> Optional[tuple[bytes, str]]:
+    """
+    Optimized derivative of a scan.
+
+    Returns: (data, content type), or None if data isn't an image Pillow can
+    read or the derivative wouldn't be smaller
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.UnidentifiedImageError:
+        return None
+
+    quality = settings.IMAGE_PREPROCESS_JPEG_QUALITY
+    dpi = settings.IMAGE_PREPROCESS_TARGET_DPI
+    output = io.BytesIO()
+
+    if getattr(image, "n_frames", 1) > 1:
+        pages = [optimize_page(frame.copy()) for frame in ImageSequence.Iterator(image)]
+        pages[0].save(
+            output, "PDF", save_all=True, append_images=pages[1:], resolution=dpi, quality=quality
+        )
+        content_type = "application/pdf"
+    else:
+        page = optimize_page(image)
+        page.save(output, "JPEG", quality=quality, optimize=True, dpi=(dpi, dpi))
+        content_type = "image/jpeg"
+
+    optimized = output.getvalue()
+    if len(optimized) >= len(data):
+        return None
+
+    logger.info(
+        "image_preprocessed",
+        original_bytes=len(data),
+        optimized_bytes=len(optimized),
+        content_type=content_type
+    )
+    return optimized, content_type
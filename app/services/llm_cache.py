@@ -0,0 +1,203 @@
+"""
+LLM response cache.
+
+Documents from the same vendor template produce near-identical fields, so
+LLM responses are cached under a hash of the normalized fields, the prompt
+template version, the deployment and the temperature. Lookups go through an
+in-process LRU first, then a Redis tier shared by all workers; both expire
+entries after LLM_CACHE_TTL_SECONDS.
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+import hashlib
+import json
+import threading
+import time
+
+import redis
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "llm_cache:"
+STATS_KEY = "llm_cache:stats"
+
+# Memory hits are counted in-process and added to the shared counters with the
+# next Redis-tier lookup, or once this many have accumulated, so the memory tier
+# stays free of Redis round trips
+MEMORY_HITS_FLUSH_EVERY = 100
+
+
+def normalize_fields(extracted_fields: dict) -> dict:
+    """
+    Canonical form of extracted fields for cache keys: field values only
+    (confidences and other OCR metadata dropped) with whitespace collapsed.
+    """
+    normalized = {}
+    for name, field in extracted_fields.items():
+        value = field.get("value") if isinstance(field, dict) else field
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        normalized[name] = value
+    return normalized
+
+
+def cache_key(
+    prompt: str,
+    prompt_version: int,
+    extracted_fields: dict,
+    temperature: float,
+    context: Any = None
+) -> str:
+    """Cache key of a prompt run on extracted_fields; context holds other prompt inputs"""
+    payload = json.dumps(
+        {
+            "prompt": prompt,
+            "version": prompt_version,
+            "deployment": settings.AZURE_OPENAI_DEPLOYMENT_CHAT,
+            "temperature": temperature,
+            "fields": normalize_fields(extracted_fields),
+            "context": context,
+        },
+        sort_keys=True,
+        default=str
+    )
+    return KEY_PREFIX + hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (in-process LRU, then Redis) cache of JSON-serializable LLM responses"""
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis],
+        max_entries: int = 1024,
+        ttl_seconds: int = 7 * 24 * 3600
+    ):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._unflushed_memory_hits = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None"""
+        flush = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    self._unflushed_memory_hits += 1
+                    flush = self._unflushed_memory_hits >= MEMORY_HITS_FLUSH_EVERY
+                    CACHE_LOOKUPS.labels("llm", "memory_hit").inc()
+                else:
+                    del self._entries[key]
+                    entry = None
+
+        if entry is not None:
+            if flush:
+                self._count()
+            return value
+
+        value = None
+        if self.redis is not None:
+            try:
+                cached = self.redis.get(key)
+                value = json.loads(cached) if cached is not None else None
+            except redis.RedisError as e:
+                logger.warning("llm_cache_redis_unavailable", error=str(e))
+
+        if value is None:
+            self.misses += 1
+            self._count("misses")
+            CACHE_LOOKUPS.labels("llm", "miss").inc()
+            return None
+
+        self.redis_hits += 1
+        self._count("redis_hits")
+        CACHE_LOOKUPS.labels("llm", "redis_hit").inc()
+        self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Cache value under key in both tiers"""
+        self._remember(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, json.dumps(value), ex=self.ttl_seconds)
+            except redis.RedisError as e:
+                logger.warning("llm_cache_redis_unavailable", error=str(e))
+
+    def stats(self) -> dict:
+        """Hit/miss counters, across all workers when Redis is available"""
+        counters = {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses
+        }
+        if self.redis is not None:
+            self._count()
+            try:
+                shared = self.redis.hgetall(STATS_KEY)
+                counters = {name: int(shared.get(name.encode(), 0)) for name in counters}
+            except redis.RedisError as e:
+                logger.warning("llm_cache_redis_unavailable", error=str(e))
+
+        lookups = sum(counters.values())
+        hits = counters["memory_hits"] + counters["redis_hits"]
+        return {**counters, "hit_rate": round(hits / lookups, 4) if lookups else None}
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, counter: Optional[str] = None):
+        """Add one to a shared counter, flushing the memory hits counted since the last call"""
+        if self.redis is None:
+            return
+
+        with self._lock:
+            memory_hits, self._unflushed_memory_hits = self._unflushed_memory_hits, 0
+        if counter is None and not memory_hits:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            if counter is not None:
+                pipeline.hincrby(STATS_KEY, counter, 1)
+            if memory_hits:
+                pipeline.hincrby(STATS_KEY, "memory_hits", memory_hits)
+            pipeline.execute()
+        except redis.RedisError:
+            pass
+
+
+# Singleton instance
+_llm_cache = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Get or create the LLM cache singleton; None if caching is disabled"""
+    global _llm_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMCache(
+            redis_client=redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1),
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+        )
+    return _llm_cache
@@ -0,0 +1,88 @@
+"""
+ONNX Runtime backend for NERService.
+
+Exports the NER model to ONNX, quantizes its weights to int8 (dynamic
+quantization) and loads it behind the regular transformers pipeline, so
+aggregation and output format are identical to the PyTorch backend.
+
+Export ahead of deployment with:
+    python -m app.services.ner_onnx --output models/bert-base-NER-int8
+"""
+from pathlib import Path
+import argparse
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+
+def export_quantized_model(model_name: str, output_dir: str) -> Path:
+    """Export model_name to ONNX and write an int8-quantized copy to output_dir"""
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    output_path = Path(output_dir)
+
+    logger.info("ner_onnx_export_started", model=model_name, output_dir=str(output_path))
+
+    model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_path)
+
+    # Dynamic quantization: int8 weights, activations quantized at runtime
+    quantization_config = getattr(AutoQuantizationConfig, settings.NER_ONNX_QUANTIZATION)(
+        is_static=False,
+        per_channel=False
+    )
+    ORTQuantizer.from_pretrained(output_path).quantize(
+        quantization_config=quantization_config,
+        save_dir=output_path
+    )
+
+    logger.info("ner_onnx_export_completed", output_dir=str(output_path))
+    return output_path
+
+
+def load_onnx_pipeline(model_name: str, model_dir: str):
+    """
+    Build a transformers NER pipeline on the quantized ONNX model in model_dir,
+    exporting it first if it isn't there.
+    """
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForTokenClassification
+    from transformers import AutoTokenizer, pipeline
+
+    if not (Path(model_dir) / QUANTIZED_FILE_NAME).exists():
+        export_quantized_model(model_name, model_dir)
+
+    session_options = onnxruntime.SessionOptions()
+    if settings.NER_ONNX_THREADS:
+        session_options.intra_op_num_threads = settings.NER_ONNX_THREADS
+
+    model = ORTModelForTokenClassification.from_pretrained(
+        model_dir,
+        file_name=QUANTIZED_FILE_NAME,
+        session_options=session_options
+    )
+
+    return pipeline(
+        "ner",
+        model=model,
+        tokenizer=AutoTokenizer.from_pretrained(model_dir),
+        aggregation_strategy="simple"
+    )
+
+
+if __name__ == "__main__":
+    from app.services.ner_service import NER_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Export the int8 ONNX NER model")
+    parser.add_argument("--model", default=NER_MODEL_NAME)
+    parser.add_argument("--output", default=settings.NER_ONNX_MODEL_DIR)
+    args = parser.parse_args()
+
+    export_quantized_model(args.model, args.output)
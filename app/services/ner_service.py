@@ -1,59 +1,277 @@
+from typing import Optional
 from transformers import pipeline
+from app.core.config import settings
+import aiohttp
+import asyncio
 import structlog
 
 logger = structlog.get_logger()
 
+NER_MODEL_NAME = "dslim/bert-base-NER"
+WARMUP_TEXT = "John Smith of Acme Corporation signed the lease in Seattle on 3 March 2024."
+
+
+def sliding_windows(
+    offsets: list[tuple[int, int]],
+    word_ids: list[Optional[int]],
+    max_tokens: int,
+    overlap_tokens: int
+) -> list[tuple[int, int]]:
+    """
+    Split a tokenized text into overlapping windows of at most max_tokens tokens.
+    Window edges are moved to word starts so no word is cut in half.
+
+    Returns: (char_start, char_end) of each window
+    """
+    token_count = len(offsets)
+    if token_count == 0:
+        return []
+
+    def is_word_start(index: int) -> bool:
+        return index == 0 or index >= token_count or word_ids[index] != word_ids[index - 1]
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, token_count)
+        while end < token_count and end > start + 1 and not is_word_start(end):
+            end -= 1
+
+        windows.append((offsets[start][0], offsets[end - 1][1]))
+        if end >= token_count:
+            return windows
+
+        next_start = max(end - overlap_tokens, start + 1)
+        while next_start < end and not is_word_start(next_start):
+            next_start += 1
+        start = next_start
+
+
+def merge_window_entities(window_entities: list[tuple[int, list[dict]]]) -> list[dict]:
+    """
+    Merge entities found in overlapping windows.
+    Offsets are shifted from window to document positions, and where entities
+    from neighbouring windows overlap the most confident one is kept.
+    """
+    merged = []
+    for char_offset, entities in window_entities:
+        for entity in entities:
+            if entity.get("start") is not None:
+                entity = {
+                    **entity,
+                    "start": entity["start"] + char_offset,
+                    "end": entity["end"] + char_offset
+                }
+            merged.append(entity)
+
+    merged.sort(key=lambda entity: (entity.get("start") or 0, -entity["confidence"]))
+
+    result = []
+    for entity in merged:
+        previous = result[-1] if result else None
+        if previous and entity.get("start") is not None and previous.get("end") is not None \
+                and entity["start"] < previous["end"]:
+            if entity["confidence"] > previous["confidence"]:
+                result[-1] = entity
+            continue
+        result.append(entity)
+
+    return result
+
 
 class NERService:
-    def __init__(self):
-        """Initialize NER pipeline with transformers (PyTorch backend)"""
+    def __init__(self, mode: str = None, backend: str = None):
+        """
+        Initialize NER with transformers, on the PyTorch or the int8 ONNX Runtime
+        backend (NER_BACKEND).
+
+        In "client" mode no model is loaded; requests go to the shared NER server
+        (app.workers.ner_server) over its Unix socket instead.
+        """
+        self.mode = mode or settings.NER_MODE
+        self.backend = backend or settings.NER_BACKEND
+        self.ner_pipeline = None
+        self._session = None
+        self._session_loop = None
+
+        if self.mode == "client":
+            logger.info("ner_service_client_mode", socket=settings.NER_SERVER_SOCKET)
+            return
+
         try:
-            self.ner_pipeline = pipeline(
-                "ner",
-                model="dslim/bert-base-NER",
-                aggregation_strategy="simple"
-            )
-            logger.info("ner_service_initialized")
+            self.ner_pipeline = self._load_pipeline()
+            logger.info("ner_service_initialized", backend=self.backend)
         except Exception as e:
             logger.warning("ner_service_init_failed", error=str(e))
             self.ner_pipeline = None
 
+    def _load_pipeline(self):
+        """Load the NER pipeline on the configured backend"""
+        if self.backend == "onnx":
+            from app.services.ner_onnx import load_onnx_pipeline
+            return load_onnx_pipeline(NER_MODEL_NAME, settings.NER_ONNX_MODEL_DIR)
+
+        if self.backend != "pytorch":
+            raise ValueError(f"Unknown NER backend: {self.backend}")
+
+        return pipeline(
+            "ner",
+            model=NER_MODEL_NAME,
+            aggregation_strategy="simple"
+        )
+
+    def reload(self):
+        """
+        Load the pipeline again, e.g. in a forked child
+        (ONNX Runtime sessions don't survive fork)
+        """
+        self.ner_pipeline = self._load_pipeline()
+
+    def warm_up(self):
+        """Run one inference so lazy initialization happens now rather than on the first document"""
+        if self.ner_pipeline:
+            self.extract_entities_batch([WARMUP_TEXT])
+
     async def extract_entities(self, text: str) -> list[dict]:
         """
-        Extract named entities from text using transformers (PyTorch)
+        Extract named entities from text using transformers
 
         Returns: List of entities with type, text, and confidence
         """
+        if not text or len(text) < 10:
+            return []
+
+        if self.mode == "client":
+            return await self._extract_remote(text)
+
         if not self.ner_pipeline:
             logger.warning("ner_pipeline_not_available")
             return []
 
-        if not text or len(text) < 10:
-            return []
+        # CPU-bound inference runs in a thread so the event loop keeps serving I/O.
+        # Errors raise, so the stage retries instead of checkpointing no entities
+        entities = (await asyncio.to_thread(self.extract_entities_batch, [text]))[0]
 
-        try:
+        logger.info("entities_extracted", count=len(entities))
+        return entities
+
+    def extract_entities_batch(self, texts: list[str]) -> list[list[dict]]:
+        """
+        Run inference for several texts in one pipeline call (blocking).
+        With NER_SLIDING_WINDOW, long texts are split into overlapping windows and
+        every window of every text goes through the pipeline together.
+
+        Returns: Entities per text, in input order
+        """
+        if not settings.NER_SLIDING_WINDOW:
             # Truncate text if too long (BERT max length)
-            text = text[:512] if len(text) > 512 else text
+            texts = [text[:512] if len(text) > 512 else text for text in texts]
+            results = self.ner_pipeline(texts, batch_size=min(len(texts), settings.NER_BATCH_SIZE))
+            return [self._format_entities(entities) for entities in results]
+
+        # (text index, char offset, window text) for every window
+        windows = []
+        for index, text in enumerate(texts):
+            for char_start, char_end in self._windows(text):
+                windows.append((index, char_start, text[char_start:char_end]))
+
+        if not windows:
+            return [[] for _ in texts]
+
+        results = self.ner_pipeline(
+            [window_text for _, _, window_text in windows],
+            batch_size=min(len(windows), settings.NER_BATCH_SIZE)
+        )
+
+        window_entities = [[] for _ in texts]
+        for (index, char_start, _), entities in zip(windows, results):
+            window_entities[index].append((char_start, self._format_entities(entities)))
+
+        return [merge_window_entities(entities) for entities in window_entities]
+
+    def _windows(self, text: str) -> list[tuple[int, int]]:
+        """Character spans of the model-sized windows covering text"""
+        tokenizer = self.ner_pipeline.tokenizer
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
 
-            entities = self.ner_pipeline(text)
+        max_tokens = min(
+            tokenizer.model_max_length,
+            self.ner_pipeline.model.config.max_position_embeddings
+        ) - tokenizer.num_special_tokens_to_add()
 
-            # Format results
-            formatted_entities = []
-            for entity in entities:
-                formatted_entities.append({
-                    "text": entity["word"],
-                    "type": entity["entity_group"],
-                    "confidence": round(entity["score"], 3),
-                    "start": entity.get("start"),
-                    "end": entity.get("end")
-                })
+        return sliding_windows(
+            offsets=encoding["offset_mapping"],
+            word_ids=encoding.word_ids(),
+            max_tokens=max_tokens,
+            overlap_tokens=settings.NER_WINDOW_OVERLAP_TOKENS
+        )
 
-            logger.info("entities_extracted", count=len(formatted_entities))
-            return formatted_entities
+    def _format_entities(self, entities: list[dict]) -> list[dict]:
+        """Convert pipeline output to our entity format"""
+        formatted_entities = []
+        for entity in entities:
+            formatted_entities.append({
+                "text": entity["word"],
+                "type": entity["entity_group"],
+                "confidence": round(float(entity["score"]), 3),
+                "start": entity.get("start"),
+                "end": entity.get("end")
+            })
+        return formatted_entities
+
+    async def _extract_remote(self, text: str) -> list[dict]:
+        """Extract entities through the shared NER server"""
+        try:
+            request = self._get_session().post("http://ner-server/entities", json={"text": text})
+            async with request as response:
+                response.raise_for_status()
+                entities = (await response.json())["entities"]
+
+            logger.info("entities_extracted", count=len(entities), mode="client")
+            return entities
 
         except Exception as e:
-            logger.error("ner_extraction_failed", error=str(e))
-            return []
+            # Server unreachable or still loading: the stage retries rather than
+            # checkpointing no entities
+            logger.error("ner_extraction_failed", error=str(e), mode="client")
+            raise
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Client session on the server's Unix socket, one per event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            self._release_session()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=settings.NER_SERVER_SOCKET),
+                timeout=aiohttp.ClientTimeout(total=settings.NER_CLIENT_TIMEOUT_SECONDS)
+            )
+            self._session_loop = loop
+        return self._session
+
+    def _release_session(self):
+        """
+        Close the session of the event loop used before, on that loop.
+        A loop that no longer runs can't close it; its connections went with it.
+        """
+        session, session_loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+
+        if session_loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+        else:
+            logger.warning("ner_client_session_abandoned")
+
+    async def close(self):
+        """Close the client session, from the event loop it was used on"""
+        if self._session is not None and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
 
 # Singleton instance
 _ner_service = None
@@ -65,3 +283,9 @@ def get_ner_service() -> NERService:
     if _ner_service is None:
         _ner_service = NERService()
     return _ner_service
+
+
+async def close_ner_service():
+    """Close the NER service's client session, if it was created"""
+    if _ner_service is not None:
+        await _ner_service.close()
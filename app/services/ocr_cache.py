@@ -0,0 +1,110 @@
+"""
+OCR result cache.
+
+Document Intelligence returns the same result for the same bytes, model and
+API version, so analysis results are cached in Redis under (content hash,
+model id, API version), zlib-compressed, for OCR_CACHE_TTL_SECONDS.
+Reprocessing a document, or uploading bytes another document already had,
+then reuses the result instead of paying for OCR again.
+"""
+from typing import Optional
+import json
+import zlib
+
+import redis
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "ocr_cache:"
+STATS_KEY = "ocr_cache:stats"
+
+# Bump when the shape of DocumentIntelligenceService.analyze_document results changes
+RESULT_FORMAT_VERSION = 3
+
+
+def ocr_cache_key(content_hash: str, model_id: str, api_version: str) -> str:
+    """Cache key of the analysis of some content with a model and API version"""
+    return f"{KEY_PREFIX}{content_hash}:{model_id}:{api_version}:v{RESULT_FORMAT_VERSION}"
+
+
+class OCRCache:
+    """Redis cache of compressed analysis results, shared by all workers"""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        ttl_seconds: int = 30 * 24 * 3600,
+        compression_level: int = 6
+    ):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.compression_level = compression_level
+
+    def get(self, key: str, count_misses: bool = True) -> Optional[dict]:
+        """
+        Cached result for key, or None. Probes that are followed by a real
+        lookup on a miss pass count_misses=False, so a miss counts once.
+        """
+        try:
+            cached = self.redis.get(key)
+        except redis.RedisError as e:
+            logger.warning("ocr_cache_redis_unavailable", error=str(e))
+            return None
+
+        if cached is None:
+            if count_misses:
+                self._count("misses")
+                CACHE_LOOKUPS.labels("ocr", "miss").inc()
+            return None
+
+        self._count("hits")
+        CACHE_LOOKUPS.labels("ocr", "hit").inc()
+        return json.loads(zlib.decompress(cached))
+
+    def set(self, key: str, result: dict):
+        """Cache result under key"""
+        payload = zlib.compress(json.dumps(result).encode(), self.compression_level)
+        try:
+            self.redis.set(key, payload, ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            logger.warning("ocr_cache_redis_unavailable", error=str(e))
+
+    def stats(self) -> dict:
+        """Hit/miss counters across all workers"""
+        try:
+            shared = self.redis.hgetall(STATS_KEY)
+        except redis.RedisError as e:
+            logger.warning("ocr_cache_redis_unavailable", error=str(e))
+            shared = {}
+
+        counters = {name: int(shared.get(name.encode(), 0)) for name in ("hits", "misses")}
+        lookups = sum(counters.values())
+        return {**counters, "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None}
+
+    def _count(self, counter: str):
+        try:
+            self.redis.hincrby(STATS_KEY, counter, 1)
+        except redis.RedisError:
+            pass
+
+
+# Singleton instance
+_ocr_cache = None
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Get or create the OCR cache singleton; None if caching is disabled"""
+    global _ocr_cache
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+    if _ocr_cache is None:
+        _ocr_cache = OCRCache(
+            redis_client=redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1),
+            ttl_seconds=settings.OCR_CACHE_TTL_SECONDS,
+            compression_level=settings.OCR_CACHE_COMPRESSION_LEVEL
+        )
+    return _ocr_cache
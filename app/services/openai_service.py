@@ -1,22 +1,136 @@
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from app.core.config import settings
+from app.core.metrics import observe_external_call
+from app.models.database import DocumentType
+from app.services.llm_cache import cache_key, get_llm_cache
+from app.services.prompt_builder import FIELDS_PLACEHOLDER, build_prompt
+from app.services.rate_limiter import get_rate_limiter
+from typing import Any, Optional
+import asyncio
+import httpx
 import structlog
-import json
 
 logger = structlog.get_logger()
 
+# Bump a prompt's version when its template changes, so cached responses to
+# the old template aren't reused
+PROMPT_VERSIONS = {
+    "analyze": 2,
+    "classify": 2,
+    "summarize": 2,
+}
+
+# JSON shape the combined analysis prompt asks for
+ANALYSIS_RESPONSE_FORMAT = (
+    '{"document_type": "<type>", '
+    '"confidence": <0.0-1.0, how sure you are of the type>, '
+    '"summary": "<summary>"}'
+)
+
+# Common ways the model spells our document types
+TYPE_MAPPING = {
+    "business card": "business_card",
+    "id": "identity",
+    "bank statement": "bank_statement",
+    "tax form": "tax_form"
+}
+
+
+class DocumentAnalysis(BaseModel):
+    """Expected JSON of the combined classification and summary response"""
+    document_type: DocumentType
+    confidence: float = Field(ge=0, le=1)
+    summary: str = Field(min_length=1)
+
+    @field_validator("document_type", mode="before")
+    @classmethod
+    def normalize_document_type(cls, value):
+        if isinstance(value, str):
+            value = value.strip().lower()
+            return TYPE_MAPPING.get(value, value)
+        return value
+
 
 class OpenAIService:
-    def __init__(self):
-        if not settings.AZURE_OPENAI_ENDPOINT:
+    def __init__(self, bypass_cache: bool = False):
+        """
+        bypass_cache skips cached responses (fresh responses are still cached),
+        e.g. when reprocessing a document
+        """
+        self.cache = get_llm_cache()
+        self.bypass_cache = bypass_cache
+        # Prompt tokens sent and calls made by this instance
+        self.prompt_tokens = 0
+        self.llm_calls = 0
+
+        self.client = get_openai_client()
+        if not self.client:
             logger.warning("Azure OpenAI not configured, using mock")
-            self.client = None
-        else:
-            self.client = AzureOpenAI(
-                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-                api_key=settings.AZURE_OPENAI_API_KEY,
-                api_version=settings.AZURE_OPENAI_API_VERSION
-            )
+
+    async def analyze_document(self, extracted_fields: dict) -> dict:
+        """
+        Classify and summarize a document in one JSON-mode call.
+        If the response doesn't match DocumentAnalysis, falls back to separate
+        classify_document and generate_summary calls.
+
+        Returns: {"document_type", "confidence", "summary"}
+        """
+        if not self.client:
+            # Mock response
+            return {
+                "document_type": "invoice",
+                "confidence": 0.92,
+                "summary": "Mock summary for invoice document"
+            }
+
+        key = cache_key("analyze", PROMPT_VERSIONS["analyze"], extracted_fields, temperature=0.1)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        document_types = ", ".join(document_type.value for document_type in DocumentType)
+        prompt, prompt_tokens = build_prompt(
+            f"""Classify this document into ONE of these types: {document_types}.
+Then summarize it in 2-3 sentences.
+
+Document fields:
+{FIELDS_PLACEHOLDER}
+
+Respond with a JSON object:
+{ANALYSIS_RESPONSE_FORMAT}""",
+            extracted_fields,
+            task="analyze"
+        )
+
+        # Failed calls raise (throttling included), so the stage retries instead of
+        # checkpointing a placeholder result
+        response = await self._complete(
+            prompt_tokens,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a document classification expert. Respond only with JSON."
+                },
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1,
+            max_tokens=250
+        )
+
+        try:
+            content = response.choices[0].message.content or ""
+            analysis = DocumentAnalysis.model_validate_json(content)
+        except ValidationError as e:
+            logger.warning("document_analysis_invalid", error=str(e))
+            document_type, confidence = await self.classify_document(extracted_fields)
+            summary = await self.generate_summary(extracted_fields, document_type)
+            return {"document_type": document_type, "confidence": confidence, "summary": summary}
+
+        result = analysis.model_dump(mode="json")
+        await self._cache_set(key, result)
+        return result
 
     async def classify_document(self, extracted_fields: dict) -> tuple[str, float]:
         """
@@ -28,7 +142,13 @@ class OpenAIService:
             # Mock response
             return ("invoice", 0.92)
 
-        prompt = f"""Classify this document into ONE of these types:
+        key = cache_key("classify", PROMPT_VERSIONS["classify"], extracted_fields, temperature=0.1)
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return tuple(cached)
+
+        prompt, prompt_tokens = build_prompt(
+            f"""Classify this document into ONE of these types:
 - invoice
 - receipt
 - contract
@@ -39,60 +159,145 @@ class OpenAIService:
 - other
 
 Document fields:
-{json.dumps(extracted_fields, indent=2)}
-
-Respond with ONLY the document type (lowercase, one word)."""
+{FIELDS_PLACEHOLDER}
 
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_CHAT,
-                messages=[
-                    {"role": "system", "content": "You are a document classification expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=10
-            )
+Respond with ONLY the document type (lowercase, one word).""",
+            extracted_fields,
+            task="classify"
+        )
 
-            classification = response.choices[0].message.content.strip().lower()
+        response = await self._complete(
+            prompt_tokens,
+            messages=[
+                {"role": "system", "content": "You are a document classification expert."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=10
+        )
 
-            # Map to our enum values
-            type_mapping = {
-                "business card": "business_card",
-                "id": "identity",
-                "bank statement": "bank_statement",
-                "tax form": "tax_form"
-            }
-            classification = type_mapping.get(classification, classification)
+        classification = response.choices[0].message.content.strip().lower()
 
-            return (classification, 0.9)  # GPT confidence is implicit
+        # Map to our enum values
+        classification = TYPE_MAPPING.get(classification, classification)
 
-        except Exception as e:
-            logger.error("classification_failed", error=str(e))
-            return ("other", 0.0)
+        await self._cache_set(key, [classification, 0.9])
+        return (classification, 0.9)  # GPT confidence is implicit
 
-    async def generate_summary(self, extracted_fields: dict, document_type: str) -> str:
-        """Generate a summary of the document"""
+    async def generate_summary(
+        self,
+        extracted_fields: dict,
+        document_type: Optional[str] = None
+    ) -> str:
+        """Generate a summary of the document; document_type is optional context"""
         if not self.client:
-            return f"Mock summary for {document_type} document"
+            return f"Mock summary for {document_type or 'unclassified'} document"
 
-        prompt = f"""Summarize this {document_type} document in 2-3 sentences.
+        key = cache_key(
+            "summarize",
+            PROMPT_VERSIONS["summarize"],
+            extracted_fields,
+            temperature=0.3,
+            context=document_type
+        )
+        cached = await self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        document_label = f"{document_type} document" if document_type else "document"
+        prompt, prompt_tokens = build_prompt(
+            f"""Summarize this {document_label} in 2-3 sentences.
 
 Fields:
-{json.dumps(extracted_fields, indent=2)}
+{FIELDS_PLACEHOLDER}
 
-Summary:"""
+Summary:""",
+            extracted_fields,
+            task="summarize"
+        )
 
-        try:
-            response = self.client.chat.completions.create(
+        response = await self._complete(
+            prompt_tokens,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=150
+        )
+
+        summary = response.choices[0].message.content.strip()
+        await self._cache_set(key, summary)
+        return summary
+
+    async def _complete(self, prompt_tokens: int, **kwargs):
+        """
+        Chat completion on the chat deployment; prompt_tokens is the local count,
+        used for the prompt size statistics when the response has no usage
+        """
+        with observe_external_call("openai", settings.AZURE_OPENAI_DEPLOYMENT_CHAT):
+            response = await self.client.chat.completions.create(
                 model=settings.AZURE_OPENAI_DEPLOYMENT_CHAT,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=150
+                **kwargs
+            )
+
+        if response.usage:
+            prompt_tokens = response.usage.prompt_tokens
+        self.prompt_tokens += prompt_tokens
+        self.llm_calls += 1
+
+        logger.info("llm_call_completed", prompt_tokens=prompt_tokens)
+        return response
+
+    async def _cache_get(self, key: str) -> Optional[Any]:
+        """Cached response for key, unless caching is off or bypassed"""
+        if self.cache is None or self.bypass_cache:
+            return None
+        # Redis client is sync, so keep it off the event loop
+        return await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_set(self, key: str, value: Any):
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set, key, value)
+
+
+# Process-wide client. Its connection pool binds to the event loop of its first
+# request, which in a worker is the process's persistent loop (app.workers.event_loop)
+_openai_client = None
+
+
+def get_openai_client() -> Optional[AsyncAzureOpenAI]:
+    """Get or create the shared Azure OpenAI client; None if Azure OpenAI isn't configured"""
+    global _openai_client
+    if not settings.AZURE_OPENAI_ENDPOINT:
+        return None
+    if _openai_client is None:
+        # Every request attempt, retries included, goes through the deployment's shared limiter
+        limiter = get_rate_limiter(
+            f"openai:{settings.AZURE_OPENAI_DEPLOYMENT_CHAT}",
+            requests_per_minute=settings.AZURE_OPENAI_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.AZURE_OPENAI_TOKENS_PER_MINUTE
+        )
+        _openai_client = AsyncAzureOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            max_retries=settings.AZURE_OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.AZURE_OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(
+                    settings.AZURE_OPENAI_READ_TIMEOUT,
+                    connect=settings.AZURE_OPENAI_CONNECTION_TIMEOUT
+                ),
+                event_hooks=limiter.httpx_event_hooks() if limiter else None
             )
+        )
+    return _openai_client
 
-            return response.choices[0].message.content.strip()
 
-        except Exception as e:
-            logger.error("summary_generation_failed", error=str(e))
-            return f"Summary generation failed: {str(e)}"
+async def close_openai_client():
+    """Close the shared client's connections"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
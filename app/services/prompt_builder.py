@@ -0,0 +1,127 @@
+"""
+Prompt building for LLM calls on extracted fields.
+
+Fields are compacted before they go into a prompt: OCR confidences and
+redundant whitespace are dropped, fields are ranked by how useful they are
+for the task, long values are truncated, and fields are added in rank order
+until the prompt's token budget (PROMPT_TOKEN_BUDGET) is used up.
+"""
+from functools import lru_cache
+import json
+import math
+import structlog
+
+from app.core.config import settings
+from app.services.classifier_service import FIELD_SIGNATURES, normalize_field_name
+
+logger = structlog.get_logger()
+
+# Fields worth keeping first, per task
+TASK_FIELDS = {
+    "classify": set().union(*FIELD_SIGNATURES.values()),
+    "summarize": {
+        "vendorname", "customername", "merchantname", "companynames", "contactnames", "parties",
+        "invoicetotal", "amountdue", "total", "invoicedate", "duedate", "transactiondate",
+        "effectivedate", "term", "statementperiod", "closingbalance", "items", "description",
+    },
+}
+TASK_FIELDS["analyze"] = TASK_FIELDS["classify"] | TASK_FIELDS["summarize"]
+
+FIELDS_PLACEHOLDER = "{fields}"
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """tiktoken encoding of the chat deployment, None if it can't be loaded"""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(settings.AZURE_OPENAI_DEPLOYMENT_CHAT)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tokenizer_unavailable", error=str(e))
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens of text for the chat deployment's tokenizer
+    (about 4 chars per token if it can't be loaded)
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+def compact_value(value, max_chars: int) -> str:
+    """Field value as single-spaced text, truncated to max_chars"""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    value = " ".join(value.split())
+    if len(value) > max_chars:
+        value = value[:max_chars].rstrip() + "..."
+    return value
+
+
+def rank_fields(extracted_fields: dict, task: str) -> list[tuple[str, str]]:
+    """
+    (name, compacted value) of non-empty fields, most useful first: fields
+    known to matter for the task, then by OCR confidence, then shorter values.
+    """
+    task_fields = TASK_FIELDS.get(task, set())
+    ranked = []
+    for name, field in extracted_fields.items():
+        value = field.get("value") if isinstance(field, dict) else field
+        confidence = (field.get("confidence") or 0.0) if isinstance(field, dict) else 0.0
+        if value in (None, ""):
+            continue
+
+        value = compact_value(value, settings.PROMPT_MAX_VALUE_CHARS)
+        ranked.append((
+            normalize_field_name(name) not in task_fields,
+            -confidence,
+            len(value),
+            name,
+            value
+        ))
+
+    ranked.sort(key=lambda item: item[:3])
+    return [(name, value) for *_, name, value in ranked]
+
+
+def build_prompt(template: str, extracted_fields: dict, task: str) -> tuple[str, int]:
+    """
+    Fill the {fields} placeholder of template with the task's most useful fields,
+    as compact JSON, within PROMPT_TOKEN_BUDGET.
+
+    Returns: (prompt, prompt tokens)
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET - count_tokens(template.replace(FIELDS_PLACEHOLDER, "{}"))
+
+    included = {}
+    used = 0
+    for name, value in rank_fields(extracted_fields, task):
+        entry = json.dumps({name: value}, ensure_ascii=False, separators=(",", ":"))[1:-1]
+        # +1 for the separating comma
+        tokens = count_tokens(entry) + 1
+        if used + tokens > budget:
+            continue
+        included[name] = value
+        used += tokens
+
+    if len(included) < len(extracted_fields):
+        logger.info(
+            "prompt_fields_dropped",
+            task=task,
+            kept=len(included),
+            total=len(extracted_fields)
+        )
+
+    prompt = template.replace(
+        FIELDS_PLACEHOLDER,
+        json.dumps(included, ensure_ascii=False, separators=(",", ":"))
+    )
+    return prompt, count_tokens(prompt)
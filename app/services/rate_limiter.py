@@ -0,0 +1,307 @@
+"""
+Distributed rate limiting for Azure calls.
+
+Every worker shares one token bucket per quota (an Azure OpenAI deployment,
+a Document Intelligence resource) in Redis: one bucket of requests and, for
+Azure OpenAI, one of tokens. Callers acquire before each request and report
+each response. The rate adapts AIMD-style: a 429 halves it and honours
+Retry-After for every worker, while successes add back a step of the quota at
+most once per adjustment interval. The rate never exceeds the configured
+quota, so at steady state the limiter runs at quota without 429s.
+"""
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+import asyncio
+import json
+import time
+
+import httpx
+import redis
+import structlog
+from azure.core.pipeline.transport import AsyncHttpTransport
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "rate_limit:"
+
+# Requests/tokens may accumulate for at most this many seconds of quota
+BURST_SECONDS = 10
+
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local request_rate = tonumber(ARGV[2])
+local token_rate = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local burst = tonumber(ARGV[5])
+
+local state = redis.call(
+    "HMGET", KEYS[1], "requests", "tokens", "updated", "fraction", "blocked_until"
+)
+local fraction = tonumber(state[4]) or 1
+local blocked_until = tonumber(state[5]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+
+request_rate = request_rate * fraction
+token_rate = token_rate * fraction
+local request_capacity = math.max(1, request_rate * burst)
+local token_capacity = math.max(cost, token_rate * burst)
+
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+local requests = math.min(
+    request_capacity, (tonumber(state[1]) or request_capacity) + elapsed * request_rate
+)
+local tokens = math.min(
+    token_capacity, (tonumber(state[2]) or token_capacity) + elapsed * token_rate
+)
+
+local wait = 0
+if requests < 1 then
+    wait = (1 - requests) / request_rate
+end
+if token_rate > 0 and tokens < cost then
+    wait = math.max(wait, (cost - tokens) / token_rate)
+end
+if wait == 0 then
+    requests = requests - 1
+    if token_rate > 0 then
+        tokens = tokens - cost
+    end
+end
+
+redis.call("HSET", KEYS[1], "requests", requests, "tokens", tokens, "updated", now)
+redis.call("EXPIRE", KEYS[1], 3600)
+return tostring(wait)
+"""
+
+REPORT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local throttled = ARGV[2] == "1"
+local retry_after = tonumber(ARGV[3])
+local min_fraction = tonumber(ARGV[4])
+local increase_step = tonumber(ARGV[5])
+local decrease_factor = tonumber(ARGV[6])
+local interval = tonumber(ARGV[7])
+
+local state = redis.call("HMGET", KEYS[1], "fraction", "adjusted", "blocked_until")
+local fraction = tonumber(state[1]) or 1
+local adjusted = tonumber(state[2]) or 0
+
+if throttled then
+    if retry_after > 0 then
+        local blocked_until = math.max(tonumber(state[3]) or 0, now + retry_after)
+        redis.call("HSET", KEYS[1], "blocked_until", blocked_until)
+    end
+    -- Concurrent 429s from one burst count as a single decrease
+    if now - adjusted >= interval then
+        fraction = math.max(min_fraction, fraction * decrease_factor)
+        redis.call("HSET", KEYS[1], "fraction", fraction, "adjusted", now)
+    end
+elseif fraction < 1 and now - adjusted >= interval then
+    fraction = math.min(1, fraction + increase_step)
+    redis.call("HSET", KEYS[1], "fraction", fraction, "adjusted", now)
+end
+
+redis.call("EXPIRE", KEYS[1], 3600)
+return tostring(fraction)
+"""
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry delay requested by a throttled response, if any"""
+    for name, scale in (
+        ("retry-after-ms", 1000),
+        ("x-ms-retry-after-ms", 1000),
+        ("retry-after", 1)
+    ):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value) / scale
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+class RateLimiter:
+    """Redis-backed token bucket with AIMD rate adaptation, shared by all workers"""
+
+    min_fraction = 0.1
+    increase_step = 0.05
+    decrease_factor = 0.5
+    adjust_interval_seconds = 5.0
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        clock=time.time
+    ):
+        self.redis = redis_client
+        self.key = KEY_PREFIX + name
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.clock = clock
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._report = redis_client.register_script(REPORT_SCRIPT)
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        Take one request (and tokens) from the bucket.
+        Returns 0 if acquired, else the seconds to wait before trying again.
+        """
+        if self.tokens_per_minute:
+            # A call can't need more than the whole bucket
+            tokens = min(tokens, self.tokens_per_minute * BURST_SECONDS / 60)
+        try:
+            return float(self._acquire(
+                keys=[self.key],
+                args=[
+                    self.clock(),
+                    self.requests_per_minute / 60,
+                    self.tokens_per_minute / 60,
+                    tokens,
+                    BURST_SECONDS
+                ]
+            ))
+        except redis.RedisError as e:
+            # Fail open: Azure's own throttling still applies
+            logger.warning("rate_limiter_unavailable", limiter=self.name, error=str(e))
+            return 0.0
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until a request (and tokens) can be taken"""
+        while True:
+            # Redis client is sync, so keep it off the event loop
+            wait = await asyncio.to_thread(self.try_acquire, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def report(self, throttled: bool, retry_after: Optional[float] = None) -> float:
+        """Record a response; returns the current fraction of the quota in use"""
+        try:
+            fraction = float(self._report(
+                keys=[self.key],
+                args=[
+                    self.clock(),
+                    "1" if throttled else "0",
+                    retry_after or 0,
+                    self.min_fraction,
+                    self.increase_step,
+                    self.decrease_factor,
+                    self.adjust_interval_seconds
+                ]
+            ))
+        except redis.RedisError as e:
+            logger.warning("rate_limiter_unavailable", limiter=self.name, error=str(e))
+            return 1.0
+
+        if throttled:
+            logger.warning(
+                "rate_limited",
+                limiter=self.name,
+                retry_after=retry_after,
+                quota_fraction=fraction
+            )
+        return fraction
+
+    def httpx_event_hooks(self) -> dict:
+        """httpx hooks acquiring before every request attempt and reporting every response"""
+
+        async def on_request(request: httpx.Request):
+            try:
+                max_tokens = json.loads(request.content or b"{}").get("max_tokens") or 0
+            except ValueError:
+                max_tokens = 0
+            # About 4 bytes of request body per prompt token
+            await self.acquire(len(request.content) // 4 + max_tokens)
+
+        async def on_response(response: httpx.Response):
+            await asyncio.to_thread(
+                self.report,
+                response.status_code == 429,
+                retry_after_seconds(response.headers)
+            )
+
+        return {"request": [on_request], "response": [on_response]}
+
+
+class RateLimitedTransport(AsyncHttpTransport):
+    """
+    azure-core transport acquiring from a RateLimiter before each POST
+    (result polling isn't limited) and reporting each response. The transport
+    sits below the retry policy, so every retry attempt is limited too.
+    """
+
+    def __init__(self, transport: AsyncHttpTransport, limiter: RateLimiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        await self.transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_details):
+        await self.transport.__aexit__(*exc_details)
+
+    async def open(self):
+        await self.transport.open()
+
+    async def close(self):
+        await self.transport.close()
+
+    async def sleep(self, duration):
+        await self.transport.sleep(duration)
+
+    async def send(self, request, **kwargs):
+        if request.method == "POST":
+            await self.limiter.acquire()
+
+        response = await self.transport.send(request, **kwargs)
+
+        await asyncio.to_thread(
+            self.limiter.report,
+            response.status_code == 429,
+            retry_after_seconds(response.headers)
+        )
+        return response
+
+
+def throttled_retry_after(error: Exception) -> Optional[float]:
+    """Retry-After of an exception raised for a 429 response (0 if it had none), else None"""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    return retry_after_seconds(response.headers) or 0.0
+
+
+# Limiter instances by name
+_redis_client = None
+_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(
+    name: str,
+    requests_per_minute: float,
+    tokens_per_minute: float = 0
+) -> Optional[RateLimiter]:
+    """Get or create the limiter for a quota; None if rate limiting is disabled"""
+    global _redis_client
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    if name not in _limiters:
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1)
+        _limiters[name] = RateLimiter(_redis_client, name, requests_per_minute, tokens_per_minute)
+    return _limiters[name]
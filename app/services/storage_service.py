@@ -1,5 +1,15 @@
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+from urllib.parse import unquote, urlparse
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobBlock, BlobSasPermissions, ContentSettings, generate_blob_sas
+from azure.storage.blob.aio import BlobServiceClient
 from app.core.config import settings
+import aiohttp
+import asyncio
+import base64
+import hashlib
+import mimetypes
 import uuid
 import structlog
 
@@ -7,19 +17,47 @@ logger = structlog.get_logger()
 
 
 class StorageService:
-    def __init__(self):
-        self.blob_service_client = BlobServiceClient.from_connection_string(
-            settings.AZURE_STORAGE_CONNECTION_STRING
-        )
+    def __init__(self, blob_service_client: BlobServiceClient):
+        self.blob_service_client = blob_service_client
         self.container_name = settings.AZURE_STORAGE_CONTAINER_NAME
-        self._ensure_container_exists()
 
-    def _ensure_container_exists(self):
+    @classmethod
+    async def create(cls) -> "StorageService":
+        """
+        Build the service on a pooled aiohttp session.
+        Must run inside the event loop that will use it.
+        """
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.AZURE_STORAGE_MAX_CONNECTIONS,
+                keepalive_timeout=settings.AZURE_STORAGE_KEEPALIVE_SECONDS
+            ),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False
+        )
+        # Timeouts belong to the transport: client-level ones are ignored when a transport is passed
+        transport = AioHttpTransport(
+            session=session,
+            session_owner=True,
+            connection_timeout=settings.AZURE_STORAGE_CONNECTION_TIMEOUT,
+            read_timeout=settings.AZURE_STORAGE_READ_TIMEOUT
+        )
+        blob_service_client = BlobServiceClient.from_connection_string(
+            settings.AZURE_STORAGE_CONNECTION_STRING,
+            transport=transport
+        )
+        return cls(blob_service_client)
+
+    async def close(self):
+        """Close the client and its connection pool"""
+        await self.blob_service_client.close()
+
+    async def ensure_container_exists(self):
         """Create container if it doesn't exist"""
         try:
             container_client = self.blob_service_client.get_container_client(self.container_name)
-            if not container_client.exists():
-                container_client.create_container()
+            if not await container_client.exists():
+                await container_client.create_container()
                 logger.info("container_created", container_name=self.container_name)
         except Exception as e:
             logger.error("container_check_failed", error=str(e))
@@ -42,7 +80,7 @@ class StorageService:
 
             # Upload
             content_settings = ContentSettings(content_type=content_type)
-            blob_client.upload_blob(
+            await blob_client.upload_blob(
                 file,
                 overwrite=True,
                 content_settings=content_settings
@@ -63,12 +101,271 @@ class StorageService:
             logger.error("upload_failed", filename=filename, error=str(e))
             raise
 
-    async def download_file(self, blob_uri: str):
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str
+    ) -> tuple[str, int]:
+        """
+        Stream file to Azure Blob Storage as staged blocks.
+
+        Chunks are re-blocked to AZURE_STORAGE_BLOCK_SIZE_MB and staged concurrently,
+        with at most AZURE_STORAGE_MAX_CONCURRENCY blocks in flight. The first failed
+        block stops the read, and the block list is only committed once every block is
+        staged, so a failed or rejected stream never produces a visible blob.
+
+        Returns: (Blob URI, size in bytes)
+        """
+        blob_name = f"{uuid.uuid4()}/{filename}"
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+
+        block_size = settings.AZURE_STORAGE_BLOCK_SIZE_MB * 1024 * 1024
+        in_flight = asyncio.Semaphore(settings.AZURE_STORAGE_MAX_CONCURRENCY)
+        block_ids: list[str] = []
+        tasks: list[asyncio.Task] = []
+        buffer = bytearray()
+        size_bytes = 0
+
+        async def stage(block_id: str, data: bytes):
+            try:
+                await blob_client.stage_block(block_id=block_id, data=data)
+            finally:
+                in_flight.release()
+
+        def raise_if_failed():
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+
+        async def flush(data: bytes):
+            # Waits here while the in-flight limit is reached, which stops reading the
+            # request body and keeps memory bounded to concurrency * block size
+            await in_flight.acquire()
+            try:
+                # The upload can't succeed once a block failed, so stop reading the body
+                raise_if_failed()
+            except BaseException:
+                in_flight.release()
+                raise
+            block_id = self._block_id(len(block_ids))
+            block_ids.append(block_id)
+            tasks.append(asyncio.create_task(stage(block_id, data)))
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size_bytes += len(chunk)
+                while len(buffer) >= block_size:
+                    await flush(bytes(buffer[:block_size]))
+                    del buffer[:block_size]
+
+            if buffer:
+                await flush(bytes(buffer))
+
+            await asyncio.gather(*tasks)
+
+            await blob_client.commit_block_list(
+                [BlobBlock(block_id=block_id) for block_id in block_ids],
+                content_settings=ContentSettings(content_type=content_type)
+            )
+
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.error("stream_upload_failed", filename=filename, error=str(e))
+            raise
+
+        logger.info(
+            "file_uploaded",
+            filename=filename,
+            blob_name=blob_name,
+            size_bytes=size_bytes,
+            blocks=len(block_ids)
+        )
+
+        return blob_client.url, size_bytes
+
+    async def upload_derivative(
+        self,
+        blob_uri: str,
+        name: str,
+        data: bytes,
+        content_type: str
+    ) -> str:
+        """
+        Store a file derived from a blob next to it (e.g. <blob>.optimized.jpg),
+        replacing an earlier derivative of the same name
+
+        Returns: Blob URI
+        """
+        extension = mimetypes.guess_extension(content_type) or ""
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=f"{self._blob_name(blob_uri)}.{name}{extension}"
+        )
+        await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type)
+        )
+
+        logger.info("derivative_uploaded", blob_uri=blob_uri, derivative=name, size_bytes=len(data))
+
+        return blob_client.url
+
+    async def stage_block(self, blob_name: str, index: int, data: bytes):
+        """Stage one uncommitted block; re-staging the same index replaces it"""
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+        await blob_client.stage_block(block_id=self._block_id(index), data=data)
+
+    async def commit_blocks(self, blob_name: str, block_count: int, content_type: str) -> str:
+        """
+        Commit blocks 0..block_count-1 staged with stage_block as the blob's content
+
+        Returns: Blob URI
+        """
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+        await blob_client.commit_block_list(
+            [BlobBlock(block_id=self._block_id(index)) for index in range(block_count)],
+            content_settings=ContentSettings(content_type=content_type)
+        )
+
+        logger.info("file_uploaded", blob_name=blob_name, blocks=block_count)
+
+        return blob_client.url
+
+    @staticmethod
+    def _block_id(index: int) -> str:
+        """Block IDs must be base64 and the same length for every block of a blob"""
+        return base64.b64encode(f"{index:08d}".encode()).decode()
+
+    def generate_upload_url(self, blob_name: str) -> tuple[str, str, datetime]:
+        """
+        Create a short-lived, write-only SAS URL for a client to PUT a blob directly.
+
+        Returns: (Blob URI, upload URL, expiry)
+        """
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+        expires_at = datetime.now(timezone.utc) + \
+            timedelta(minutes=settings.AZURE_STORAGE_SAS_EXPIRY_MINUTES)
+
+        sas_token = generate_blob_sas(
+            account_name=self.blob_service_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=self.blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(create=True, write=True),
+            expiry=expires_at
+        )
+
+        return blob_client.url, f"{blob_client.url}?{sas_token}", expires_at
+
+    async def inspect_file(self, blob_uri: str, header_length: int = 8) -> tuple[int, bytes]:
+        """
+        Read a blob's size and its first bytes without downloading it.
+
+        Returns: (size in bytes, header bytes)
+        """
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=self._blob_name(blob_uri)
+        )
+
+        properties = await blob_client.get_blob_properties()
+        if properties.size == 0:
+            return 0, b""
+
+        downloader = await blob_client.download_blob(
+            offset=0,
+            length=min(header_length, properties.size)
+        )
+        return properties.size, await downloader.readall()
+
+    async def download_file(self, blob_uri: str) -> bytes:
         """Download file from blob storage"""
-        # TODO: Implement download
-        pass
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=self._blob_name(blob_uri)
+        )
+        downloader = await blob_client.download_blob(
+            max_concurrency=settings.AZURE_STORAGE_MAX_CONCURRENCY
+        )
+        return await downloader.readall()
+
+    async def hash_file(self, blob_uri: str) -> str:
+        """
+        SHA-256 of a blob, read chunk by chunk in order so memory stays bounded
+        to one chunk whatever the blob's size
+        """
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=self._blob_name(blob_uri)
+        )
+        hasher = hashlib.sha256()
+        downloader = await blob_client.download_blob()
+        async for chunk in downloader.chunks():
+            # hashlib releases the GIL on large buffers, so a thread keeps the loop free
+            await asyncio.to_thread(hasher.update, chunk)
+        return hasher.hexdigest()
 
     async def delete_file(self, blob_uri: str):
         """Delete file from blob storage"""
-        # TODO: Implement delete
-        pass
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=self._blob_name(blob_uri)
+        )
+        await blob_client.delete_blob()
+
+        logger.info("file_deleted", blob_uri=blob_uri)
+
+    def _blob_name(self, blob_uri: str) -> str:
+        """Extract the blob name from a blob URI in our container"""
+        path = unquote(urlparse(blob_uri).path)
+        return path.split(f"/{self.container_name}/", 1)[1]
+
+
+# Process-wide instance, created once per event loop (API lifespan / worker startup)
+_storage_service: Optional[StorageService] = None
+
+
+async def init_storage_service() -> Optional[StorageService]:
+    """Create the shared storage service and check the container once"""
+    global _storage_service
+    if _storage_service is None:
+        if not settings.AZURE_STORAGE_CONNECTION_STRING:
+            logger.warning("Azure Storage not configured, uploads are disabled")
+            return None
+
+        _storage_service = await StorageService.create()
+        await _storage_service.ensure_container_exists()
+        logger.info("storage_service_initialized", container_name=_storage_service.container_name)
+    return _storage_service
+
+
+async def close_storage_service():
+    """Close the shared storage service"""
+    global _storage_service
+    if _storage_service is not None:
+        await _storage_service.close()
+        _storage_service = None
+
+
+def get_storage_service() -> StorageService:
+    """Get the shared storage service"""
+    if _storage_service is None:
+        raise RuntimeError("Storage service not initialized")
+    return _storage_service
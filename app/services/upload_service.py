@@ -2,28 +2,51 @@
 Upload service layer - handles file upload business logic.
 Encapsulates validation, storage, and database operations.
 """
-from typing import BinaryIO
+from typing import AsyncIterator, BinaryIO, Optional
+from azure.core.exceptions import ResourceNotFoundError
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
 import structlog
+import uuid
 
 from app.core.config import settings
-from app.models.database import Document, DocumentStatus
+from app.models.database import Document, DocumentStatus, UploadSession
 from app.services.storage_service import StorageService
 
 logger = structlog.get_logger()
 
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes expected for each allowed extension
+FILE_SIGNATURES = {
+    ".pdf": (b"%PDF",),
+    ".png": (b"\x89PNG",),
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".tiff": (b"II*\x00", b"MM\x00*"),
+    ".docx": (b"PK\x03\x04",),
+    ".doc": (b"\xd0\xcf\x11\xe0",),
+}
+
 
 class FileValidationError(Exception):
     """Custom exception for file validation errors"""
     pass
 
 
+class UploadSessionError(Exception):
+    """Raised when a chunk or finalize call doesn't match the upload session state"""
+    pass
+
+
 class UploadService:
     """Service for document upload operations"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, storage_service: StorageService):
         self.db = db
-        self.storage_service = StorageService()
+        self.storage_service = storage_service
 
     def validate_file_extension(self, filename: str) -> str:
         """
@@ -51,85 +74,645 @@ class UploadService:
                 f"File size {file_size / (1024*1024):.2f}MB exceeds maximum {settings.MAX_FILE_SIZE_MB}MB"
             )
 
+    def validate_file_signature(self, filename: str, header: bytes) -> None:
+        """
+        Validate that the file's leading bytes match its extension.
+        Raises FileValidationError if they don't.
+        """
+        file_ext = self.validate_file_extension(filename)
+        signatures = FILE_SIGNATURES.get(file_ext)
+
+        if signatures and not header.startswith(signatures):
+            raise FileValidationError(f"File content does not match type {file_ext}")
+
+    def compute_content_hash(self, file: BinaryIO) -> str:
+        """SHA-256 of the file contents; leaves the file positioned at the start"""
+        hasher = hashlib.sha256()
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+        file.seek(0)
+        return hasher.hexdigest()
+
+    def find_processed_duplicates(
+        self,
+        tenant_id: str,
+        content_hashes: list[str]
+    ) -> dict[str, Document]:
+        """
+        Find completed documents of this tenant with the given content hashes.
+        Returns {content_hash: document}
+        """
+        if not content_hashes:
+            return {}
+
+        documents = self.db.query(Document) \
+            .filter(Document.tenant_id == tenant_id) \
+            .filter(Document.content_hash.in_(set(content_hashes))) \
+            .filter(Document.status == DocumentStatus.COMPLETED) \
+            .all()
+
+        return {document.content_hash: document for document in documents}
+
     async def upload_document(
         self,
         file: BinaryIO,
         filename: str,
         content_type: str,
         file_size: int,
-        tenant_id: str
+        tenant_id: str,
+        force_reprocess: bool = False
     ) -> Document:
         """
         Upload a document to storage and create database record.
-        Handles validation, storage upload, and database creation.
+        The file goes through the streamed upload path, so it is validated and hashed
+        while it is sent to storage rather than in a separate pass. Identical files
+        the tenant already processed reuse the existing blob and results unless
+        force_reprocess is set.
         """
-        # Validate
+        return await self.upload_document_stream(
+            chunks=self._read_file(file),
+            filename=filename,
+            content_type=content_type,
+            tenant_id=tenant_id,
+            content_length=file_size,
+            force_reprocess=force_reprocess
+        )
+
+    async def upload_document_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str,
+        tenant_id: str,
+        content_length: Optional[int] = None,
+        force_reprocess: bool = False
+    ) -> Document:
+        """
+        Stream a document to storage and create database record.
+        The size limit and file signature are enforced and the content hash computed
+        while the body is read, so bad files are rejected mid-stream instead of after
+        being buffered. An empty body is rejected before anything is committed.
+        """
+        # Validate what we know up front
         self.validate_file_extension(filename)
-        self.validate_file_size(file_size)
+        if content_length is not None:
+            self.validate_file_size(content_length)
 
-        # Upload to blob storage
-        blob_uri = await self.storage_service.upload_file(
-            file=file,
+        hasher = hashlib.sha256()
+        blob_uri, file_size = await self.storage_service.upload_stream(
+            chunks=self._validate_stream(chunks, filename, hasher),
             filename=filename,
             content_type=content_type
         )
+        content_hash = hasher.hexdigest()
+
+        # The hash is only known once the body is in storage, so a duplicate
+        # drops the blob we just wrote in favour of the existing one
+        source = None if force_reprocess else \
+            self.find_processed_duplicates(tenant_id, [content_hash]).get(content_hash)
+
+        if source:
+            try:
+                await self.storage_service.delete_file(blob_uri)
+            except Exception as e:
+                logger.warning("duplicate_blob_delete_failed", blob_uri=blob_uri, error=str(e))
+            blob_uri = source.blob_uri
+
+        return self._create_document(self._build_document(
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            blob_uri=blob_uri,
+            tenant_id=tenant_id,
+            content_hash=content_hash,
+            source=source
+        ))
+
+    def create_direct_upload(
+        self,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        tenant_id: str
+    ) -> tuple[Document, str, datetime]:
+        """
+        Create a pending document and a write-only SAS URL the client uploads to directly.
+        Returns (document, upload_url, expires_at)
+        """
+        self.validate_file_extension(filename)
+        self.validate_file_size(file_size)
+
+        document_id = str(uuid.uuid4())
+        blob_uri, upload_url, expires_at = self.storage_service.generate_upload_url(
+            blob_name=f"{document_id}/{filename}"
+        )
 
-        # Create database record
         document = Document(
+            id=document_id,
             tenant_id=tenant_id,
             filename=filename,
             content_type=content_type,
             file_size_bytes=file_size,
             blob_uri=blob_uri,
-            status=DocumentStatus.UPLOADED
+            status=DocumentStatus.PENDING,
+            upload_expires_at=expires_at.astimezone(timezone.utc).replace(tzinfo=None)
         )
 
         self.db.add(document)
         self.db.commit()
         self.db.refresh(document)
 
+        logger.info(
+            "direct_upload_created",
+            document_id=document.id,
+            filename=filename,
+            tenant_id=tenant_id,
+            expires_at=expires_at.isoformat()
+        )
+
+        return document, upload_url, expires_at
+
+    async def complete_direct_upload(self, document_id: str) -> tuple[Optional[Document], bool]:
+        """
+        Verify a directly uploaded blob and mark its document as uploaded; a file
+        the tenant already processed is deduplicated like a streamed upload.
+        The upload URL must not have expired. Completing an already completed
+        document, concurrently or not, returns it again.
+        Returns (document, claimed); claimed is True only for the call that
+        completed the document, document is None if it was not found.
+        """
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return None, False
+
+        if document.status == DocumentStatus.FAILED:
+            raise FileValidationError(
+                document.error_message or f"Upload of document {document_id} failed"
+            )
+        if document.status != DocumentStatus.PENDING:
+            return document, False
+
+        expired = document.upload_expires_at is not None and \
+            document.upload_expires_at < datetime.utcnow()
+        try:
+            file_size, header = await self.storage_service.inspect_file(document.blob_uri)
+        except ResourceNotFoundError:
+            if not expired:
+                # Not failed: the client may still upload and complete again
+                raise FileValidationError(f"No upload found for document {document_id}")
+            file_size = header = None
+
+        try:
+            if expired:
+                raise FileValidationError(f"Upload URL for document {document_id} has expired")
+            self.validate_file_size(file_size)
+            self.validate_file_signature(document.filename, header)
+        except FileValidationError as e:
+            failed = {Document.status: DocumentStatus.FAILED, Document.error_message: str(e)}
+            if self._claim_pending(document, failed) and file_size is not None:
+                # Keep the rejected payload out of storage
+                await self.storage_service.delete_file(document.blob_uri)
+            raise
+
+        blob_uri = document.blob_uri
+        content_hash = await self.storage_service.hash_file(blob_uri)
+        source = self.find_processed_duplicates(document.tenant_id, [content_hash]) \
+            .get(content_hash)
+
+        values = {
+            Document.file_size_bytes: file_size,
+            Document.content_hash: content_hash,
+            Document.status: DocumentStatus.UPLOADED,
+        }
+        if source:
+            values.update(self._duplicate_values(source))
+            values[Document.blob_uri] = source.blob_uri
+
+        if not self._claim_pending(document, values):
+            return document, False
+
+        if source:
+            # The duplicate now points at the source's blob
+            try:
+                await self.storage_service.delete_file(blob_uri)
+            except Exception as e:
+                logger.warning("duplicate_blob_delete_failed", blob_uri=blob_uri, error=str(e))
+
         logger.info(
             "document_uploaded",
             document_id=document.id,
+            filename=document.filename,
+            tenant_id=document.tenant_id,
+            file_size=file_size,
+            duplicate_of=document.duplicate_of
+        )
+
+        return document, True
+
+    def _claim_pending(self, document: Document, values: dict) -> bool:
+        """
+        Update a pending document, conditional on it still being pending, so of
+        concurrent completion calls only one takes effect. Returns whether it did;
+        document is refreshed either way.
+        """
+        claimed = self.db.query(Document) \
+            .filter(Document.id == document.id) \
+            .filter(Document.status == DocumentStatus.PENDING) \
+            .update(values, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(document)
+        return bool(claimed)
+
+    def create_upload_session(
+        self,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        tenant_id: str
+    ) -> UploadSession:
+        """Start a resumable upload of a file with the given total size"""
+        self.validate_file_extension(filename)
+        self.validate_file_size(file_size)
+
+        session_id = str(uuid.uuid4())
+        session = UploadSession(
+            id=session_id,
+            tenant_id=tenant_id,
+            filename=filename,
+            content_type=content_type,
+            file_size_bytes=file_size,
+            blob_name=f"{session_id}/{filename}",
+            received_bytes=0,
+            block_count=0,
+            expires_at=datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_EXPIRY_HOURS)
+        )
+
+        self.db.add(session)
+        self.db.commit()
+        self.db.refresh(session)
+
+        logger.info(
+            "upload_session_created",
+            session_id=session.id,
             filename=filename,
             tenant_id=tenant_id,
             file_size=file_size
         )
 
+        return session
+
+    def get_upload_session(self, session_id: str) -> Optional[UploadSession]:
+        """Get an upload session by ID"""
+        return self.db.query(UploadSession).filter(UploadSession.id == session_id).first()
+
+    async def upload_chunk(
+        self,
+        session_id: str,
+        offset: int,
+        data: bytes
+    ) -> Optional[UploadSession]:
+        """
+        Stage one chunk of a resumable upload as the next block.
+        The offset must equal the bytes received so far; after a failed request the
+        client asks for the current offset and resumes from there.
+        Returns the session if found, None otherwise.
+        """
+        session = self.get_upload_session(session_id)
+        if not session:
+            return None
+
+        self._check_session_open(session)
+
+        max_chunk_bytes = settings.UPLOAD_SESSION_MAX_CHUNK_MB * 1024 * 1024
+        if not data or len(data) > max_chunk_bytes:
+            raise FileValidationError(
+                f"Chunk size must be between 1 byte and {settings.UPLOAD_SESSION_MAX_CHUNK_MB}MB"
+            )
+
+        if offset != session.received_bytes:
+            raise UploadSessionError(f"Expected offset {session.received_bytes}, got {offset}")
+
+        if offset + len(data) > session.file_size_bytes:
+            raise FileValidationError(
+                f"Chunk ends at {offset + len(data)} bytes, "
+                f"beyond declared size {session.file_size_bytes}"
+            )
+
+        if offset == 0:
+            self.validate_file_signature(session.filename, data[:8])
+
+        # A chunk staged before a failed commit below is simply replaced on retry
+        await self.storage_service.stage_block(session.blob_name, session.block_count, data)
+
+        # Conditional on the offset so a concurrent duplicate of this chunk can't count twice
+        updated = self.db.query(UploadSession) \
+            .filter(UploadSession.id == session.id) \
+            .filter(UploadSession.received_bytes == offset) \
+            .update({
+                UploadSession.block_count: UploadSession.block_count + 1,
+                UploadSession.received_bytes: UploadSession.received_bytes + len(data)
+            }, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(session)
+
+        if not updated:
+            raise UploadSessionError(f"Expected offset {session.received_bytes}, got {offset}")
+
+        return session
+
+    async def finalize_upload_session(self, session_id: str) -> tuple[Optional[Document], bool]:
+        """
+        Commit the staged blocks and create the document record; a file the tenant
+        already processed is deduplicated like a streamed upload.
+        Finalizing an already finalized session, concurrently or not, returns its
+        document again.
+        Returns (document, created); document is None if the session was not found.
+        """
+        session = self.get_upload_session(session_id)
+        if not session:
+            return None, False
+
+        if session.document_id:
+            return self.db.query(Document).filter(Document.id == session.document_id).first(), False
+
+        self._check_session_open(session)
+
+        if session.received_bytes != session.file_size_bytes:
+            raise UploadSessionError(
+                f"Upload incomplete: received {session.received_bytes} "
+                f"of {session.file_size_bytes} bytes"
+            )
+
+        # Same validation as a direct upload
+        self.validate_file_extension(session.filename)
+        self.validate_file_size(session.received_bytes)
+
+        blob_uri = await self.storage_service.commit_blocks(
+            blob_name=session.blob_name,
+            block_count=session.block_count,
+            content_type=session.content_type
+        )
+
+        # Chunks can arrive through different API processes, so the hash is taken
+        # over the committed blob, streamed back in order rather than loaded whole
+        content_hash = await self.storage_service.hash_file(blob_uri)
+
+        source = self.find_processed_duplicates(session.tenant_id, [content_hash]).get(content_hash)
+        if source:
+            try:
+                await self.storage_service.delete_file(blob_uri)
+            except Exception as e:
+                logger.warning("duplicate_blob_delete_failed", blob_uri=blob_uri, error=str(e))
+            blob_uri = source.blob_uri
+
+        document = self._build_document(
+            filename=session.filename,
+            content_type=session.content_type,
+            file_size=session.received_bytes,
+            blob_uri=blob_uri,
+            tenant_id=session.tenant_id,
+            content_hash=content_hash,
+            source=source
+        )
+
+        # Claim the session in the document's insert transaction, conditional on it
+        # being unclaimed, so of two concurrent finalize calls only one creates a document
+        self.db.add(document)
+        claimed = self.db.query(UploadSession) \
+            .filter(UploadSession.id == session.id) \
+            .filter(UploadSession.document_id.is_(None)) \
+            .update({UploadSession.document_id: document.id}, synchronize_session=False)
+
+        if not claimed:
+            self.db.rollback()
+            self.db.refresh(session)
+            return self.db.query(Document).filter(Document.id == session.document_id).first(), False
+
+        return self._create_document(document), True
+
+    def _check_session_open(self, session: UploadSession) -> None:
+        """Raise UploadSessionError if the session can no longer take chunks"""
+        if session.document_id:
+            raise UploadSessionError(f"Upload session {session.id} is already finalized")
+
+        if session.expires_at < datetime.utcnow():
+            raise UploadSessionError(f"Upload session {session.id} has expired")
+
+    async def _read_file(self, file: BinaryIO) -> AsyncIterator[bytes]:
+        """Read a file in chunks, off the event loop"""
+        while chunk := await asyncio.to_thread(file.read, HASH_CHUNK_SIZE):
+            yield chunk
+
+    async def _validate_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        hasher
+    ) -> AsyncIterator[bytes]:
+        """
+        Pass chunks through, hashing them. Raises FileValidationError as soon as the
+        leading bytes don't match the extension or the size limit is crossed, and at
+        the end if the body was empty.
+        """
+        received = 0
+        header = b""
+        async for chunk in chunks:
+            received += len(chunk)
+            self.validate_file_size(received)
+            if len(header) < 8:
+                header += chunk[:8 - len(header)]
+                if len(header) == 8:
+                    self.validate_file_signature(filename, header)
+            hasher.update(chunk)
+            yield chunk
+
+        if received == 0:
+            raise FileValidationError("File is empty")
+        if len(header) < 8:
+            self.validate_file_signature(filename, header)
+
+    def _build_document(
+        self,
+        filename: str,
+        content_type: str,
+        file_size: int,
+        blob_uri: str,
+        tenant_id: str,
+        content_hash: Optional[str],
+        source: Optional[Document] = None
+    ) -> Document:
+        """
+        Build the database record for an uploaded blob.
+        When source is given the document is a duplicate and takes over its results.
+        """
+        document = Document(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant_id,
+            filename=filename,
+            content_type=content_type,
+            file_size_bytes=file_size,
+            blob_uri=blob_uri,
+            content_hash=content_hash,
+            status=DocumentStatus.UPLOADED
+        )
+
+        if source:
+            for column, value in self._duplicate_values(source).items():
+                setattr(document, column.key, value)
+
+            logger.info(
+                "document_deduplicated",
+                document_id=document.id,
+                duplicate_of=document.duplicate_of,
+                tenant_id=tenant_id
+            )
+
+        return document
+
+    @staticmethod
+    def _duplicate_values(source: Document) -> dict:
+        """Column values a duplicate takes over from the processed document it duplicates"""
+        return {
+            Document.duplicate_of: source.duplicate_of or source.id,
+            Document.document_type: source.document_type,
+            Document.extracted_fields: source.extracted_fields,
+            Document.entities: source.entities,
+            Document.summary: source.summary,
+            Document.confidence_score: source.confidence_score,
+            Document.status: DocumentStatus.COMPLETED,
+            Document.processed_at: datetime.utcnow(),
+        }
+
+    def _create_document(self, document: Document) -> Document:
+        """Persist a single document record"""
+        self.db.add(document)
+        self.db.commit()
+        self.db.refresh(document)
+
+        logger.info(
+            "document_uploaded",
+            document_id=document.id,
+            filename=document.filename,
+            tenant_id=document.tenant_id,
+            file_size=document.file_size_bytes
+        )
+
         return document
 
     async def batch_upload_documents(
         self,
         files: list[tuple[BinaryIO, str, str, int]],  # (file, filename, content_type, size)
-        tenant_id: str
+        tenant_id: str,
+        force_reprocess: bool = False
     ) -> tuple[list[Document], list[dict]]:
         """
         Upload multiple documents.
+        Blob uploads run concurrently (bounded by BATCH_UPLOAD_CONCURRENCY) and all
+        database records are inserted in a single transaction. Identical files within
+        the batch are stored once, as one document, and files the tenant already
+        processed are deduplicated unless force_reprocess is set.
         Returns (successful_documents, errors)
         """
-        results = []
         errors = []
 
+        # Validate up front so rejected files never reach storage
+        valid_files = []
         for file, filename, content_type, file_size in files:
             try:
-                document = await self.upload_document(
-                    file=file,
-                    filename=filename,
-                    content_type=content_type,
-                    file_size=file_size,
-                    tenant_id=tenant_id
-                )
-                results.append(document)
+                self.validate_file_extension(filename)
+                self.validate_file_size(file_size)
+                valid_files.append((file, filename, content_type, file_size))
             except FileValidationError as e:
                 errors.append({
                     "filename": filename,
                     "error": str(e)
                 })
-            except Exception as e:
-                logger.error("batch_upload_failed", error=str(e), filename=filename)
+
+        # Hash in worker threads, then resolve duplicates with a single query
+        content_hashes = await asyncio.gather(
+            *[asyncio.to_thread(self.compute_content_hash, file) for file, *_ in valid_files]
+        )
+
+        # Identical files in the batch are stored and processed once, as the first of them
+        unique_files = {}
+        for valid_file, content_hash in zip(valid_files, content_hashes):
+            unique_files.setdefault(content_hash, valid_file)
+        batch_duplicates = len(valid_files) - len(unique_files)
+        valid_files = list(unique_files.values())
+        content_hashes = list(unique_files)
+
+        sources = {} if force_reprocess else \
+            self.find_processed_duplicates(tenant_id, content_hashes)
+
+        semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+        async def upload(
+            file: BinaryIO,
+            filename: str,
+            content_type: str,
+            content_hash: str
+        ) -> str:
+            if content_hash in sources:
+                return sources[content_hash].blob_uri
+
+            async with semaphore:
+                return await self.storage_service.upload_file(
+                    file=file,
+                    filename=filename,
+                    content_type=content_type
+                )
+
+        blob_uris = await asyncio.gather(
+            *[
+                upload(file, filename, content_type, content_hash)
+                for (file, filename, content_type, _), content_hash
+                in zip(valid_files, content_hashes)
+            ],
+            return_exceptions=True
+        )
+
+        documents = []
+        for (_, filename, content_type, file_size), content_hash, blob_uri in zip(
+            valid_files, content_hashes, blob_uris
+        ):
+            if isinstance(blob_uri, Exception):
+                logger.error("batch_upload_failed", error=str(blob_uri), filename=filename)
                 errors.append({
                     "filename": filename,
-                    "error": str(e)
+                    "error": str(blob_uri)
                 })
+                continue
+
+            documents.append(self._build_document(
+                filename=filename,
+                content_type=content_type,
+                file_size=file_size,
+                blob_uri=blob_uri,
+                tenant_id=tenant_id,
+                content_hash=content_hash,
+                source=sources.get(content_hash)
+            ))
+
+        if documents:
+            document_ids = [document.id for document in documents]
+
+            try:
+                self.db.add_all(documents)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+
+            # Reload server defaults (uploaded_at) for the whole batch in one query
+            self.db.query(Document).filter(Document.id.in_(document_ids)).all()
+
+            logger.info(
+                "documents_batch_uploaded",
+                tenant_id=tenant_id,
+                uploaded=len(documents),
+                deduplicated=sum(1 for document in documents if document.duplicate_of),
+                batch_duplicates=batch_duplicates,
+                failed=len(errors)
+            )
 
-        return results, errors
+        return documents, errors
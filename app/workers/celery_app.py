@@ -5,7 +5,11 @@ celery_app = Celery(
     "document_processor",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.workers.process_documents"]
+    include=[
+        "app.workers.process_documents",
+        "app.workers.model_preload",
+        "app.workers.metrics_exporter"
+    ]
 )
 
 # Celery configuration
@@ -18,5 +22,18 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=settings.CELERY_TASK_TIME_LIMIT,
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=100,
+    worker_pool=settings.CELERY_WORKER_POOL,
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    # Split-stage pipeline: CPU-bound NER and I/O-bound Azure calls on separate queues
+    task_routes={
+        "pipeline.ocr": {"queue": settings.PIPELINE_IO_QUEUE},
+        "pipeline.analyze": {"queue": settings.PIPELINE_IO_QUEUE},
+        "pipeline.classify": {"queue": settings.PIPELINE_IO_QUEUE},
+        "pipeline.summarize": {"queue": settings.PIPELINE_IO_QUEUE},
+        "pipeline.persist": {"queue": settings.PIPELINE_IO_QUEUE},
+        "pipeline.ner": {"queue": settings.PIPELINE_CPU_QUEUE},
+    },
+    # Recycle children on memory (KiB), not task count: the model is preloaded
+    # in the parent, so a fresh child costs nothing but a fork
+    worker_max_memory_per_child=settings.CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB * 1024,
 )
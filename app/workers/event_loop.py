@@ -0,0 +1,77 @@
+"""
+Persistent asyncio event loop for worker processes.
+
+Celery tasks are synchronous, but the processing pipeline is a coroutine.
+Each worker process keeps one event loop running in a background thread and
+tasks submit their coroutines to it. With the default prefork pool each child
+runs one document at a time, so only a document's own stages overlap; with a
+thread pool (CELERY_WORKER_POOL=threads) several tasks share the loop, so many
+documents can wait on Azure I/O at once.
+"""
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown
+import structlog
+
+logger = structlog.get_logger()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get or start this process's worker event loop"""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed() or not _thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_loop.run_forever,
+                name="worker-event-loop",
+                daemon=True
+            )
+            _thread.start()
+            logger.info("worker_event_loop_started")
+    return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine on the worker event loop, blocking the calling thread until it is done"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def stop_event_loop():
+    """Stop the worker event loop and wait for its thread"""
+    global _loop, _thread
+    with _lock:
+        if _loop is not None and _thread is not None and _thread.is_alive():
+            _loop.call_soon_threadsafe(_loop.stop)
+            _thread.join(timeout=10)
+            _loop.close()
+        _loop = None
+        _thread = None
+
+
+@worker_process_init.connect
+def _start_on_fork(**kwargs):
+    # A loop inherited from the parent has no thread running it in the child
+    global _loop, _thread
+    _loop = None
+    _thread = None
+    get_event_loop()
+
+
+@worker_process_shutdown.connect
+def _stop_on_shutdown(**kwargs):
+    # Client sessions must be closed on the loop they were used on, while it still runs
+    if _loop is not None and _thread is not None and _thread.is_alive():
+        from app.services.ner_service import close_ner_service
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_ner_service(), _loop).result(timeout=10)
+        except Exception as e:
+            logger.warning("worker_client_close_failed", error=str(e))
+    stop_event_loop()
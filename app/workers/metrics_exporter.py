@@ -0,0 +1,44 @@
+"""
+Prometheus exporter for Celery workers.
+
+The worker's parent process serves the metrics of all its pool children on
+WORKER_METRICS_PORT. With the prefork pool, children write their metrics to
+PROMETHEUS_MULTIPROC_DIR (set it to a directory only this worker uses); it
+is emptied on startup, and a child's live gauges are dropped when it exits.
+"""
+from pathlib import Path
+import os
+
+from celery.signals import worker_init, worker_process_shutdown
+from prometheus_client import multiprocess, start_http_server
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+
+logger = structlog.get_logger()
+
+
+@worker_init.connect
+def _start_exporter(**kwargs):
+    if not settings.WORKER_METRICS_PORT:
+        return
+
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Values left by a previous run would be added to this one's
+        for path in Path(multiproc_dir).glob("*.db"):
+            path.unlink()
+
+    start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+    logger.info(
+        "worker_metrics_exporter_started",
+        port=settings.WORKER_METRICS_PORT,
+        multiprocess=bool(multiproc_dir)
+    )
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,103 @@
+"""
+Model preloading for Celery workers.
+
+The NER model is loaded and warmed up in the worker's parent process before
+the pool forks, so prefork children share its weights copy-on-write and no
+document pays the model load. Children are recycled on resident memory
+(CELERY_WORKER_MAX_MEMORY_PER_CHILD_MB) rather than task count.
+
+WORKER_READY_FILE is written once the model is warm and removed on shutdown;
+container health checks use it as the worker's readiness signal.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import gc
+import time
+
+from celery.signals import worker_init, worker_process_init, worker_ready, worker_shutdown
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+_preload_failed = False
+
+
+def _preload_enabled() -> bool:
+    return settings.WORKER_PRELOAD_MODELS and settings.NER_MODE == "local"
+
+
+@contextmanager
+def _single_threaded():
+    """
+    Run torch single-threaded: an OpenMP thread pool started before fork
+    is unusable in the children
+    """
+    import torch
+
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(threads)
+
+
+@worker_init.connect
+def _preload_in_parent(**kwargs):
+    global _preload_failed
+    Path(settings.WORKER_READY_FILE).unlink(missing_ok=True)
+
+    if not _preload_enabled():
+        return
+
+    from app.services.ner_service import get_ner_service
+
+    start_time = time.time()
+    with _single_threaded():
+        ner_service = get_ner_service()
+        if not ner_service.ner_pipeline:
+            _preload_failed = True
+            logger.error("worker_model_preload_failed")
+            return
+        ner_service.warm_up()
+
+    # Keep the loaded objects out of GC bookkeeping so collections in the
+    # children don't write to (and un-share) the parent's pages
+    gc.freeze()
+
+    logger.info(
+        "worker_model_preloaded",
+        backend=ner_service.backend,
+        duration=time.time() - start_time
+    )
+
+
+@worker_process_init.connect
+def _warm_up_child(**kwargs):
+    if not _preload_enabled() or _preload_failed:
+        return
+
+    from app.services.ner_service import get_ner_service
+
+    ner_service = get_ner_service()
+    if ner_service.backend == "onnx":
+        # ONNX Runtime sessions don't survive fork; the exported model is on disk by now
+        ner_service.reload()
+    ner_service.warm_up()
+
+
+@worker_ready.connect
+def _report_ready(**kwargs):
+    if _preload_failed:
+        logger.error("worker_not_ready", reason="model preload failed")
+        return
+
+    Path(settings.WORKER_READY_FILE).write_text(str(time.time()))
+    logger.info("worker_ready", ready_file=settings.WORKER_READY_FILE)
+
+
+@worker_shutdown.connect
+def _clear_ready(**kwargs):
+    Path(settings.WORKER_READY_FILE).unlink(missing_ok=True)
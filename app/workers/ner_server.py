@@ -0,0 +1,164 @@
+"""
+Shared NER inference server.
+
+Loads the NER model once per node and serves every Celery worker over a Unix
+socket. Requests arriving together are grouped into micro-batches (up to
+NER_SERVER_MAX_BATCH_SIZE texts, waiting at most NER_SERVER_MAX_WAIT_MS for
+the batch to fill) and run through the pipeline in one call.
+
+NER_SERVER_READY_FILE is written once the model is warm and the server is
+starting, and removed on shutdown; container health checks use it as the
+server's readiness signal.
+
+Run with:
+    python -m app.workers.ner_server
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import time
+from typing import Callable
+
+from aiohttp import web
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class MicroBatcher:
+    """Groups concurrent requests into batches for a blocking batch function"""
+
+    def __init__(
+        self,
+        infer: Callable[[list[str]], list[list[dict]]],
+        max_batch_size: int,
+        max_wait_seconds: float
+    ):
+        self.infer = infer
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # One inference thread: batches run back to back, never interleaved
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner-inference")
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, text: str) -> list[dict]:
+        """Queue a text and wait for its entities"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def run(self):
+        """Batch loop; runs until cancelled"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+
+            # Whatever queued up during the previous batch is taken right away,
+            # otherwise wait briefly for the batch to fill
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.infer, texts)
+                for (_, future), entities in zip(batch, results):
+                    if not future.done():
+                        future.set_result(entities)
+            except Exception as e:
+                logger.error("ner_batch_failed", batch_size=len(batch), error=str(e))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.requests += len(batch)
+            logger.debug("ner_batch_completed", batch_size=len(batch))
+
+
+def create_app(batcher: MicroBatcher) -> web.Application:
+    """HTTP API of the NER server"""
+    routes = web.RouteTableDef()
+
+    @routes.post("/entities")
+    async def entities(request: web.Request) -> web.Response:
+        payload = await request.json()
+        try:
+            result = await batcher.submit(payload["text"])
+        except Exception as e:
+            return web.json_response({"detail": str(e)}, status=500)
+        return web.json_response({"entities": result})
+
+    @routes.get("/health")
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "healthy",
+            "batches": batcher.batches,
+            "requests": batcher.requests,
+            "avg_batch_size": (
+                round(batcher.requests / batcher.batches, 2) if batcher.batches else None
+            )
+        })
+
+    async def start_batcher(app: web.Application):
+        app["batcher_task"] = asyncio.create_task(batcher.run())
+
+    async def stop_batcher(app: web.Application):
+        app["batcher_task"].cancel()
+        batcher.executor.shutdown(wait=False)
+
+    app = web.Application()
+    app.add_routes(routes)
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    return app
+
+
+def main():
+    from app.services.ner_service import NERService
+
+    ready_file = Path(settings.NER_SERVER_READY_FILE)
+    ready_file.unlink(missing_ok=True)
+
+    ner_service = NERService(mode="local")
+    if not ner_service.ner_pipeline:
+        raise SystemExit("NER model could not be loaded")
+    ner_service.warm_up()
+
+    batcher = MicroBatcher(
+        infer=ner_service.extract_entities_batch,
+        max_batch_size=settings.NER_SERVER_MAX_BATCH_SIZE,
+        max_wait_seconds=settings.NER_SERVER_MAX_WAIT_MS / 1000
+    )
+
+    async def mark_ready(app: web.Application):
+        ready_file.write_text(str(time.time()))
+
+    async def clear_ready(app: web.Application):
+        ready_file.unlink(missing_ok=True)
+
+    app = create_app(batcher)
+    app.on_startup.append(mark_ready)
+    app.on_cleanup.append(clear_ready)
+
+    logger.info("ner_server_starting", socket=settings.NER_SERVER_SOCKET)
+    web.run_app(app, path=settings.NER_SERVER_SOCKET, print=None)
+
+
+if __name__ == "__main__":
+    main()
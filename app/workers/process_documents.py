@@ -1,65 +1,232 @@
+from celery import chain, group
 from app.workers.celery_app import celery_app
-from app.core.database import SessionLocal
+from app.workers.event_loop import run_async
+from app.core.config import settings
+from app.core.database import SessionLocal, run_in_thread
+from app.core.metrics import (
+    DOCUMENTS_FAILED, DOCUMENTS_IN_FLIGHT, PIPELINE_STAGE_SECONDS, TASK_RETRIES
+)
 from app.models.database import Document, DocumentStatus, DocumentType
+from app.services.checkpoint_service import CheckpointService
+from app.services.classifier_service import get_local_classifier
 from app.services.document_intelligence import DocumentIntelligenceService
 from app.services.openai_service import OpenAIService
 from app.services.ner_service import get_ner_service
+from app.services.rate_limiter import throttled_retry_after
+from app.services.text_extraction import extract_locally, is_usable
+from typing import Optional
+import asyncio
 import structlog
 import time
 from datetime import datetime
 
 logger = structlog.get_logger()
 
+LOCAL_EXTRACTION_EXTENSIONS = (".pdf", ".docx")
 
-@celery_app.task(name="process_document", bind=True, max_retries=3)
-def process_document_task(self, document_id: str):
+
+# ===== Pipeline Stages =====
+#
+# ocr -> (analyze, ner) -> persist
+#
+# "ocr" first tries the file's own text (born-digital PDFs, DOCX) and only
+# calls Document Intelligence when there is none or it looks incomplete.
+#
+# "analyze" classifies and summarizes in one LLM call; with
+# PIPELINE_COMBINED_ANALYSIS off it is replaced by separate classify and
+# summarize stages.
+#
+# Each stage checkpoints its output, keyed by document and stage, and skips
+# itself when a checkpoint computed from the same inputs exists.
+#
+# Stages run on the worker's shared event loop, so their (synchronous)
+# database calls go through run_in_thread to keep the loop free for the other
+# documents' I/O. A stage's session is only used by one thread at a time.
+
+def _get_document(db, document_id: str) -> Document:
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise LookupError(f"Document {document_id} not found")
+    return document
+
+
+async def _extract_locally(document: Document) -> Optional[dict]:
+    """Text layer of a PDF/DOCX read locally, None if the file can't be read here"""
+    if not document.filename.lower().endswith(LOCAL_EXTRACTION_EXTENSIONS):
+        return None
+
+    from app.services.storage_service import init_storage_service
+
+    storage_service = await init_storage_service()
+    if storage_service is None:
+        return None
+
+    try:
+        data = await storage_service.download_file(document.blob_uri)
+        extraction = await asyncio.to_thread(extract_locally, data, document.filename)
+    except Exception as e:
+        logger.warning("local_extraction_failed", document_id=document.id, error=str(e))
+        return None
+
+    if extraction is not None:
+        logger.info(
+            "local_extraction",
+            document_id=document.id,
+            usable=is_usable(extraction),
+            confidence=extraction["confidence"],
+            fields=len(extraction["fields"])
+        )
+    return extraction
+
+
+async def ocr_stage(document_id: str, fresh_ocr: bool = False) -> dict:
     """
-    Background task to process a document:
-    1. OCR with Azure Document Intelligence
-    2. Classification with GPT-4o
-    3. NER with transformers
-    4. Summary generation
+    OCR & Field Extraction (local text layer, else Azure Document Intelligence
+    cached by content)
     """
     db = SessionLocal()
+    try:
+        document = await run_in_thread(_get_document, db, document_id)
+
+        async def analyze():
+            # A cached analysis needs no download; local extraction is only tried on a miss
+            doc_intel_service = DocumentIntelligenceService(fresh=fresh_ocr)
+            cached = await doc_intel_service.cached_analysis(document.content_hash)
+            if cached is not None:
+                return {**cached, "extracted_by": "azure"}
+
+            extraction = None
+            if settings.LOCAL_EXTRACTION_ENABLED:
+                extraction = await _extract_locally(document)
+            if extraction is not None and is_usable(extraction):
+                return {**extraction, "extracted_by": "local"}
 
+            analysis = await doc_intel_service.analyze_document(
+                blob_uri=document.blob_uri,
+                content_hash=document.content_hash,
+                content_type=document.content_type,
+                page_count=extraction.get("page_count") if extraction else None
+            )
+            return {**analysis, "extracted_by": "azure"}
+
+        return await CheckpointService(db).run(
+            document_id,
+            "ocr",
+            {"blob_uri": document.blob_uri, "content_hash": document.content_hash},
+            analyze
+        )
+    finally:
+        await run_in_thread(db.close)
+
+
+def _classify_locally(analysis_result: dict) -> Optional[tuple[str, float]]:
+    """
+    (document_type, confidence) from the local classifier, if confident enough to skip the LLM.
+    Blocking: the first call calibrates the classifier from the database.
+    """
+    if not settings.LOCAL_CLASSIFIER_ENABLED:
+        return None
+
+    document_type, confidence = get_local_classifier().classify(
+        analysis_result["fields"],
+        analysis_result["document_type"]
+    )
+    if confidence < settings.LOCAL_CLASSIFIER_THRESHOLD:
+        return None
+    return document_type, confidence
+
+
+def _llm_usage(openai_service: OpenAIService) -> dict:
+    """Prompt tokens sent and LLM calls made for a stage, kept in its checkpoint"""
+    return {"prompt_tokens": openai_service.prompt_tokens, "llm_calls": openai_service.llm_calls}
+
+
+async def analyze_stage(document_id: str, bypass_llm_cache: bool = False) -> dict:
+    """Classification and Summary in one call (GPT-4o); only the summary if classified locally"""
+    db = SessionLocal()
     try:
-        logger.info("processing_document_started", document_id=document_id)
-        start_time = time.time()
+        checkpoints = CheckpointService(db)
+        analysis_result = await run_in_thread(checkpoints.get_output, document_id, "ocr")
+        extracted_fields = analysis_result["fields"]
 
-        # Get document from database
-        document = db.query(Document).filter(Document.id == document_id).first()
+        async def analyze():
+            openai_service = OpenAIService(bypass_cache=bypass_llm_cache)
 
-        if not document:
-            logger.error("document_not_found", document_id=document_id)
-            return {"status": "error", "message": "Document not found"}
+            local_classification = await run_in_thread(_classify_locally, analysis_result)
+            if local_classification is None:
+                analysis = await openai_service.analyze_document(extracted_fields=extracted_fields)
+                analysis["classified_by"] = "llm"
+            else:
+                document_type, confidence = local_classification
+                summary = await openai_service.generate_summary(
+                    extracted_fields=extracted_fields,
+                    document_type=document_type
+                )
+                analysis = {
+                    "document_type": document_type,
+                    "confidence": confidence,
+                    "summary": summary,
+                    "classified_by": "local"
+                }
 
-        # Update status to processing
-        document.status = DocumentStatus.PROCESSING
-        db.commit()
+            return {**analysis, **_llm_usage(openai_service)}
 
-        # 1. OCR & Field Extraction (Azure Document Intelligence)
-        doc_intel_service = DocumentIntelligenceService()
-        analysis_result = await doc_intel_service.analyze_document(
-            blob_uri=document.blob_uri
+        return await checkpoints.run(
+            document_id,
+            "analyze",
+            {"fields": extracted_fields, "ocr_document_type": analysis_result["document_type"]},
+            analyze
         )
+    finally:
+        await run_in_thread(db.close)
+
 
+async def classify_stage(document_id: str, bypass_llm_cache: bool = False) -> dict:
+    """Document Classification (local classifier, GPT-4o below its confidence threshold)"""
+    db = SessionLocal()
+    try:
+        checkpoints = CheckpointService(db)
+        analysis_result = await run_in_thread(checkpoints.get_output, document_id, "ocr")
         extracted_fields = analysis_result["fields"]
-        initial_confidence = analysis_result["confidence"]
 
-        # 2. Document Classification (GPT-4o)
-        openai_service = OpenAIService()
-        document_type, class_confidence = await openai_service.classify_document(
-            extracted_fields=extracted_fields
+        async def classify():
+            local_classification = await run_in_thread(_classify_locally, analysis_result)
+            if local_classification is not None:
+                document_type, confidence = local_classification
+                return {
+                    "document_type": document_type,
+                    "confidence": confidence,
+                    "classified_by": "local"
+                }
+
+            openai_service = OpenAIService(bypass_cache=bypass_llm_cache)
+            document_type, confidence = await openai_service.classify_document(
+                extracted_fields=extracted_fields
+            )
+            return {
+                "document_type": document_type,
+                "confidence": confidence,
+                "classified_by": "llm",
+                **_llm_usage(openai_service)
+            }
+
+        return await checkpoints.run(
+            document_id,
+            "classify",
+            {"fields": extracted_fields, "ocr_document_type": analysis_result["document_type"]},
+            classify
         )
+    finally:
+        await run_in_thread(db.close)
 
-        # Map to enum
-        try:
-            document.document_type = DocumentType(document_type)
-        except ValueError:
-            document.document_type = DocumentType.OTHER
 
-        # 3. NER (Transformers with PyTorch)
-        ner_service = get_ner_service()
+async def ner_stage(document_id: str) -> dict:
+    """NER (Transformers with PyTorch)"""
+    db = SessionLocal()
+    try:
+        checkpoints = CheckpointService(db)
+        analysis_result = await run_in_thread(checkpoints.get_output, document_id, "ocr")
+        extracted_fields = analysis_result["fields"]
 
         # Extract text from fields for NER
         text_for_ner = " ".join([
@@ -67,31 +234,116 @@ def process_document_task(self, document_id: str):
             for field in extracted_fields.values()
         ])
 
-        entities = await ner_service.extract_entities(text_for_ner)
+        async def extract():
+            entities = await get_ner_service().extract_entities(text_for_ner)
+            return {"entities": entities}
+
+        return await checkpoints.run(document_id, "ner", text_for_ner, extract)
+    finally:
+        await run_in_thread(db.close)
+
+
+async def summarize_stage(document_id: str, bypass_llm_cache: bool = False) -> dict:
+    """Summary Generation (GPT-4o)"""
+    db = SessionLocal()
+    try:
+        checkpoints = CheckpointService(db)
+        analysis_result = await run_in_thread(checkpoints.get_output, document_id, "ocr")
+        extracted_fields = analysis_result["fields"]
+
+        # The summary can't wait for classification, so it gets the local classifier's
+        # type when confident, else the OCR model's type when a specialized model was used
+        ocr_document_type = analysis_result["document_type"]
+        document_type = ocr_document_type if ocr_document_type != DocumentType.OTHER.value else None
+        local_classification = await run_in_thread(_classify_locally, analysis_result)
+        if local_classification is not None:
+            document_type = local_classification[0]
+
+        async def summarize():
+            openai_service = OpenAIService(bypass_cache=bypass_llm_cache)
+            summary = await openai_service.generate_summary(
+                extracted_fields=extracted_fields,
+                document_type=document_type
+            )
+            return {"summary": summary, **_llm_usage(openai_service)}
 
-        # 4. Summary Generation (GPT-4o)
-        summary = await openai_service.generate_summary(
-            extracted_fields=extracted_fields,
-            document_type=document_type
+        return await checkpoints.run(
+            document_id,
+            "summarize",
+            {"fields": extracted_fields, "document_type": document_type},
+            summarize
         )
+    finally:
+        await run_in_thread(db.close)
+
+
+async def persist_stage(document_id: str, started_at: float) -> dict:
+    """Write the checkpointed stage outputs to the document"""
+    return await run_in_thread(_persist, document_id, started_at)
+
+
+def _persist(document_id: str, started_at: float) -> dict:
+    persist_started_at = time.perf_counter()
+    db = SessionLocal()
+    try:
+        document = _get_document(db, document_id)
+        checkpoints = CheckpointService(db)
+
+        analysis_result = checkpoints.get_output(document_id, "ocr")
+        entities = checkpoints.get_output(document_id, "ner")["entities"]
+        if settings.PIPELINE_COMBINED_ANALYSIS:
+            classification = checkpoints.get_output(document_id, "analyze")
+            summary = classification["summary"]
+            llm_outputs = [classification]
+            stages = ["ocr", "ner", "analyze"]
+        else:
+            classification = checkpoints.get_output(document_id, "classify")
+            summarization = checkpoints.get_output(document_id, "summarize")
+            summary = summarization["summary"]
+            llm_outputs = [classification, summarization]
+            stages = ["ocr", "ner", "classify", "summarize"]
+
+        document_type = classification["document_type"]
+
+        # Map to enum
+        try:
+            document.document_type = DocumentType(document_type)
+        except ValueError:
+            document.document_type = DocumentType.OTHER
 
         # Calculate processing time
-        processing_time = time.time() - start_time
+        processing_time = time.time() - started_at
 
         # Calculate average confidence
-        avg_confidence = (initial_confidence + class_confidence) / 2
+        avg_confidence = (analysis_result["confidence"] + classification["confidence"]) / 2
 
         # Update document in database
-        document.extracted_fields = extracted_fields
+        document.extracted_fields = analysis_result["fields"]
         document.entities = entities
         document.summary = summary
+        document.classified_by = classification.get("classified_by", "llm")
+        document.extracted_by = analysis_result.get("extracted_by", "azure")
+        document.ocr_document_type = analysis_result.get("document_type")
+        # Only a fresh analysis carries it; a cached one mustn't clear the derivative's URI
+        if "optimized_blob_uri" in analysis_result:
+            document.optimized_blob_uri = analysis_result["optimized_blob_uri"]
+        document.llm_prompt_tokens = sum(output.get("prompt_tokens", 0) for output in llm_outputs)
+        document.llm_calls = sum(output.get("llm_calls", 0) for output in llm_outputs)
         document.confidence_score = avg_confidence
         document.processing_time_seconds = processing_time
+        stage_timings = {
+            stage: round(duration, 3)
+            for stage, duration in checkpoints.durations(document_id, stages).items()
+            if duration is not None
+        }
         document.status = DocumentStatus.COMPLETED
         document.processed_at = datetime.utcnow()
         document.error_message = None
 
+        persist_seconds = time.perf_counter() - persist_started_at
+        document.stage_timings = {**stage_timings, "persist": round(persist_seconds, 3)}
         db.commit()
+        PIPELINE_STAGE_SECONDS.labels("persist").observe(persist_seconds)
 
         logger.info(
             "processing_document_completed",
@@ -109,23 +361,197 @@ def process_document_task(self, document_id: str):
             "confidence": avg_confidence,
             "processing_time": processing_time
         }
+    finally:
+        db.close()
+
+
+def _set_status(document_id: str, status: DocumentStatus, error_message: str = None) -> bool:
+    """Update a document's status; returns False if it doesn't exist"""
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return False
+        document.status = status
+        document.error_message = error_message
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+async def process_document(
+    document_id: str,
+    started_at: float,
+    bypass_llm_cache: bool = False,
+    fresh_ocr: bool = False
+) -> dict:
+    """
+    Run all stages in this process.
+    Classification, NER and summary only depend on the OCR output, so they run
+    concurrently once OCR is done.
+    """
+    await ocr_stage(document_id, fresh_ocr)
+
+    # The first failing stage cancels the others; its own exception is raised
+    # (not the group) so retries still see e.g. a throttling error
+    try:
+        async with asyncio.TaskGroup() as stages:
+            stages.create_task(ner_stage(document_id))
+            for llm_stage in _llm_stages(document_id, bypass_llm_cache):
+                stages.create_task(llm_stage)
+    except ExceptionGroup as group:
+        raise group.exceptions[0]
+
+    return await persist_stage(document_id, started_at)
+
+
+def _llm_stages(document_id: str, bypass_llm_cache: bool) -> list:
+    """Classification and summary stages, combined into one call by default"""
+    if settings.PIPELINE_COMBINED_ANALYSIS:
+        return [analyze_stage(document_id, bypass_llm_cache)]
+    return [
+        classify_stage(document_id, bypass_llm_cache),
+        summarize_stage(document_id, bypass_llm_cache)
+    ]
+
+
+# ===== Celery Tasks =====
+
+@celery_app.task(name="process_document", bind=True, max_retries=3)
+def process_document_task(
+    self,
+    document_id: str,
+    bypass_llm_cache: bool = False,
+    fresh_ocr: bool = False
+):
+    """
+    Background task to process a document:
+    1. OCR with Azure Document Intelligence
+    2. Classification and summary with GPT-4o, and NER with transformers, concurrently
+    3. Persist results
+
+    With PIPELINE_SPLIT_STAGES the stages are dispatched as a chain of separate
+    tasks, so NER and Azure calls can run on different worker pools. Retries
+    resume from the last checkpointed stage either way.
+
+    bypass_llm_cache makes the LLM stages ignore cached responses, and
+    fresh_ocr makes the OCR stage ignore cached OCR results.
+    """
+    logger.info("processing_document_started", document_id=document_id)
+    started_at = time.time()
+
+    if not _set_status(document_id, DocumentStatus.PROCESSING):
+        logger.error("document_not_found", document_id=document_id)
+        return {"status": "error", "message": "Document not found"}
+
+    if settings.PIPELINE_SPLIT_STAGES:
+        if settings.PIPELINE_COMBINED_ANALYSIS:
+            llm_stage_tasks = [analyze_stage_task.si(document_id, bypass_llm_cache)]
+        else:
+            llm_stage_tasks = [
+                classify_stage_task.si(document_id, bypass_llm_cache),
+                summarize_stage_task.si(document_id, bypass_llm_cache)
+            ]
+
+        chain(
+            ocr_stage_task.si(document_id, fresh_ocr),
+            group(ner_stage_task.si(document_id), *llm_stage_tasks),
+            persist_stage_task.si(document_id, started_at)
+        ).apply_async()
+        return {"status": "dispatched", "document_id": document_id}
+
+    return _run_stage(self, process_document, document_id, started_at, bypass_llm_cache, fresh_ocr)
+
+
+@celery_app.task(name="pipeline.ocr", bind=True, max_retries=3)
+def ocr_stage_task(self, document_id: str, fresh_ocr: bool = False):
+    _run_stage(self, ocr_stage, document_id, fresh_ocr)
+    return {"stage": "ocr", "document_id": document_id}
+
+
+@celery_app.task(name="pipeline.analyze", bind=True, max_retries=3)
+def analyze_stage_task(self, document_id: str, bypass_llm_cache: bool = False):
+    _run_stage(self, analyze_stage, document_id, bypass_llm_cache)
+    return {"stage": "analyze", "document_id": document_id}
+
+
+@celery_app.task(name="pipeline.classify", bind=True, max_retries=3)
+def classify_stage_task(self, document_id: str, bypass_llm_cache: bool = False):
+    _run_stage(self, classify_stage, document_id, bypass_llm_cache)
+    return {"stage": "classify", "document_id": document_id}
+
+
+@celery_app.task(name="pipeline.ner", bind=True, max_retries=3)
+def ner_stage_task(self, document_id: str):
+    _run_stage(self, ner_stage, document_id)
+    return {"stage": "ner", "document_id": document_id}
+
+
+@celery_app.task(name="pipeline.summarize", bind=True, max_retries=3)
+def summarize_stage_task(self, document_id: str, bypass_llm_cache: bool = False):
+    _run_stage(self, summarize_stage, document_id, bypass_llm_cache)
+    return {"stage": "summarize", "document_id": document_id}
+
+
+@celery_app.task(name="pipeline.persist", bind=True, max_retries=3)
+def persist_stage_task(self, document_id: str, started_at: float):
+    return _run_stage(self, persist_stage, document_id, started_at)
+
+
+def _run_stage(task, stage, document_id: str, *args):
+    """Run a stage coroutine on the worker event loop, retrying only that stage on failure"""
+    try:
+        with DOCUMENTS_IN_FLIGHT.labels(task.name).track_inprogress():
+            return run_async(stage(document_id, *args))
 
     except Exception as e:
+        # Throttled retries have their own budget, counted in a message header, so a
+        # sustained throttle doesn't use up the retries meant for failures
+        throttled_retries = getattr(task.request, "throttled_retries", None) or 0
+        error_retries = task.request.retries - throttled_retries
+        retry_after = throttled_retry_after(e)
+
         logger.error(
             "processing_document_failed",
             document_id=document_id,
+            task=task.name,
             error=str(e),
-            retry_count=self.request.retries
+            retry_count=error_retries,
+            throttled_retries=throttled_retries
         )
 
-        # Update document status to failed
-        if document:
-            document.status = DocumentStatus.FAILED
-            document.error_message = str(e)
-            db.commit()
+        if retry_after is not None:
+            exhausted = throttled_retries >= settings.PIPELINE_MAX_THROTTLED_RETRIES
+            # Back off exponentially even when the 429 asks for less (or has no
+            # Retry-After), so retries don't run straight back into the throttle
+            backoff = min(
+                settings.PIPELINE_THROTTLED_RETRY_MAX_SECONDS,
+                settings.PIPELINE_THROTTLED_RETRY_BASE_SECONDS * 2 ** throttled_retries
+            )
+            countdown = max(retry_after, backoff)
+            throttled_retries += 1
+        else:
+            exhausted = error_retries >= task.max_retries
+            countdown = 60 * (2 ** error_retries)
 
-        # Retry with exponential backoff
-        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+        if exhausted:
+            _set_status(document_id, DocumentStatus.FAILED, str(e))
+            DOCUMENTS_FAILED.labels(task.name).inc()
+            raise
 
-    finally:
-        db.close()
+        TASK_RETRIES.labels(task.name, "throttled" if retry_after is not None else "error").inc()
+        raise task.retry(
+            exc=e,
+            countdown=round(countdown),
+            max_retries=task.max_retries + settings.PIPELINE_MAX_THROTTLED_RETRIES,
+            headers={"throttled_retries": throttled_retries}
+        )
+
+
+def enqueue_documents(document_ids: list[str]):
+    """Publish processing tasks for a batch of documents as one group"""
+    if not document_ids:
+        return
+
+    group(process_document_task.s(document_id) for document_id in document_ids).apply_async()
@@ -0,0 +1,107 @@
+"""
+Document Intelligence analyses in flight from one worker process, against a
+local mock analyze/poll server (benchmarks/mock_azure_server.py) with a fixed
+analysis latency.
+
+Compares the shared aio client with the previous approach: a new sync client
+per document, blocking a thread for the whole analysis.
+
+    PYTHONPATH=. python benchmarks/document_intelligence_benchmark.py \
+        --documents 128 --latency-ms 2000
+"""
+import argparse
+import asyncio
+import time
+
+from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.core.credentials import AzureKeyCredential
+
+from app.core.config import settings
+from benchmarks.mock_azure_server import MockAzure, start
+
+
+async def analyze_shared_client(index: int):
+    from app.services.document_intelligence import DocumentIntelligenceService
+    return await DocumentIntelligenceService().analyze_document(f"https://blob/doc-{index}.pdf")
+
+
+async def analyze_sync_client(index: int):
+    def analyze():
+        client = DocumentAnalysisClient(
+            endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+            credential=AzureKeyCredential(settings.AZURE_DOCUMENT_INTELLIGENCE_KEY),
+            polling_interval=settings.AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS
+        )
+        poller = client.begin_analyze_document_from_url(
+            "prebuilt-document", f"https://blob/doc-{index}.pdf"
+        )
+        return poller.result()
+    return await asyncio.to_thread(analyze)
+
+
+async def run(analyze, mock: MockAzure, documents: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    mock.max_in_flight = 0
+    mock.polls = 0
+
+    async def one(index):
+        async with semaphore:
+            return await analyze(index)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(documents)))
+    wall = time.perf_counter() - start_time
+    return {
+        "docs_per_s": documents / wall,
+        "max_in_flight": mock.max_in_flight,
+        "polls": mock.polls / documents
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--documents", type=int, default=128)
+    parser.add_argument("--latency-ms", type=int, default=2000)
+    parser.add_argument(
+        "--polling-interval",
+        type=float,
+        default=settings.AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 128])
+    args = parser.parse_args()
+
+    mock = MockAzure(args.latency_ms / 1000)
+    runner, endpoint = await start(mock)
+
+    settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT = endpoint
+    settings.AZURE_DOCUMENT_INTELLIGENCE_KEY = "mock"
+    settings.AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS = args.polling_interval
+    settings.RATE_LIMIT_ENABLED = False
+    # One analysis per document on both sides
+    settings.OCR_TWO_PASS_ENABLED = False
+
+    from app.services.document_intelligence import close_document_analysis_client
+
+    print(
+        f"{args.documents} analyses, {args.latency_ms} ms each, "
+        f"polling every {args.polling_interval}s"
+    )
+    print(f"{'client':>22} {'concurrency':>12} {'docs/s':>8} {'in flight':>10} {'polls/doc':>10}")
+    try:
+        for label, analyze in (("shared aio client", analyze_shared_client),
+                               ("sync client per doc", analyze_sync_client)):
+            for concurrency in args.concurrency:
+                result = await run(analyze, mock, args.documents, concurrency)
+                print(
+                    f"{label:>22} {concurrency:>12} {result['docs_per_s']:>8.1f} "
+                    f"{result['max_in_flight']:>10} {result['polls']:>10.1f}"
+                )
+    finally:
+        await close_document_analysis_client()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
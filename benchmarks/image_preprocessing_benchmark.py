@@ -0,0 +1,138 @@
+"""
+Bytes and pixels sent to OCR with and without image preprocessing, on a
+sample corpus of scans: a directory of JPEG/PNG/TIFF files, or synthetic
+scans (600 DPI flatbed page, 12 MP phone photo, color form, multi-page TIFF)
+when none is given.
+
+Document Intelligence latency grows with the pixels it analyzes and the bytes
+it fetches, so megapixels and transfer time at --bandwidth-mbps are reported
+as the OCR latency proxy.
+
+    PYTHONPATH=. python benchmarks/image_preprocessing_benchmark.py [--corpus DIR]
+"""
+import argparse
+import io
+import pathlib
+import random
+import time
+
+from PIL import Image, ImageDraw, ImageSequence
+
+from app.services.image_preprocessing import preprocess_image
+
+VOCABULARY = ["Invoice", "Total", "1,200.00", "Contoso", "Qty", "Net 30", "VAT"]
+
+
+def _page(size, background, ink, seed) -> Image.Image:
+    rng = random.Random(seed)
+    page = Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(page)
+    line_height = max(size) // 90
+    for y in range(line_height * 3, size[1] - line_height * 3, line_height):
+        words = " ".join(rng.choice(VOCABULARY) for _ in range(40))
+        draw.text((line_height * 3, y), words, fill=ink)
+    # Sensor noise, so the JPEG compresses like a real scan
+    noise = Image.effect_noise(size, 12).convert("RGB")
+    return Image.blend(page, noise, 0.08)
+
+
+def _encode(image: Image.Image, format: str, **kwargs) -> bytes:
+    data = io.BytesIO()
+    image.save(data, format, **kwargs)
+    return data.getvalue()
+
+
+def synthetic_corpus() -> dict[str, bytes]:
+    a4_600 = (4960, 7016)
+    form = _page((2480, 3508), (250, 250, 250), (20, 20, 20), 3)
+    ImageDraw.Draw(form).rectangle((1900, 3000, 2300, 3300), fill=(20, 60, 200))
+    tiff_pages = [
+        _page((2480, 3508), (255, 255, 255), (0, 0, 0), seed).convert("L")
+        for seed in range(4, 8)
+    ]
+    flatbed = _page(a4_600, (247, 245, 236), (25, 25, 25), 1)
+    photo = _page((4032, 3024), (236, 224, 200), (40, 35, 30), 2)
+
+    return {
+        "flatbed_600dpi.jpg": _encode(flatbed, "JPEG", quality=95, dpi=(600, 600)),
+        "phone_photo.jpg": _encode(photo, "JPEG", quality=92, dpi=(72, 72)),
+        "color_form_300dpi.png": _encode(form, "PNG", dpi=(300, 300)),
+        "statement_4_pages.tiff": _encode(
+            tiff_pages[0],
+            "TIFF",
+            save_all=True,
+            append_images=tiff_pages[1:],
+            compression="tiff_lzw",
+            dpi=(300, 300)
+        ),
+    }
+
+
+def megapixels(data: bytes) -> float:
+    """Total pixels of every page, in millions"""
+    if data.startswith(b"%PDF"):
+        from pypdf import PdfReader
+
+        return sum(
+            image.image.width * image.image.height
+            for page in PdfReader(io.BytesIO(data)).pages
+            for image in page.images
+        ) / 1e6
+    frames = ImageSequence.Iterator(Image.open(io.BytesIO(data)))
+    return sum(frame.width * frame.height for frame in frames) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--corpus", type=pathlib.Path, help="Directory of scans (default: synthetic scans)"
+    )
+    parser.add_argument("--bandwidth-mbps", type=float, default=100)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = {
+            path.name: path.read_bytes()
+            for path in sorted(args.corpus.iterdir())
+            if path.suffix.lower() in (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+        }
+    else:
+        corpus = synthetic_corpus()
+
+    def transfer_seconds(size: int) -> float:
+        return size * 8 / (args.bandwidth_mbps * 1e6)
+
+    print(f"{'file':>24} {'bytes':>10} {'-> bytes':>10} {'saved':>6} {'MP':>6} {'-> MP':>6} "
+          f"{'xfer s':>7} {'-> s':>6} {'prep s':>6}")
+    totals = [0, 0, 0.0, 0.0]
+    for name, data in corpus.items():
+        start = time.perf_counter()
+        optimized = preprocess_image(data)
+        prep_seconds = time.perf_counter() - start
+        optimized_data = optimized[0] if optimized else data
+
+        before_mp, after_mp = megapixels(data), megapixels(optimized_data)
+        totals = [
+            totals[0] + len(data),
+            totals[1] + len(optimized_data),
+            totals[2] + before_mp,
+            totals[3] + after_mp
+        ]
+        saved = 1 - len(optimized_data) / len(data)
+        print(
+            f"{name:>24} {len(data):>10,} {len(optimized_data):>10,} {saved:>6.0%} "
+            f"{before_mp:>6.1f} {after_mp:>6.1f} {transfer_seconds(len(data)):>7.2f} "
+            f"{transfer_seconds(len(optimized_data)):>6.2f} {prep_seconds:>6.2f}"
+        )
+
+    print(
+        f"{'total':>24} {totals[0]:>10,} {totals[1]:>10,} {1 - totals[1] / totals[0]:>6.0%} "
+        f"{totals[2]:>6.1f} {totals[3]:>6.1f} "
+        f"{transfer_seconds(totals[0]):>7.2f} {transfer_seconds(totals[1]):>6.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Local stand-in for Azure OpenAI and Document Intelligence, for benchmarks.
+
+Answers chat completions, and finishes document analyses, after a fixed
+latency (plus, for analyses, a latency per page analyzed); tracks how many
+requests/analyses were in flight at once.
+
+    python benchmarks/mock_azure_server.py --port 8089 --latency-ms 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from aiohttp import web
+
+
+class MockAzure:
+    def __init__(
+        self,
+        latency_seconds: float,
+        seconds_per_page: float = 0.0,
+        document_pages: int = 1
+    ):
+        self.latency_seconds = latency_seconds
+        # Analyses without a pages parameter cover all document_pages pages
+        self.seconds_per_page = seconds_per_page
+        self.document_pages = document_pages
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.polls = 0
+        # result id -> (ready at, model id)
+        self.analyses: dict[str, tuple[float, str, str]] = {}
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_seconds)
+        finally:
+            self.in_flight -= 1
+
+        prompt_tokens = sum(len(message["content"]) for message in payload["messages"]) // 4
+        return web.json_response({
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.match_info["deployment"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "A mock summary of the document."}
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 8,
+                "total_tokens": prompt_tokens + 8
+            }
+        })
+
+    async def analyze(self, request: web.Request) -> web.Response:
+        model_id = request.match_info["model_id"]
+        result_id = str(uuid.uuid4())
+        self.requests += 1
+        pages = request.query.get("pages", f"1-{self.document_pages}")
+        latency = self.latency_seconds + self.seconds_per_page * self._page_count(pages)
+        self.analyses[result_id] = (time.monotonic() + latency, model_id, pages)
+        self.max_in_flight = max(self.max_in_flight, self._analyses_in_flight())
+
+        location = request.url.with_path(
+            f"/formrecognizer/documentModels/{model_id}/analyzeResults/{result_id}"
+        )
+        return web.Response(status=202, headers={"Operation-Location": str(location)})
+
+    async def analyze_result(self, request: web.Request) -> web.Response:
+        self.polls += 1
+        ready_at, model_id, pages = self.analyses[request.match_info["result_id"]]
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        if time.monotonic() < ready_at:
+            return web.json_response({
+                "status": "running",
+                "createdDateTime": timestamp,
+                "lastUpdatedDateTime": timestamp
+            })
+
+        return web.json_response({
+            "status": "succeeded",
+            "createdDateTime": timestamp,
+            "lastUpdatedDateTime": timestamp,
+            "analyzeResult": {
+                "apiVersion": request.query.get("api-version", "2023-07-31"),
+                "modelId": model_id,
+                "stringIndexType": "textElements",
+                "content": f"Pages {pages}: invoice from Contoso Ltd, total 1,200.00",
+                "pages": [],
+                "documents": [{
+                    "docType": model_id,
+                    "confidence": 0.95,
+                    "spans": [],
+                    "fields": {
+                        "VendorName": {
+                            "type": "string",
+                            "valueString": "Contoso Ltd",
+                            "content": "Contoso Ltd",
+                            "confidence": 0.97
+                        },
+                        "InvoiceTotal": {
+                            "type": "string",
+                            "valueString": "1,200.00",
+                            "content": "1,200.00",
+                            "confidence": 0.93
+                        },
+                    }
+                }]
+            }
+        })
+
+    def _analyses_in_flight(self) -> int:
+        now = time.monotonic()
+        return sum(1 for ready_at, *_ in self.analyses.values() if ready_at > now)
+
+    @staticmethod
+    def _page_count(pages: str) -> int:
+        count = 0
+        for page_range in pages.split(","):
+            first, _, last = page_range.partition("-")
+            count += int(last or first) - int(first) + 1
+        return count
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(
+            "/openai/deployments/{deployment}/chat/completions", self.chat_completions
+        )
+        app.router.add_post(
+            "/formrecognizer/documentModels/{model_id:[^/:]+}:analyze", self.analyze
+        )
+        app.router.add_get(
+            "/formrecognizer/documentModels/{model_id}/analyzeResults/{result_id}",
+            self.analyze_result
+        )
+        return app
+
+
+async def start(mock: MockAzure, port: int = 0) -> tuple[web.AppRunner, str]:
+    """Serve mock on localhost; returns the runner and the endpoint URL"""
+    runner = web.AppRunner(mock.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    web.run_app(MockAzure(args.latency_ms / 1000).create_app(), host="127.0.0.1", port=args.port)
@@ -0,0 +1,95 @@
+"""
+NER backend comparison: PyTorch vs int8-quantized ONNX Runtime on CPU.
+
+Each backend runs in its own subprocess so resident memory is measured in
+isolation. Reports model load time, single-document latency (p50/p95),
+batched throughput and peak RSS.
+
+    PYTHONPATH=. python benchmarks/ner_backend_benchmark.py --docs 32 --chars 5000
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.ner_benchmark import make_document
+
+
+def run_backend(backend: str, docs: int, chars: int) -> dict:
+    """Benchmark one backend in this process"""
+    from app.services.ner_service import NERService
+
+    start = time.perf_counter()
+    service = NERService(mode="local", backend=backend)
+    load_seconds = time.perf_counter() - start
+    if not service.ner_pipeline:
+        raise SystemExit(f"{backend} backend could not be loaded")
+
+    texts = [make_document(chars, seed=seed) for seed in range(docs)]
+    service.extract_entities_batch(texts[:1])  # warm-up
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        service.extract_entities_batch([text])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    service.extract_entities_batch(texts)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "load_s": load_seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": (
+            statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        ) * 1000,
+        "docs_per_s": docs / batch_seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--docs", type=int, default=32)
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx"])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.docs, args.chars)))
+        return
+
+    print(f"{args.docs} documents of {args.chars} chars")
+    print(
+        f"{'backend':>8} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'docs/s':>8} {'RSS MB':>8}"
+    )
+    for backend in args.backends:
+        output = subprocess.run(
+            [
+                sys.executable, __file__,
+                "--worker", backend, "--docs", str(args.docs), "--chars", str(args.chars)
+            ],
+            check=True,
+            capture_output=True,
+            text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{backend:>8} {result['load_s']:>8.2f} {result['p50_ms']:>8.1f} "
+            f"{result['p95_ms']:>8.1f} {result['docs_per_s']:>8.2f} {result['peak_rss_mb']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Long-document NER cost: time per 10k characters on CPU.
+
+Compares truncation (old behaviour, entities past 512 chars are lost), sliding
+windows run one at a time, and sliding windows run as one batch.
+
+    PYTHONPATH=. python benchmarks/ner_benchmark.py --chars 50000 --repeat 3
+"""
+import argparse
+import statistics
+import time
+
+from faker import Faker
+
+from app.core.config import settings
+from app.services.ner_service import NERService, merge_window_entities
+
+
+def make_document(chars: int, seed: int = 42) -> str:
+    """Contract-like text with plenty of people, companies and places"""
+    fake = Faker()
+    Faker.seed(seed)
+    parts = []
+    while sum(len(part) for part in parts) < chars:
+        parts.append(
+            f"{fake.name()} of {fake.company()} in {fake.city()} agrees to pay "
+            f"{fake.pricetag()} to {fake.name()} by {fake.date()}. {fake.paragraph()}"
+        )
+    return " ".join(parts)[:chars]
+
+
+def run_windows_sequentially(service: NERService, text: str) -> list[dict]:
+    window_entities = []
+    for char_start, char_end in service._windows(text):
+        entities = service.ner_pipeline(text[char_start:char_end])
+        window_entities.append((char_start, service._format_entities(entities)))
+    return merge_window_entities(window_entities)
+
+
+def bench(label: str, fn, text: str, repeat: int):
+    fn(text)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        entities = fn(text)
+        timings.append(time.perf_counter() - start)
+
+    per_10k = statistics.median(timings) / len(text) * 10_000
+    print(f"{label:>20}: {per_10k:.3f}s per 10k chars, {len(entities)} entities")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--chars", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    service = NERService(mode="local")
+    text = make_document(args.chars)
+    print(f"document: {len(text)} chars, {len(service._windows(text))} windows")
+
+    def truncated(text):
+        settings.NER_SLIDING_WINDOW = False
+        try:
+            return service.extract_entities_batch([text])[0]
+        finally:
+            settings.NER_SLIDING_WINDOW = True
+
+    def sequential(text):
+        return run_windows_sequentially(service, text)
+
+    def batched(text):
+        return service.extract_entities_batch([text])[0]
+
+    bench("truncate 512 chars", truncated, text, args.repeat)
+    bench("windows, one by one", sequential, text, args.repeat)
+    bench("windows, batched", batched, text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+LLM call concurrency from one worker process, against a local mock Azure
+OpenAI server (benchmarks/mock_azure_server.py) with fixed latency.
+
+Compares the shared AsyncAzureOpenAI client with the previous approach: a new
+sync AzureOpenAI client per document, each call run in a thread.
+
+    PYTHONPATH=. python benchmarks/openai_benchmark.py --documents 256 --latency-ms 200
+"""
+import argparse
+import asyncio
+import time
+
+from openai import AzureOpenAI
+
+from app.core.config import settings
+from benchmarks.mock_azure_server import MockAzure, start
+
+
+def _fields(index: int) -> dict:
+    return {
+        "VendorName": {"value": f"Vendor {index}", "confidence": 0.9},
+        "InvoiceTotal": {"value": str(index)}
+    }
+
+
+async def summarize_shared_client(index: int) -> str:
+    from app.services.openai_service import OpenAIService
+    return await OpenAIService().generate_summary(_fields(index), "invoice")
+
+
+async def summarize_sync_client(index: int) -> str:
+    def call():
+        client = AzureOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION
+        )
+        response = client.chat.completions.create(
+            model=settings.AZURE_OPENAI_DEPLOYMENT_CHAT,
+            messages=[{"role": "user", "content": f"Summarize {_fields(index)}"}],
+            max_tokens=150
+        )
+        return response.choices[0].message.content
+    return await asyncio.to_thread(call)
+
+
+async def run(summarize, mock: MockAzure, documents: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    mock.max_in_flight = 0
+
+    async def one(index):
+        async with semaphore:
+            return await summarize(index)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(documents)))
+    wall = time.perf_counter() - start_time
+    return {"docs_per_s": documents / wall, "max_in_flight": mock.max_in_flight}
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--documents", type=int, default=256)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    mock = MockAzure(args.latency_ms / 1000)
+    runner, endpoint = await start(mock)
+
+    settings.AZURE_OPENAI_ENDPOINT = endpoint
+    settings.AZURE_OPENAI_API_KEY = "mock"
+    settings.LLM_CACHE_ENABLED = False
+
+    from app.services.openai_service import close_openai_client
+
+    print(f"{args.documents} summaries, {args.latency_ms} ms per call")
+    print(f"{'client':>22} {'concurrency':>12} {'docs/s':>8} {'in flight':>10}")
+    try:
+        for label, summarize in (("shared async client", summarize_shared_client),
+                                 ("sync client per doc", summarize_sync_client)):
+            for concurrency in args.concurrency:
+                result = await run(summarize, mock, args.documents, concurrency)
+                print(
+                    f"{label:>22} {concurrency:>12} "
+                    f"{result['docs_per_s']:>8.1f} {result['max_in_flight']:>10}"
+                )
+    finally:
+        await close_openai_client()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
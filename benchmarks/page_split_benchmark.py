@@ -0,0 +1,79 @@
+"""
+Time-to-result of one long PDF analyzed whole vs. as concurrent page ranges,
+against a local mock analyze/poll server (benchmarks/mock_azure_server.py)
+whose analysis latency grows with the number of pages.
+
+    PYTHONPATH=. python benchmarks/page_split_benchmark.py --pages 300 --ms-per-page 20
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from benchmarks.mock_azure_server import MockAzure, start
+
+
+async def time_to_result(pages: int, threshold: int) -> tuple[float, dict]:
+    from app.services.document_intelligence import DocumentIntelligenceService
+
+    class Service(DocumentIntelligenceService):
+        async def count_pages(self, blob_uri):
+            # The mock has no blob to download
+            return pages
+
+    settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGE_THRESHOLD = threshold
+    service = Service()
+    service.cache = None
+
+    start_time = time.perf_counter()
+    result = await service.analyze_document(
+        "https://blob/statement.pdf", content_type="application/pdf"
+    )
+    return time.perf_counter() - start_time, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--ms-per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=500, help="Fixed latency per analysis")
+    parser.add_argument("--polling-interval", type=float, default=0.25)
+    args = parser.parse_args()
+
+    mock = MockAzure(
+        args.latency_ms / 1000,
+        seconds_per_page=args.ms_per_page / 1000,
+        document_pages=args.pages
+    )
+    runner, endpoint = await start(mock)
+
+    settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT = endpoint
+    settings.AZURE_DOCUMENT_INTELLIGENCE_KEY = "mock"
+    settings.AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL_SECONDS = args.polling_interval
+    settings.RATE_LIMIT_ENABLED = False
+    settings.OCR_TWO_PASS_ENABLED = False
+
+    from app.services.document_intelligence import close_document_analysis_client
+
+    per_range = settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGES_PER_RANGE
+    max_in_flight = settings.AZURE_DOCUMENT_INTELLIGENCE_SPLIT_MAX_CONCURRENCY
+    print(
+        f"{args.pages} pages, {args.latency_ms} ms + {args.ms_per_page} ms/page per analysis, "
+        f"{per_range} pages per range, up to {max_in_flight} in flight"
+    )
+    try:
+        whole, _ = await time_to_result(args.pages, threshold=0)
+        split, result = await time_to_result(args.pages, threshold=1)
+    finally:
+        await close_document_analysis_client()
+        await runner.cleanup()
+
+    print(f"{'whole document':>16}: {whole:6.2f}s")
+    ranges = len(result['content'].splitlines())
+    print(f"{'page ranges':>16}: {split:6.2f}s ({whole / split:.1f}x, {ranges} ranges)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Compare multipart upload vs streamed block upload against a running API.
+
+Start the stack with Azurite first (make dev-up, make api), then:
+
+    python benchmarks/upload_benchmark.py --size-mb 8 --requests 20 --concurrency 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+async def run_multipart(client: httpx.AsyncClient, payload: bytes, tenant_id: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/documents/upload",
+        files={"file": ("bench.pdf", payload, "application/pdf")},
+        data={"tenant_id": tenant_id}
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run_stream(client: httpx.AsyncClient, payload: bytes, tenant_id: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/documents/upload/stream",
+        params={"filename": "bench.pdf", "tenant_id": tenant_id},
+        content=payload,
+        headers={"Content-Type": "application/pdf"}
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def bench(
+    mode,
+    base_url: str,
+    payload: bytes,
+    requests: int,
+    concurrency: int,
+    tenant_id: str
+):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def one():
+            async with semaphore:
+                return await mode(client, payload, tenant_id)
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[one() for _ in range(requests)])
+        wall = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    return {
+        "wall_s": round(wall, 3),
+        "p50_s": round(statistics.median(latencies), 3),
+        "p95_s": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "mb_per_s": round(len(payload) * requests / (1024 * 1024) / wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--tenant-id", default="bench")
+    args = parser.parse_args()
+
+    # Random bytes behind a PDF signature, which uploads are checked for
+    payload = b"%PDF" + os.urandom(int(args.size_mb * 1024 * 1024) - 4)
+
+    for name, mode in (("multipart", run_multipart), ("stream", run_stream)):
+        result = asyncio.run(bench(
+            mode, args.base_url, payload, args.requests, args.concurrency, args.tenant_id
+        ))
+        print(f"{name:>10}: {result}")
+
+
+if __name__ == "__main__":
+    main()
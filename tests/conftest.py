@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    """
+    Fresh database per test. File-backed rather than in-memory so that, like
+    the real pool, sessions used from the pipeline's threads get their own
+    connections instead of sharing one.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from app.core.config import settings
+from app.models.database import Document, DocumentStatus, DocumentType
+from app.services.classifier_service import LocalClassifier
+
+INVOICE = {
+    "VendorName": {"value": "Contoso Ltd", "confidence": 0.98},
+    "InvoiceId": {"value": "INV-100", "confidence": 0.97},
+    "InvoiceDate": {"value": "2024-10-01", "confidence": 0.95},
+    "DueDate": {"value": "2024-10-31", "confidence": 0.95},
+    "InvoiceTotal": {"value": "1,200.00", "confidence": 0.96},
+    "AmountDue": {"value": "1,200.00", "confidence": 0.96},
+}
+RECEIPT = {
+    "MerchantName": {"value": "Coffee Shop", "confidence": 0.9},
+    "TransactionDate": {"value": "2024-10-01", "confidence": 0.9},
+    "Total": {"value": "4.50", "confidence": 0.9},
+    "Tip": {"value": "0.50", "confidence": 0.9},
+}
+AMBIGUOUS = {"Date": {"value": "2024-10-01"}, "Name": {"value": "Maria Garcia"}}
+
+
+def test_field_signatures_decide_the_type():
+    classifier = LocalClassifier()
+
+    assert classifier.classify(INVOICE)[0] == "invoice"
+    assert classifier.classify(INVOICE)[1] > 0.85
+    assert classifier.classify(RECEIPT)[0] == "receipt"
+    assert classifier.classify(AMBIGUOUS) == ("other", 0.0)
+
+
+def test_ocr_model_type_is_strong_evidence():
+    classifier = LocalClassifier()
+    total_only = {"Total": {"value": "4.50"}}
+
+    assert classifier.classify(total_only, "receipt")[1] > classifier.classify(total_only)[1]
+
+
+def test_calibration_maps_margins_to_observed_accuracy():
+    classifier = LocalClassifier()
+    sparse_receipt = {"MerchantName": {"value": "Coffee Shop"}, "Total": {"value": "4.50"}}
+    # Sparse receipt-like fields turned out to be invoices half the time
+    classifier.calibrate(
+        [(sparse_receipt, None, "receipt")] * 5
+        + [(sparse_receipt, None, "invoice")] * 5
+        + [(INVOICE, None, "invoice")] * 10
+    )
+
+    assert classifier.classify(sparse_receipt) == ("receipt", 0.5)
+    assert classifier.classify(INVOICE) == ("invoice", 1.0)
+    accuracies = [classifier.calibration[bucket] for bucket in sorted(classifier.calibration)]
+    assert accuracies == sorted(accuracies)
+
+
+def test_history_is_calibrated_with_the_ocr_model_type(db, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_MIN_CALIBRATION_SAMPLES", 1)
+    db.add(Document(
+        tenant_id="demo",
+        filename="receipt.jpg",
+        content_type="image/jpeg",
+        file_size_bytes=4,
+        blob_uri="http://blob/receipt.jpg",
+        status=DocumentStatus.COMPLETED,
+        document_type=DocumentType.RECEIPT,
+        classified_by="llm",
+        ocr_document_type="receipt",
+        extracted_fields=RECEIPT,
+        processed_at=datetime.utcnow()
+    ))
+    db.commit()
+
+    classifier = LocalClassifier()
+    samples = []
+    monkeypatch.setattr(classifier, "calibrate", samples.extend)
+
+    assert classifier.calibrate_from_history(db) == 1
+    assert samples == [(RECEIPT, "receipt", "receipt")]
@@ -0,0 +1,202 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from pypdf import PdfWriter
+
+from app.services import document_intelligence
+from app.services.document_intelligence import (
+    DocumentIntelligenceService, ModelTimings, count_pdf_pages
+)
+from app.services.ocr_cache import OCRCache
+
+
+@pytest.fixture(autouse=True)
+def timings(monkeypatch):
+    timings = ModelTimings(fakeredis.FakeRedis())
+    monkeypatch.setattr(document_intelligence, "_model_timings", timings)
+    monkeypatch.setattr(document_intelligence.settings, "OCR_TWO_PASS_ENABLED", False)
+    return timings
+
+
+def _field(value, confidence):
+    return SimpleNamespace(content=value, value=value, confidence=confidence)
+
+
+class RangeClient:
+    """Later ranges finish first, to check the merge doesn't depend on completion order"""
+
+    def __init__(self):
+        self.pages = []
+
+    async def begin_analyze_document_from_url(self, model_id, document_url, pages=None):
+        self.pages.append(pages)
+        first = int(pages.split("-")[0])
+        fields = {
+            "AccountNumber": _field(f"acct-{first}", 0.9),
+            "ClosingBalance": _field(f"balance-{first}", 0.5 + first / 1000),
+        }
+        result = SimpleNamespace(
+            content=f"pages {pages}", documents=[SimpleNamespace(fields=fields)]
+        )
+
+        async def wait():
+            await asyncio.sleep(0.01 * (10 - first // 50))
+            return result
+        return SimpleNamespace(result=wait)
+
+
+def _service(monkeypatch, page_count):
+    settings = document_intelligence.settings
+    monkeypatch.setattr(settings, "AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGE_THRESHOLD", 100)
+    monkeypatch.setattr(settings, "AZURE_DOCUMENT_INTELLIGENCE_SPLIT_PAGES_PER_RANGE", 50)
+    service = DocumentIntelligenceService()
+    service.client = RangeClient()
+    service.cache = None
+
+    async def count_pages(blob_uri):
+        return page_count
+    service.count_pages = count_pages
+    return service
+
+
+def test_long_pdf_is_analyzed_as_page_ranges_and_merged_in_order(monkeypatch):
+    service = _service(monkeypatch, page_count=120)
+
+    result = asyncio.run(
+        service.analyze_document("http://blob/statement.pdf", content_type="application/pdf")
+    )
+
+    assert sorted(service.client.pages) == ["1-50", "101-120", "51-100"]
+    assert result["content"] == "pages 1-50\npages 51-100\npages 101-120"
+    # Equal confidence: earliest range; otherwise the most confident value
+    assert result["fields"]["AccountNumber"]["value"] == "acct-1"
+    assert result["fields"]["ClosingBalance"]["value"] == "balance-101"
+
+
+def test_short_or_non_pdf_documents_are_analyzed_whole(monkeypatch):
+    service = _service(monkeypatch, page_count=100)
+    assert asyncio.run(service._page_ranges("http://blob/a.pdf", "application/pdf")) == [None]
+    assert asyncio.run(service._page_ranges("http://blob/a.png", "image/png")) == [None]
+
+
+def test_count_pdf_pages():
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=612, height=792)
+    data = io.BytesIO()
+    writer.write(data)
+
+    assert count_pdf_pages(data.getvalue()) == 3
+
+
+def test_scans_are_analyzed_as_their_optimized_derivative(monkeypatch):
+    service = _service(monkeypatch, page_count=None)
+    analyzed = []
+
+    async def optimize_image(blob_uri):
+        return blob_uri + ".optimized.jpg", "image/jpeg"
+
+    async def analyze(model_id, blob_uri, pages=None):
+        analyzed.append(blob_uri)
+        return SimpleNamespace(content="", documents=[])
+
+    service.optimize_image = optimize_image
+    service._analyze = analyze
+    service.cache = OCRCache(fakeredis.FakeRedis())
+
+    result = asyncio.run(service.analyze_document(
+        "http://blob/scan.tiff", content_hash="abc", content_type="image/tiff"
+    ))
+
+    assert analyzed == ["http://blob/scan.tiff.optimized.jpg"]
+    assert result["optimized_blob_uri"] == "http://blob/scan.tiff.optimized.jpg"
+
+    # Another upload of the same content doesn't inherit this blob's derivative
+    copy = asyncio.run(service.analyze_document(
+        "http://blob/copy-of-scan.tiff", content_hash="abc", content_type="image/tiff"
+    ))
+    assert analyzed == ["http://blob/scan.tiff.optimized.jpg"]
+    assert "optimized_blob_uri" not in copy
+
+
+class TwoPassClient:
+    def __init__(self, first_pages: str):
+        self.first_pages = first_pages
+        self.calls = []
+
+    async def begin_analyze_document_from_url(self, model_id, document_url, pages=None):
+        self.calls.append((model_id, pages))
+        fields = {} if model_id == "prebuilt-read" else {"InvoiceTotal": _field("1,200.00", 0.95)}
+        result = SimpleNamespace(
+            content=self.first_pages, documents=[SimpleNamespace(fields=fields)]
+        )
+
+        async def wait():
+            return result
+        return SimpleNamespace(result=wait)
+
+
+def _two_pass_service(monkeypatch, first_pages):
+    monkeypatch.setattr(document_intelligence.settings, "OCR_TWO_PASS_ENABLED", True)
+    service = DocumentIntelligenceService()
+    service.client = TwoPassClient(first_pages)
+    service.cache = OCRCache(fakeredis.FakeRedis())
+    return service
+
+
+def test_first_pages_pick_the_specialized_model(monkeypatch, timings):
+    service = _two_pass_service(monkeypatch, "\n".join([
+        "INVOICE", "Invoice Number: INV-001", "Invoice Date: 2024-10-18",
+        "Bill To", "Contoso Ltd", "Amount Due: 1,200.00"
+    ]))
+
+    def analyze():
+        return asyncio.run(service.analyze_document(
+            "http://blob/a.pdf", content_hash="abc", content_type="application/pdf"
+        ))
+
+    result = analyze()
+
+    assert service.client.calls == [("prebuilt-read", "1-2"), ("prebuilt-invoice", None)]
+    assert result["document_type"] == "invoice"
+    assert [(timing["model_id"], timing["calls"]) for timing in timings.stats()] == [
+        ("prebuilt-invoice", 1), ("prebuilt-read", 1)
+    ]
+
+    # Both passes are cached by content
+    analyze()
+    assert len(service.client.calls) == 2
+
+
+def test_unclear_first_pages_fall_back_to_the_general_model(monkeypatch):
+    service = _two_pass_service(monkeypatch, "Meeting notes\nAgenda for Thursday")
+
+    asyncio.run(service.analyze_document("http://blob/notes.png", content_type="image/png"))
+
+    assert service.client.calls == [("prebuilt-read", None), ("prebuilt-document", None)]
+
+
+def test_shared_client_transport_uses_configured_timeouts(monkeypatch):
+    settings = document_intelligence.settings
+    monkeypatch.setattr(
+        settings, "AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT", "https://docintel.example"
+    )
+    monkeypatch.setattr(settings, "AZURE_DOCUMENT_INTELLIGENCE_KEY", "key")
+    monkeypatch.setattr(document_intelligence, "get_rate_limiter", lambda *args, **kwargs: None)
+    monkeypatch.setattr(document_intelligence, "_document_analysis_client", None)
+
+    async def transport_timeouts():
+        client = document_intelligence.get_document_analysis_client()
+        try:
+            config = client._client._client._pipeline._transport.connection_config
+            return config.timeout, config.read_timeout
+        finally:
+            await document_intelligence.close_document_analysis_client()
+
+    assert asyncio.run(transport_timeouts()) == (
+        settings.AZURE_DOCUMENT_INTELLIGENCE_CONNECTION_TIMEOUT,
+        settings.AZURE_DOCUMENT_INTELLIGENCE_READ_TIMEOUT
+    )
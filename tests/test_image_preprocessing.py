@@ -0,0 +1,68 @@
+import io
+
+from PIL import Image, ImageDraw
+from pypdf import PdfReader
+
+from app.services.image_preprocessing import preprocess_image
+
+
+def _scan(size=(2480, 3508), dpi=300, color=None, orientation=None) -> Image.Image:
+    """A4 page of text, optionally with a colored stamp"""
+    page = Image.new("RGB", size, (248, 246, 238))
+    draw = ImageDraw.Draw(page)
+    for y in range(100, size[1] - 100, 60):
+        line = "Invoice INV-001  Contoso Ltd  Amount due 1,200.00  " * 4
+        draw.text((100, y), line, fill=(30, 30, 30))
+    if color:
+        draw.rectangle((size[0] - 500, size[1] - 500, size[0] - 200, size[1] - 200), fill=color)
+    page.info["dpi"] = (dpi, dpi)
+    return page
+
+
+def _jpeg(page: Image.Image, **kwargs) -> bytes:
+    data = io.BytesIO()
+    page.save(data, "JPEG", quality=95, dpi=page.info["dpi"], **kwargs)
+    return data.getvalue()
+
+
+def test_scan_is_downscaled_to_target_dpi_and_grayscale():
+    original = _jpeg(_scan())
+
+    data, content_type = preprocess_image(original)
+    optimized = Image.open(io.BytesIO(data))
+
+    assert content_type == "image/jpeg"
+    assert len(data) < len(original) / 3
+    assert optimized.size == (1654, 2339)
+    assert optimized.mode == "L"
+
+
+def test_color_is_kept_and_exif_orientation_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotated 90 degrees clockwise
+    original = _jpeg(_scan(size=(3508, 2480), color=(200, 30, 30)), exif=exif)
+
+    optimized = Image.open(io.BytesIO(preprocess_image(original)[0]))
+
+    assert optimized.mode == "RGB"
+    assert optimized.size == (1654, 2339)
+
+
+def test_multi_page_tiff_becomes_one_pdf():
+    pages = [_scan().convert("L") for _ in range(3)]
+    original = io.BytesIO()
+    pages[0].save(original, "TIFF", save_all=True, append_images=pages[1:], dpi=(300, 300))
+
+    data, content_type = preprocess_image(original.getvalue())
+
+    assert content_type == "application/pdf"
+    assert len(PdfReader(io.BytesIO(data)).pages) == 3
+
+
+def test_files_that_would_not_shrink_are_kept():
+    page = Image.new("L", (200, 200), 255)
+    data = io.BytesIO()
+    page.save(data, "PNG", optimize=True)
+
+    assert preprocess_image(data.getvalue()) is None
+    assert preprocess_image(b"%PDF-1.4") is None
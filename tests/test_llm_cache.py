@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.services.llm_cache import LLMCache, cache_key
+from tests.test_openai_service import FIELDS, _service
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_key_ignores_confidence_and_whitespace_but_not_prompt_version():
+    other_scan = {"InvoiceTotal": {"value": " 120.00 ", "confidence": 0.61}}
+
+    assert cache_key("analyze", 1, FIELDS, 0.1) == cache_key("analyze", 1, other_scan, 0.1)
+    assert cache_key("analyze", 1, FIELDS, 0.1) != cache_key("analyze", 2, FIELDS, 0.1)
+    assert cache_key("analyze", 1, FIELDS, 0.1) != cache_key("analyze", 1, FIELDS, 0.3)
+
+
+def test_redis_tier_is_shared_and_lru_is_bounded(redis_client):
+    worker_a = LLMCache(redis_client, max_entries=2)
+    worker_b = LLMCache(redis_client, max_entries=2)
+
+    for key in ("a", "b", "c"):
+        worker_a.set(key, {"summary": key})
+    assert list(worker_a._entries) == ["b", "c"]
+
+    assert worker_b.get("a") == {"summary": "a"}
+    assert worker_b.get("a") == {"summary": "a"}
+    assert worker_b.get("missing") is None
+
+    assert (worker_b.redis_hits, worker_b.memory_hits, worker_b.misses) == (1, 1, 1)
+    assert worker_a.stats() == {"memory_hits": 1, "redis_hits": 1, "misses": 1, "hit_rate": 0.6667}
+
+
+def test_memory_hits_are_counted_without_redis_round_trips(redis_client, monkeypatch):
+    cache = LLMCache(redis_client)
+    cache.set("a", "summary")
+
+    commands = []
+    monkeypatch.setattr(
+        redis_client, "execute_command", lambda *args, **kwargs: commands.append(args)
+    )
+    for _ in range(5):
+        assert cache.get("a") == "summary"
+    assert commands == []
+
+    monkeypatch.undo()
+    assert cache.stats()["memory_hits"] == 5
+
+
+def test_entries_expire(redis_client):
+    cache = LLMCache(redis_client, ttl_seconds=1)
+    cache.set("a", "summary")
+    assert redis_client.ttl("a") == 1
+
+    cache._entries["a"] = (0, "summary")
+    redis_client.delete("a")
+    assert cache.get("a") is None
+
+
+def test_service_reuses_cached_analysis_unless_bypassed(redis_client):
+    response = json.dumps(
+        {"document_type": "invoice", "confidence": 0.95, "summary": "An invoice."}
+    )
+    cache = LLMCache(redis_client)
+
+    service, completions = _service(response)
+    service.cache = cache
+    first = asyncio.run(service.analyze_document(FIELDS))
+
+    service, completions = _service(response)
+    service.cache = cache
+    assert asyncio.run(service.analyze_document(FIELDS)) == first
+    assert completions.requests == []
+
+    service, completions = _service(response)
+    service.cache = cache
+    service.bypass_cache = True
+    asyncio.run(service.analyze_document(FIELDS))
+    assert len(completions.requests) == 1
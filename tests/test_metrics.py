@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import observe_external_call
+from app.main import app
+
+client = TestClient(app)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint_reports_route_latency():
+    labels = {"method": "GET", "route": "/health", "status": "200"}
+    before = sample("docintel_http_request_seconds_count", **labels)
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'route="/health"' in response.text
+    assert sample("docintel_http_request_seconds_count", **labels) == before + 1
+
+
+def test_external_call_outcome():
+    async def failing_call():
+        with observe_external_call("openai", "gpt-4"):
+            raise TimeoutError()
+
+    labels = {"service": "openai", "target": "gpt-4", "outcome": "error"}
+    before = sample("docintel_external_call_seconds_count", **labels)
+    with pytest.raises(TimeoutError):
+        asyncio.run(failing_call())
+
+    assert sample("docintel_external_call_seconds_count", **labels) == before + 1
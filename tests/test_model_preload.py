@@ -0,0 +1,58 @@
+import gc
+
+import pytest
+
+pytest.importorskip("torch")
+
+from app.core.config import settings  # noqa: E402
+from app.services import ner_service  # noqa: E402
+from app.workers import model_preload  # noqa: E402
+
+
+class FakeNERService:
+    backend = "pytorch"
+
+    def __init__(self, loaded=True):
+        self.ner_pipeline = object() if loaded else None
+        self.warm_ups = 0
+
+    def warm_up(self):
+        self.warm_ups += 1
+
+
+@pytest.fixture
+def preload(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WORKER_READY_FILE", str(tmp_path / "ready"))
+    monkeypatch.setattr(settings, "WORKER_PRELOAD_MODELS", True)
+    monkeypatch.setattr(settings, "NER_MODE", "local")
+    monkeypatch.setattr(model_preload, "_preload_failed", False)
+
+    def install(service):
+        monkeypatch.setattr(ner_service, "get_ner_service", lambda: service)
+        return service
+
+    yield install
+    gc.unfreeze()
+
+
+def test_worker_reports_ready_only_after_warm_up(preload, tmp_path):
+    service = preload(FakeNERService())
+
+    model_preload._preload_in_parent()
+    assert service.warm_ups == 1
+    assert not (tmp_path / "ready").exists()
+
+    model_preload._report_ready()
+    assert (tmp_path / "ready").exists()
+
+    model_preload._clear_ready()
+    assert not (tmp_path / "ready").exists()
+
+
+def test_worker_is_not_ready_when_model_fails_to_load(preload, tmp_path):
+    preload(FakeNERService(loaded=False))
+
+    model_preload._preload_in_parent()
+    model_preload._report_ready()
+
+    assert not (tmp_path / "ready").exists()
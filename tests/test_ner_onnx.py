@@ -0,0 +1,118 @@
+import pytest
+
+from app.core.config import settings
+from app.services.ner_service import NER_MODEL_NAME, NERService
+
+TEXTS = [
+    "John Smith of Acme Corporation signed the lease in Seattle on 3 March 2024.",
+    "Invoice 4471 from Contoso Ltd, Redmond, to Fabrikam Inc. Attention: Maria Garcia.",
+    " ".join(["Payment is due to Northwind Traders in London within thirty days."] * 80),
+]
+
+# Tiny stand-in model: each token's label is fixed, so entities are predictable
+LABELS = ["O", "B-ORG", "I-ORG", "B-PER", "I-PER"]
+TOKEN_LABELS = {"acme": "B-ORG", "corp": "I-ORG", "john": "B-PER", "smith": "I-PER"}
+WORDS = "acme corp signed the lease with john smith in seattle".split()
+
+
+@pytest.fixture(scope="module")
+def services(tmp_path_factory):
+    pytest.importorskip("optimum.onnxruntime")
+    from huggingface_hub import try_to_load_from_cache
+
+    if not isinstance(try_to_load_from_cache(NER_MODEL_NAME, "config.json"), str):
+        pytest.skip(f"{NER_MODEL_NAME} is not in the local model cache")
+
+    model_dir = str(tmp_path_factory.mktemp("onnx"))
+    original_dir = settings.NER_ONNX_MODEL_DIR
+    settings.NER_ONNX_MODEL_DIR = model_dir
+    try:
+        pytorch_service = NERService(mode="local", backend="pytorch")
+        onnx_service = NERService(mode="local", backend="onnx")
+    finally:
+        settings.NER_ONNX_MODEL_DIR = original_dir
+    assert pytorch_service.ner_pipeline and onnx_service.ner_pipeline
+    return pytorch_service, onnx_service
+
+
+@pytest.fixture
+def tiny_model_dir(tmp_path):
+    """
+    ONNX token classifier whose logits are a per-token lookup, with a BERT
+    tokenizer and config, written where the ONNX backend loads its model from
+    """
+    pytest.importorskip("optimum.onnxruntime")
+    import numpy as np
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from transformers import BertConfig, BertTokenizerFast
+
+    from app.services.ner_onnx import QUANTIZED_FILE_NAME
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(WORDS))
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab))
+    BertTokenizerFast(
+        vocab_file=str(tmp_path / "vocab.txt"),
+        do_lower_case=False,
+        model_max_length=16
+    ).save_pretrained(tmp_path)
+    BertConfig(
+        vocab_size=len(vocab),
+        max_position_embeddings=16,
+        id2label=dict(enumerate(LABELS)),
+        label2id={label: index for index, label in enumerate(LABELS)}
+    ).save_pretrained(tmp_path)
+
+    label_logits = np.zeros((len(vocab), len(LABELS)), dtype=np.float32)
+    for index, token in enumerate(vocab):
+        label_logits[index, LABELS.index(TOKEN_LABELS.get(token, "O"))] = 10.0
+
+    token_axes = ["batch", "sequence"]
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["label_logits", "input_ids"], ["logits"])],
+        "token_labels",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, token_axes),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, token_axes),
+        ],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, token_axes + [len(LABELS)])],
+        [numpy_helper.from_array(label_logits, "label_logits")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 14)], ir_version=8)
+    onnx.save(model, tmp_path / QUANTIZED_FILE_NAME)
+    return str(tmp_path)
+
+
+def test_onnx_backend_runs_windows_and_formats_entities(tiny_model_dir, monkeypatch):
+    monkeypatch.setattr(settings, "NER_ONNX_MODEL_DIR", tiny_model_dir)
+    monkeypatch.setattr(settings, "NER_WINDOW_OVERLAP_TOKENS", 4)
+    service = NERService(mode="local", backend="onnx")
+    assert service.ner_pipeline
+
+    short_text = "acme corp signed the lease"
+    # Longer than the model's 16 positions, so it is split into windows
+    long_text = " ".join(WORDS * 4)
+
+    short_entities, long_entities = service.extract_entities_batch([short_text, long_text])
+
+    assert short_entities == [
+        {"text": "acme corp", "type": "ORG", "confidence": 1.0, "start": 0, "end": 9}
+    ]
+    assert len(service._windows(long_text)) > 1
+    assert [entity["type"] for entity in long_entities] == ["ORG", "PER"] * 4
+    for entity in long_entities:
+        assert long_text[entity["start"]:entity["end"]] == entity["text"]
+
+
+def test_onnx_backend_matches_pytorch_entities(services):
+    pytorch_service, onnx_service = services
+
+    expected = pytorch_service.extract_entities_batch(TEXTS)
+    actual = onnx_service.extract_entities_batch(TEXTS)
+
+    for expected_entities, actual_entities in zip(expected, actual):
+        assert [(e["type"], e["start"], e["end"], e["text"]) for e in actual_entities] == \
+            [(e["type"], e["start"], e["end"], e["text"]) for e in expected_entities]
+        for expected_entity, actual_entity in zip(expected_entities, actual_entities):
+            assert actual_entity["confidence"] == \
+                pytest.approx(expected_entity["confidence"], abs=0.05)
@@ -0,0 +1,64 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from app.core.config import settings
+from app.workers.ner_server import MicroBatcher
+
+
+def test_concurrent_requests_are_batched_and_routed_back():
+    batch_sizes = []
+
+    def infer(texts):
+        batch_sizes.append(len(texts))
+        return [[{"text": text.upper()}] for text in texts]
+
+    async def run():
+        batcher = MicroBatcher(infer, max_batch_size=4, max_wait_seconds=0.05)
+        loop_task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(*[batcher.submit(f"doc {i}") for i in range(10)])
+        finally:
+            loop_task.cancel()
+
+    results = asyncio.run(run())
+
+    assert results == [[{"text": f"DOC {i}"}] for i in range(10)]
+    assert batch_sizes == [4, 4, 2]
+
+
+def test_batch_failure_is_returned_to_every_request():
+    def infer(texts):
+        raise RuntimeError("model crashed")
+
+    async def run():
+        batcher = MicroBatcher(infer, max_batch_size=4, max_wait_seconds=0.01)
+        loop_task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(
+                *[batcher.submit("text") for _ in range(3)],
+                return_exceptions=True
+            )
+        finally:
+            loop_task.cancel()
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_client_raises_when_server_is_unreachable(tmp_path, monkeypatch):
+    from app.services.ner_service import NERService
+
+    monkeypatch.setattr(settings, "NER_SERVER_SOCKET", str(tmp_path / "missing.sock"))
+    service = NERService(mode="client")
+
+    async def run():
+        try:
+            return await service.extract_entities("Acme Corp invoice for consulting services")
+        finally:
+            await service._session.close()
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(run())
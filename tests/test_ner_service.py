@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+from app.services.ner_service import NERService, sliding_windows, merge_window_entities
+
+
+def _tokenize(text):
+    """Whitespace tokenizer splitting words into 3-char pieces, like subword tokens"""
+    offsets, word_ids = [], []
+    position = 0
+    for word_id, word in enumerate(text.split(" ")):
+        for piece_start in range(0, len(word), 3):
+            offsets.append((position + piece_start, position + min(piece_start + 3, len(word))))
+            word_ids.append(word_id)
+        position += len(word) + 1
+    return offsets, word_ids
+
+
+def test_windows_cover_text_with_overlap_and_respect_word_boundaries():
+    text = " ".join(f"word{i:03d}" for i in range(200))
+    offsets, word_ids = _tokenize(text)
+    word_starts = {0} | {i + 1 for i, char in enumerate(text) if char == " "}
+
+    windows = sliding_windows(offsets, word_ids, max_tokens=50, overlap_tokens=10)
+
+    assert windows[0][0] == 0
+    assert windows[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start < end
+        assert next_start in word_starts
+    for start, end in windows:
+        assert start in word_starts
+        assert len([o for o in offsets if start <= o[0] < end]) <= 50
+
+
+def test_short_text_is_a_single_window():
+    offsets, word_ids = _tokenize("Acme Corp invoice")
+    assert sliding_windows(offsets, word_ids, max_tokens=510, overlap_tokens=64) == [(0, 17)]
+
+
+def test_merge_shifts_offsets_and_keeps_best_overlapping_entity():
+    first_window = [
+        {"text": "Acme", "type": "ORG", "confidence": 0.99, "start": 0, "end": 4},
+        {"text": "Bank", "type": "ORG", "confidence": 0.61, "start": 90, "end": 94},
+    ]
+    # Second window starts at char 80 and sees the full entity
+    second_window = [
+        {"text": "Bank of America", "type": "ORG", "confidence": 0.97, "start": 10, "end": 25},
+        {"text": "Warsaw", "type": "LOC", "confidence": 0.95, "start": 40, "end": 46},
+    ]
+
+    merged = merge_window_entities([(0, first_window), (80, second_window)])
+
+    assert [(e["text"], e["start"], e["end"]) for e in merged] == [
+        ("Acme", 0, 4),
+        ("Bank of America", 90, 105),
+        ("Warsaw", 120, 126),
+    ]
+
+
+def test_client_session_of_a_previous_loop_is_closed():
+    service = NERService(mode="client")
+
+    async def get_session():
+        return service._get_session()
+
+    worker_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=worker_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        old_session = asyncio.run_coroutine_threadsafe(get_session(), worker_loop).result()
+
+        async def use_other_loop():
+            new_session = service._get_session()
+            await service.close()
+            return new_session
+
+        new_session = asyncio.run(use_other_loop())
+
+        deadline = time.monotonic() + 1
+        while not old_session.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert old_session.closed
+        assert new_session is not old_session and new_session.closed
+    finally:
+        worker_loop.call_soon_threadsafe(worker_loop.stop)
+        thread.join()
+        worker_loop.close()
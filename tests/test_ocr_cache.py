@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.services import document_intelligence
+from app.services.document_intelligence import DocumentIntelligenceService, ModelTimings
+from app.services.ocr_cache import OCRCache, ocr_cache_key
+
+
+class FakeAnalysisClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def begin_analyze_document_from_url(self, model_id, document_url):
+        self.calls += 1
+        field = SimpleNamespace(content="Contoso Ltd", value="Contoso Ltd", confidence=0.97)
+        result = SimpleNamespace(documents=[SimpleNamespace(fields={"VendorName": field})])
+
+        async def wait():
+            return result
+        return SimpleNamespace(result=wait)
+
+
+@pytest.fixture(autouse=True)
+def single_pass(monkeypatch):
+    monkeypatch.setattr(document_intelligence.settings, "OCR_TWO_PASS_ENABLED", False)
+    timings = ModelTimings(fakeredis.FakeRedis())
+    monkeypatch.setattr(document_intelligence, "_model_timings", timings)
+
+
+@pytest.fixture
+def cache():
+    return OCRCache(fakeredis.FakeRedis())
+
+
+def _service(cache, fresh=False):
+    service = DocumentIntelligenceService(fresh=fresh)
+    service.client = FakeAnalysisClient()
+    service.cache = cache
+    return service
+
+
+def test_results_are_stored_compressed(cache):
+    result = {"fields": {"Description": {"value": "line item " * 200, "confidence": 0.9}}}
+    key = ocr_cache_key("abc", "prebuilt-document", "2023-07-31")
+
+    cache.set(key, result)
+
+    assert cache.get(key) == result
+    assert len(cache.redis.get(key)) < 200
+    assert cache.get(ocr_cache_key("abc", "prebuilt-invoice", "2023-07-31")) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_same_content_is_analyzed_once_unless_fresh(cache):
+    first = _service(cache)
+    result = asyncio.run(first.analyze_document("http://blob/a.pdf", content_hash="abc"))
+    again = asyncio.run(
+        _service(cache).analyze_document("http://blob/copy-of-a.pdf", content_hash="abc")
+    )
+
+    assert again == result
+    assert result["fields"]["VendorName"]["value"] == "Contoso Ltd"
+    assert first.client.calls == 1
+
+    fresh = _service(cache, fresh=True)
+    asyncio.run(fresh.analyze_document("http://blob/a.pdf", content_hash="abc"))
+    assert fresh.client.calls == 1
+
+    # Without a content hash there is nothing to key on
+    unhashed = _service(cache)
+    asyncio.run(unhashed.analyze_document("http://blob/b.pdf"))
+    assert unhashed.client.calls == 1
+
+
+def test_cached_analysis_is_found_without_the_blob(cache):
+    assert asyncio.run(_service(cache).cached_analysis("abc")) is None
+
+    result = asyncio.run(_service(cache).analyze_document("http://blob/a.pdf", content_hash="abc"))
+    probe = _service(cache)
+
+    assert asyncio.run(probe.cached_analysis("abc")) == result
+    assert probe.client.calls == 0
+    # The probe's miss isn't counted on top of analyze_document's
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
@@ -0,0 +1,64 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.services.openai_service import OpenAIService
+
+FIELDS = {"InvoiceTotal": {"value": "120.00", "confidence": 0.98}}
+
+
+class FakeCompletions:
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.contents.pop(0)))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=40)
+        )
+
+
+def _service(*contents):
+    service = OpenAIService()
+    service.cache = None
+    completions = FakeCompletions(contents)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def test_analysis_is_one_json_mode_call():
+    service, completions = _service(json.dumps({
+        "document_type": "Bank Statement",
+        "confidence": 0.87,
+        "summary": "Monthly statement for a checking account."
+    }))
+
+    result = asyncio.run(service.analyze_document(FIELDS))
+
+    assert result == {
+        "document_type": "bank_statement",
+        "confidence": 0.87,
+        "summary": "Monthly statement for a checking account."
+    }
+    assert len(completions.requests) == 1
+    assert completions.requests[0]["response_format"] == {"type": "json_object"}
+    assert (service.prompt_tokens, service.llm_calls) == (100, 1)
+
+
+def test_invalid_analysis_falls_back_to_separate_calls():
+    service, completions = _service(
+        '{"document_type": "invoice", "confidence": 7}',
+        "invoice",
+        "An invoice for 120.00."
+    )
+
+    result = asyncio.run(service.analyze_document(FIELDS))
+
+    assert result == {
+        "document_type": "invoice",
+        "confidence": 0.9,
+        "summary": "An invoice for 120.00."
+    }
+    assert len(completions.requests) == 3
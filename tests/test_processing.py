@@ -0,0 +1,278 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Document, DocumentStatus, DocumentType
+from app.services.checkpoint_service import CheckpointService
+from app.services import openai_service
+from app.services.classifier_service import LocalClassifier
+from app.workers import process_documents
+
+
+class FakeNERService:
+    async def extract_entities(self, text):
+        return [{"text": "Acme Corp", "type": "ORG", "confidence": 0.99, "start": 0, "end": 9}]
+
+
+class FlakyCompletions:
+    """Chat completions whose first `failures` requests time out, as the real client raises it"""
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.requests = 0
+
+    async def create(self, **kwargs):
+        self.requests += 1
+        if self.requests <= self.failures:
+            request = httpx.Request("POST", "https://openai.example/chat/completions")
+            raise openai.APITimeoutError(request=request)
+
+        if kwargs.get("response_format"):
+            content = json.dumps({
+                "document_type": "invoice",
+                "confidence": 0.92,
+                "summary": "Mock summary for invoice document"
+            })
+        else:
+            content = "Mock summary for invoice document"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=40)
+        )
+
+
+@pytest.fixture
+def pipeline(db, monkeypatch):
+    """Point the pipeline at the test database and count external calls"""
+    monkeypatch.setattr(process_documents, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(process_documents, "get_ner_service", lambda: FakeNERService())
+    monkeypatch.setattr(process_documents, "get_local_classifier", lambda: LocalClassifier())
+
+    completions = FlakyCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(openai_service, "get_openai_client", lambda: client)
+    monkeypatch.setattr(openai_service, "get_llm_cache", lambda: None)
+
+    calls = {"ocr": 0}
+    analyze_document = process_documents.DocumentIntelligenceService.analyze_document
+
+    async def counting_analyze(self, *args, **kwargs):
+        calls["ocr"] += 1
+        return await analyze_document(self, *args, **kwargs)
+
+    monkeypatch.setattr(
+        process_documents.DocumentIntelligenceService, "analyze_document", counting_analyze
+    )
+    return SimpleNamespace(calls=calls, completions=completions)
+
+
+@pytest.fixture
+def document(db):
+    document = Document(
+        tenant_id="demo",
+        filename="invoice.pdf",
+        content_type="application/pdf",
+        file_size_bytes=4,
+        blob_uri="http://blob/invoice.pdf"
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def test_retry_resumes_from_checkpoints(db, pipeline, document):
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(process_documents.process_document(document.id, time.time()))
+
+    # The failed call left no checkpoint behind
+    assert CheckpointService(db).get(document.id, "analyze") is None
+
+    # Retry: OCR is not paid for again, only the failed stage re-runs
+    result = asyncio.run(process_documents.process_document(document.id, time.time()))
+
+    assert result["status"] == "completed"
+    assert pipeline.calls["ocr"] == 1
+    assert pipeline.completions.requests == 2
+
+    db.expire_all()
+    document = db.get(Document, document.id)
+    assert document.status == DocumentStatus.COMPLETED
+    assert document.document_type == DocumentType.INVOICE
+    assert document.entities[0]["text"] == "Acme Corp"
+    assert document.summary == "Mock summary for invoice document"
+    assert set(document.stage_timings) == {"ocr", "ner", "analyze", "persist"}
+    assert document.ocr_document_type == "invoice"
+
+
+def test_failing_stage_cancels_the_others(db, pipeline, document, monkeypatch):
+    class SlowNERService:
+        async def extract_entities(self, text):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(process_documents, "get_ner_service", lambda: SlowNERService())
+    pipeline.completions.failures = 3
+
+    async def process():
+        # The stage's own error, not an ExceptionGroup, so retries can tell what failed
+        with pytest.raises(openai.APITimeoutError):
+            await process_documents.process_document(document.id, time.time())
+        # NER was cancelled before the failure was raised, not left running on the loop
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(process())
+    assert CheckpointService(db).get(document.id, "ner") is None
+
+
+def test_confident_local_classification_skips_llm_classification(
+    db, pipeline, document, monkeypatch
+):
+    monkeypatch.setattr(process_documents.settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.5)
+
+    pipeline.completions.failures = 0
+
+    asyncio.run(process_documents.process_document(document.id, time.time()))
+
+    # Only the summary went to the LLM
+    assert pipeline.completions.requests == 1
+    db.expire_all()
+    document = db.get(Document, document.id)
+    assert document.classified_by == "local"
+    assert document.document_type == DocumentType.INVOICE
+    assert document.summary == "Mock summary for invoice document"
+
+
+def test_digital_documents_skip_cloud_ocr(db, pipeline, document, monkeypatch):
+    async def extract_locally(document):
+        return {
+            "fields": {name: {"value": value, "confidence": 1.0} for name, value in (
+                ("Invoice Number", "INV-001"),
+                ("Vendor Name", "Acme Corp"),
+                ("Amount Due", "120.00")
+            )},
+            "content": "Invoice Number: INV-001",
+            "document_type": "other",
+            "confidence": 1.0,
+            "page_count": 1
+        }
+    monkeypatch.setattr(process_documents, "_extract_locally", extract_locally)
+    monkeypatch.setattr(process_documents.settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.5)
+    pipeline.completions.failures = 0
+
+    asyncio.run(process_documents.process_document(document.id, time.time()))
+
+    assert pipeline.calls["ocr"] == 0
+    db.expire_all()
+    document = db.get(Document, document.id)
+    assert document.status == DocumentStatus.COMPLETED
+    assert document.extracted_by == "local"
+    assert document.extracted_fields["Vendor Name"]["value"] == "Acme Corp"
+
+
+def test_checkpoint_is_recomputed_when_inputs_change(db):
+    checkpoints = CheckpointService(db)
+    computed = []
+
+    async def compute():
+        computed.append(1)
+        return {"entities": []}
+
+    asyncio.run(checkpoints.run("doc-1", "ner", "Acme Corp", compute))
+    asyncio.run(checkpoints.run("doc-1", "ner", "Acme Corp", compute))
+    assert len(computed) == 1
+
+    asyncio.run(checkpoints.run("doc-1", "ner", "Acme Corp 2024-10-18", compute))
+    assert len(computed) == 2
+
+    checkpoints.invalidate("doc-1", ["ner"])
+    assert checkpoints.get("doc-1", "ner") is None
+
+
+class FakeTask:
+    name = "pipeline.analyze"
+    max_retries = 3
+
+    def __init__(self, retries=0, throttled_retries=None):
+        self.request = SimpleNamespace(retries=retries, throttled_retries=throttled_retries)
+        self.retried = None
+
+    def retry(self, **options):
+        self.retried = options
+        return RuntimeError("retry")
+
+
+def _throttled():
+    request = httpx.Request("POST", "https://openai.example/chat/completions")
+    response = httpx.Response(429, request=request)
+    return openai.RateLimitError("throttled", response=response, body=None)
+
+
+def test_throttled_retries_back_off_on_their_own_budget(db, pipeline, document):
+    async def throttled_stage(document_id):
+        raise _throttled()
+
+    # Three throttled retries so far: the failure budget is untouched
+    task = FakeTask(retries=3, throttled_retries=3)
+    with pytest.raises(RuntimeError, match="retry"):
+        process_documents._run_stage(task, throttled_stage, document.id)
+
+    # No Retry-After: the backoff applies instead of an immediate retry
+    assert task.retried["countdown"] == 15 * 2 ** 3
+    assert task.retried["headers"] == {"throttled_retries": 4}
+    db.expire_all()
+    assert db.get(Document, document.id).status != DocumentStatus.FAILED
+
+
+def test_failure_retries_exclude_throttled_ones(db, pipeline, document):
+    async def failing_stage(document_id):
+        raise TimeoutError("stage timed out")
+
+    # Two failures and two throttles so far: one failure retry is left
+    task = FakeTask(retries=4, throttled_retries=2)
+    with pytest.raises(RuntimeError, match="retry"):
+        process_documents._run_stage(task, failing_stage, document.id)
+    assert task.retried["countdown"] == 60 * 2 ** 2
+    assert task.retried["headers"] == {"throttled_retries": 2}
+
+    task = FakeTask(retries=3)
+    with pytest.raises(TimeoutError):
+        process_documents._run_stage(task, failing_stage, document.id)
+    db.expire_all()
+    assert db.get(Document, document.id).status == DocumentStatus.FAILED
+
+
+def test_cached_ocr_skips_local_extraction(db, pipeline, document, monkeypatch):
+    async def cached_analysis(self, content_hash):
+        return {"fields": {}, "content": "", "document_type": "invoice", "confidence": 0.95}
+
+    async def extract_locally(document):
+        raise AssertionError("the blob was read despite a cached analysis")
+
+    monkeypatch.setattr(
+        process_documents.DocumentIntelligenceService, "cached_analysis", cached_analysis
+    )
+    monkeypatch.setattr(process_documents, "_extract_locally", extract_locally)
+
+    output = asyncio.run(process_documents.ocr_stage(document.id))
+
+    assert output["extracted_by"] == "azure"
+    assert pipeline.calls["ocr"] == 0
+
+
+def test_reprocessing_keeps_the_optimized_blob_uri(db, pipeline, document):
+    document.optimized_blob_uri = "http://blob/invoice.pdf.optimized.jpg"
+    db.commit()
+    pipeline.completions.failures = 0
+
+    # The analysis (like a cached one) carries no optimized_blob_uri
+    asyncio.run(process_documents.process_document(document.id, time.time()))
+
+    db.expire_all()
+    document = db.get(Document, document.id)
+    assert document.status == DocumentStatus.COMPLETED
+    assert document.optimized_blob_uri == "http://blob/invoice.pdf.optimized.jpg"
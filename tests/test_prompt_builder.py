@@ -0,0 +1,44 @@
+import json
+
+from app.core.config import settings
+from app.services.prompt_builder import FIELDS_PLACEHOLDER, build_prompt, count_tokens
+
+TEMPLATE = f"Classify this document.\n\nDocument fields:\n{FIELDS_PLACEHOLDER}\n\nType:"
+
+
+def _fields_of(prompt):
+    return json.loads(prompt.split("\n")[3])
+
+
+def test_fields_are_compacted():
+    fields = {
+        "VendorName": {"value": "  Contoso \n Ltd  ", "confidence": 0.98},
+        "Notes": {"value": "x" * 2000, "confidence": 0.5},
+        "Empty": {"value": "", "confidence": 0.0},
+    }
+
+    prompt, tokens = build_prompt(TEMPLATE, fields, task="classify")
+
+    assert "confidence" not in prompt
+    assert _fields_of(prompt) == {
+        "VendorName": "Contoso Ltd",
+        "Notes": "x" * settings.PROMPT_MAX_VALUE_CHARS + "..."
+    }
+    assert tokens == count_tokens(prompt)
+
+
+def test_token_budget_keeps_most_useful_fields(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_TOKEN_BUDGET", 300)
+    fields = {
+        f"Clause{i}": {"value": f"clause text {i} " * 20, "confidence": 0.9}
+        for i in range(100)
+    }
+    fields["InvoiceTotal"] = {"value": "1,200.00", "confidence": 0.4}
+    fields["VendorName"] = {"value": "Contoso Ltd", "confidence": 0.3}
+
+    prompt, tokens = build_prompt(TEMPLATE, fields, task="classify")
+
+    assert tokens <= 300
+    included = _fields_of(prompt)
+    assert list(included)[:2] == ["InvoiceTotal", "VendorName"]
+    assert 2 < len(included) < len(fields)
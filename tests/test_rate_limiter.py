@@ -0,0 +1,127 @@
+import asyncio
+
+import fakeredis
+import httpx
+import pytest
+from azure.core.rest import HttpRequest
+
+from app.services.rate_limiter import (
+    RateLimitedTransport, RateLimiter, retry_after_seconds, throttled_retry_after
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_request_bucket_is_shared_by_workers(redis_client, clock):
+    worker_a = RateLimiter(redis_client, "openai:test", requests_per_minute=60, clock=clock)
+    worker_b = RateLimiter(redis_client, "openai:test", requests_per_minute=60, clock=clock)
+
+    # 10 seconds of burst at 1 request/s, split across workers
+    assert [worker_a.try_acquire() for _ in range(5)] == [0] * 5
+    assert [worker_b.try_acquire() for _ in range(5)] == [0] * 5
+    assert worker_a.try_acquire() == pytest.approx(1.0)
+
+    clock.now += 1
+    assert worker_b.try_acquire() == 0
+
+
+def test_token_bucket_limits_large_prompts(redis_client, clock):
+    limiter = RateLimiter(
+        redis_client, "openai:test", requests_per_minute=600, tokens_per_minute=600, clock=clock
+    )
+
+    assert limiter.try_acquire(tokens=80) == 0
+    # 20 of 100 burst tokens left, refilling at 10/s
+    assert limiter.try_acquire(tokens=80) == pytest.approx(6.0)
+
+
+def test_aimd_on_throttling(redis_client, clock):
+    limiter = RateLimiter(redis_client, "openai:test", requests_per_minute=60, clock=clock)
+
+    assert limiter.report(throttled=True, retry_after=3) == 0.5
+    # Same burst of 429s: no further decrease, but everyone waits out Retry-After
+    assert limiter.report(throttled=True) == 0.5
+    assert limiter.try_acquire() == pytest.approx(3.0)
+
+    clock.now += limiter.adjust_interval_seconds
+    assert limiter.report(throttled=False) == pytest.approx(0.55)
+    assert limiter.report(throttled=False) == pytest.approx(0.55)
+
+
+def test_httpx_hooks_wait_for_retry_after(redis_client, clock):
+    limiter = RateLimiter(
+        redis_client, "openai:test", requests_per_minute=600, tokens_per_minute=60000, clock=clock
+    )
+    responses = iter([
+        httpx.Response(429, headers={"retry-after-ms": "2000"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+
+    async def call():
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: next(responses)),
+            event_hooks=limiter.httpx_event_hooks()
+        ) as client:
+            first = await client.post("http://mock/chat", json={"max_tokens": 100})
+            error = httpx.HTTPStatusError("", request=first.request, response=first)
+            assert throttled_retry_after(error) == 2.0
+            clock.now += 2
+            return await client.post("http://mock/chat", json={"max_tokens": 100})
+
+    assert asyncio.run(call()).status_code == 200
+    assert limiter.report(throttled=False) == 0.5
+
+
+class FakeTransport:
+    def __init__(self, *responses):
+        self.responses = iter(responses)
+        self.sent = []
+
+    async def send(self, request, **kwargs):
+        self.sent.append(request.method)
+        return next(self.responses)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_transport_limits_analyze_requests_only(redis_client, clock):
+    limiter = RateLimiter(redis_client, "docintel:test", requests_per_minute=6, clock=clock)
+    inner = FakeTransport(FakeResponse(429, {"retry-after": "5"}), *[FakeResponse(202)] * 2)
+    transport = RateLimitedTransport(inner, limiter)
+
+    async def call():
+        await transport.send(
+            HttpRequest("POST", "http://mock/documentModels/prebuilt-document:analyze")
+        )
+        # Polling a result isn't held back by the 429
+        await transport.send(HttpRequest("GET", "http://mock/analyzeResults/1"))
+
+    asyncio.run(call())
+    assert inner.sent == ["POST", "GET"]
+    assert limiter.try_acquire() == pytest.approx(5.0)
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds({"retry-after": "7"}) == 7
+    assert retry_after_seconds({"x-ms-retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({}) is None
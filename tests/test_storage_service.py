@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.storage_service import StorageService
+
+
+class FailingBlobClient:
+    """Blob client whose first staged block fails"""
+
+    url = "http://blob/scan.pdf"
+
+    def __init__(self):
+        self.staged = 0
+        self.committed = False
+
+    async def stage_block(self, block_id, data):
+        self.staged += 1
+        if self.staged == 1:
+            raise IOError("storage unavailable")
+        await asyncio.sleep(0.01)
+
+    async def commit_block_list(self, blocks, content_settings):
+        self.committed = True
+
+
+class FakeBlobServiceClient:
+    def __init__(self, blob_client):
+        self.blob_client = blob_client
+
+    def get_blob_client(self, container, blob):
+        return self.blob_client
+
+
+def test_stream_upload_stops_reading_after_a_failed_block(monkeypatch):
+    monkeypatch.setattr(settings, "AZURE_STORAGE_BLOCK_SIZE_MB", 1)
+    monkeypatch.setattr(settings, "AZURE_STORAGE_MAX_CONCURRENCY", 2)
+    blob_client = FailingBlobClient()
+    storage_service = StorageService(FakeBlobServiceClient(blob_client))
+    read = 0
+
+    async def chunks():
+        nonlocal read
+        for _ in range(100):
+            read += 1
+            yield b"x" * 1024 * 1024
+            await asyncio.sleep(0)
+
+    with pytest.raises(IOError):
+        asyncio.run(storage_service.upload_stream(chunks(), "scan.pdf", "application/pdf"))
+
+    # Aborted within a few blocks of the failure instead of reading the whole body
+    assert read < 10
+    assert not blob_client.committed
@@ -0,0 +1,88 @@
+import io
+
+import docx
+from pypdf import PdfWriter
+
+from app.services.text_extraction import extract_locally, is_usable
+
+INVOICE_LINES = [
+    "INVOICE",
+    "Invoice Number: INV-2024-001",
+    "Invoice Date: 2024-10-18",
+    "Vendor Name: Contoso Ltd",
+    "Amount Due: 1,200.00",
+    "Thank you for your business. Payment is due within 30 days of the invoice date.",
+]
+
+
+def _text_pdf(lines: list[str]) -> bytes:
+    """One-page PDF with a text layer"""
+    text = " ".join(f"({line}) '" for line in lines)
+    stream = f"BT /F1 11 Tf 14 TL 72 720 Td {text} ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    pdf += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(pdf)
+
+
+def test_digital_pdf_is_extracted_locally():
+    extraction = extract_locally(_text_pdf(INVOICE_LINES), "invoice.pdf")
+
+    assert is_usable(extraction)
+    assert extraction["page_count"] == 1
+    assert extraction["fields"]["Invoice Number"]["value"] == "INV-2024-001"
+    assert extraction["fields"]["Amount Due"]["value"] == "1,200.00"
+    assert "Thank you for your business" in extraction["content"]
+
+
+def test_scanned_pdf_goes_to_cloud_ocr():
+    writer = PdfWriter()
+    writer.add_blank_page(width=612, height=792)
+    writer.add_blank_page(width=612, height=792)
+    data = io.BytesIO()
+    writer.write(data)
+
+    extraction = extract_locally(data.getvalue(), "scan.pdf")
+
+    assert not is_usable(extraction)
+    assert extraction["page_count"] == 2
+
+
+def test_docx_paragraphs_and_tables():
+    document = docx.Document()
+    document.add_paragraph("Service Agreement")
+    document.add_paragraph("Effective Date: 2024-11-01")
+    table = document.add_table(rows=2, cols=2)
+    rows = [("Parties", "Contoso Ltd and Fabrikam Inc"), ("Term:", "12 months")]
+    for row, (name, value) in zip(table.rows, rows):
+        row.cells[0].text, row.cells[1].text = name, value
+    data = io.BytesIO()
+    document.save(data)
+
+    extraction = extract_locally(data.getvalue(), "agreement.docx")
+
+    assert is_usable(extraction)
+    assert {name: field["value"] for name, field in extraction["fields"].items()} == {
+        "Effective Date": "2024-11-01",
+        "Parties": "Contoso Ltd and Fabrikam Inc",
+        "Term": "12 months",
+    }
+
+
+def test_images_are_not_extracted_locally():
+    assert extract_locally(b"\x89PNG\r\n\x1a\n", "receipt.png") is None
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.core.deps import get_upload_service
 from app.main import app
 
 client = TestClient(app)
@@ -19,5 +20,21 @@ def test_root_endpoint():
     assert "Document Intelligence Platform API" in response.json()["message"]
 
 
+def test_stream_upload_rejects_malformed_content_length():
+    app.dependency_overrides[get_upload_service] = lambda: None
+    try:
+        response = client.post(
+            "/api/documents/upload/stream",
+            params={"filename": "scan.pdf"},
+            content=b"%PDF-1.7",
+            headers={"Content-Length": "12abc"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 400
+    assert "Content-Length" in response.json()["detail"]
+
+
 # TODO: Add more tests for upload, processing, etc.
 # Requires mocking storage and database
@@ -0,0 +1,393 @@
+import asyncio
+import hashlib
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.database import Document, DocumentStatus, DocumentType
+from app.models.schemas import UploadSessionResponse
+from app.services.upload_service import UploadService, FileValidationError, UploadSessionError
+
+
+class FakeStorageService:
+    """In-memory stand-in for StorageService"""
+
+    def __init__(self):
+        self.received = 0
+        self.uploaded = []
+        self.deleted = []
+        self.blobs = {}
+        self.blocks = {}
+
+    async def upload_stream(self, chunks, filename, content_type):
+        async for chunk in chunks:
+            self.received += len(chunk)
+        self.uploaded.append(filename)
+        return f"http://blob/{filename}", self.received
+
+    async def upload_file(self, file, filename, content_type):
+        await asyncio.sleep(0.05)
+        if filename.startswith("broken"):
+            raise IOError("storage unavailable")
+        self.uploaded.append(filename)
+        return f"http://blob/{filename}"
+
+    async def delete_file(self, blob_uri):
+        self.deleted.append(blob_uri)
+
+    def generate_upload_url(self, blob_name):
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
+        return f"http://blob/{blob_name}", f"http://blob/{blob_name}?sig=x", expires_at
+
+    async def stage_block(self, blob_name, index, data):
+        self.blocks[(blob_name, index)] = data
+
+    async def commit_blocks(self, blob_name, block_count, content_type):
+        await asyncio.sleep(0)
+        self.blobs[blob_name] = b"".join(self.blocks[(blob_name, i)] for i in range(block_count))
+        return f"http://blob/{blob_name}"
+
+    async def hash_file(self, blob_uri):
+        content = self.blobs.get(blob_uri) or self.blobs[blob_uri.removeprefix("http://blob/")]
+        return hashlib.sha256(content).hexdigest()
+
+    async def inspect_file(self, blob_uri):
+        await asyncio.sleep(0)
+        content = self.blobs[blob_uri]
+        return len(content), content[:8]
+
+
+async def _chunks(count: int, size: int, header: bytes = b"%PDF"):
+    """count chunks of size bytes, the first starting with header"""
+    for index in range(count):
+        chunk = b"x" * size
+        yield header + chunk[len(header):] if index == 0 else chunk
+
+
+@pytest.fixture
+def service(db):
+    return UploadService(db, FakeStorageService())
+
+
+def test_stream_upload_creates_document(service):
+    document = asyncio.run(service.upload_document_stream(
+        chunks=_chunks(4, 1024),
+        filename="invoice.pdf",
+        content_type="application/pdf",
+        tenant_id="demo"
+    ))
+
+    assert document.file_size_bytes == 4096
+    assert document.blob_uri == "http://blob/invoice.pdf"
+
+
+def test_stream_upload_rejects_oversize_mid_stream(service, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    chunk_size = 256 * 1024
+
+    with pytest.raises(FileValidationError):
+        asyncio.run(service.upload_document_stream(
+            chunks=_chunks(100, chunk_size),
+            filename="scan.pdf",
+            content_type="application/pdf",
+            tenant_id="demo"
+        ))
+
+    # Stopped right after crossing 1MB instead of reading the whole body
+    assert service.storage_service.received == 4 * chunk_size
+    assert service.db.query(Document).count() == 0
+
+
+def test_stream_upload_rejects_wrong_signature_on_first_chunk(service):
+    with pytest.raises(FileValidationError):
+        asyncio.run(service.upload_document_stream(
+            chunks=_chunks(100, 1024, header=b"MZ\x90\x00"),
+            filename="scan.pdf",
+            content_type="application/pdf",
+            tenant_id="demo"
+        ))
+
+    assert service.storage_service.received == 0
+    assert service.db.query(Document).count() == 0
+
+
+def test_stream_upload_rejects_empty_body(service):
+    with pytest.raises(FileValidationError):
+        asyncio.run(service.upload_document_stream(
+            chunks=_chunks(0, 1024),
+            filename="scan.pdf",
+            content_type="application/pdf",
+            tenant_id="demo"
+        ))
+
+    assert service.db.query(Document).count() == 0
+
+
+def test_batch_upload_is_concurrent_and_reports_errors(service):
+    files = [(io.BytesIO(b"data%d" % i), f"doc{i}.pdf", "application/pdf", 5) for i in range(10)]
+    files.append((io.BytesIO(b"broken"), "broken.pdf", "application/pdf", 6))
+    files.append((io.BytesIO(b"data"), "notes.exe", "application/octet-stream", 4))
+
+    start = time.perf_counter()
+    documents, errors = asyncio.run(service.batch_upload_documents(files, tenant_id="demo"))
+    elapsed = time.perf_counter() - start
+
+    assert len(documents) == 10
+    assert {error["filename"] for error in errors} == {"broken.pdf", "notes.exe"}
+    assert all(document.uploaded_at is not None for document in documents)
+    assert service.db.query(Document).count() == 10
+    # Wall time tracks the slowest upload, not the sum of all of them
+    assert elapsed < 0.5
+
+
+PDF = b"%PDF-1.7 invoice"
+
+
+@pytest.fixture
+def processed_document(db):
+    document = Document(
+        tenant_id="demo",
+        filename="original.pdf",
+        content_type="application/pdf",
+        file_size_bytes=4,
+        blob_uri="http://blob/original.pdf",
+        content_hash=hashlib.sha256(PDF).hexdigest(),
+        status=DocumentStatus.COMPLETED,
+        document_type=DocumentType.INVOICE,
+        extracted_fields={"total": {"value": "1.00", "confidence": 0.9}},
+        entities=[],
+        summary="An invoice"
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def test_duplicate_upload_reuses_processed_results(service, processed_document):
+    document = asyncio.run(service.upload_document(
+        file=io.BytesIO(PDF),
+        filename="copy.pdf",
+        content_type="application/pdf",
+        file_size=len(PDF),
+        tenant_id="demo"
+    ))
+
+    assert document.status == DocumentStatus.COMPLETED
+    assert document.duplicate_of == processed_document.id
+    assert document.blob_uri == processed_document.blob_uri
+    assert document.summary == "An invoice"
+    # Hashed while uploading, so the copy's own blob is dropped once it is known
+    assert service.storage_service.deleted == ["http://blob/copy.pdf"]
+
+
+def test_upload_rejects_content_not_matching_extension(service):
+    with pytest.raises(FileValidationError):
+        asyncio.run(service.upload_document(
+            file=io.BytesIO(b"MZ\x90\x00 not a pdf"),
+            filename="invoice.pdf",
+            content_type="application/pdf",
+            file_size=15,
+            tenant_id="demo"
+        ))
+
+    assert service.db.query(Document).count() == 0
+
+
+def test_batch_upload_stores_identical_files_once(service, processed_document):
+    files = [
+        (io.BytesIO(b"%PDF new"), "new.pdf", "application/pdf", 8),
+        (io.BytesIO(b"%PDF new"), "new-copy.pdf", "application/pdf", 8),
+        (io.BytesIO(PDF), "copy.pdf", "application/pdf", len(PDF)),
+        (io.BytesIO(PDF), "copy-again.pdf", "application/pdf", len(PDF)),
+    ]
+
+    documents, errors = asyncio.run(service.batch_upload_documents(files, tenant_id="demo"))
+
+    assert errors == []
+    assert [document.filename for document in documents] == ["new.pdf", "copy.pdf"]
+    assert service.storage_service.uploaded == ["new.pdf"]
+    assert documents[1].duplicate_of == processed_document.id
+
+
+def test_duplicate_is_scoped_to_tenant_and_can_be_forced(service, processed_document):
+    other_tenant = asyncio.run(service.upload_document(
+        file=io.BytesIO(PDF),
+        filename="copy.pdf",
+        content_type="application/pdf",
+        file_size=len(PDF),
+        tenant_id="acme"
+    ))
+    forced = asyncio.run(service.upload_document(
+        file=io.BytesIO(PDF),
+        filename="copy.pdf",
+        content_type="application/pdf",
+        file_size=len(PDF),
+        tenant_id="demo",
+        force_reprocess=True
+    ))
+
+    for document in (other_tenant, forced):
+        assert document.status == DocumentStatus.UPLOADED
+        assert document.duplicate_of is None
+    assert len(service.storage_service.uploaded) == 2
+
+
+@pytest.mark.parametrize("content, expected_status", [
+    (b"%PDF-1.7 scanned statement", DocumentStatus.UPLOADED),
+    (b"MZ\x90\x00 not a pdf", DocumentStatus.FAILED),
+])
+def test_direct_upload_completion_verifies_blob(service, content, expected_status):
+    document, upload_url, _ = service.create_direct_upload(
+        filename="statement.pdf",
+        content_type="application/pdf",
+        file_size=len(content),
+        tenant_id="demo"
+    )
+    assert document.status == DocumentStatus.PENDING
+    assert upload_url.startswith(document.blob_uri)
+
+    service.storage_service.blobs[document.blob_uri] = content
+
+    if expected_status == DocumentStatus.FAILED:
+        with pytest.raises(FileValidationError):
+            asyncio.run(service.complete_direct_upload(document.id))
+        assert service.storage_service.deleted == [document.blob_uri]
+    else:
+        completed, claimed = asyncio.run(service.complete_direct_upload(document.id))
+        assert claimed
+        assert completed.content_hash == hashlib.sha256(content).hexdigest()
+
+    assert service.db.get(Document, document.id).status == expected_status
+
+
+def _direct_upload(service, content):
+    document, _, _ = service.create_direct_upload(
+        filename="statement.pdf",
+        content_type="application/pdf",
+        file_size=len(content),
+        tenant_id="demo"
+    )
+    service.storage_service.blobs[document.blob_uri] = content
+    return document
+
+
+def test_concurrent_direct_upload_completion_claims_once(service):
+    document = _direct_upload(service, b"%PDF-1.7 scanned statement")
+    other = UploadService(sessionmaker(bind=service.db.get_bind())(), service.storage_service)
+
+    async def complete_twice():
+        return await asyncio.gather(
+            service.complete_direct_upload(document.id),
+            other.complete_direct_upload(document.id)
+        )
+
+    results = asyncio.run(complete_twice())
+
+    assert sorted(claimed for _, claimed in results) == [False, True]
+    assert all(completed.status == DocumentStatus.UPLOADED for completed, _ in results)
+
+
+def test_direct_upload_of_processed_file_is_deduplicated(service, processed_document):
+    content = b"%PDF-1.7 scanned statement"
+    processed_document.content_hash = hashlib.sha256(content).hexdigest()
+    service.db.commit()
+    document = _direct_upload(service, content)
+    uploaded_blob = document.blob_uri
+
+    completed, claimed = asyncio.run(service.complete_direct_upload(document.id))
+
+    assert claimed
+    assert completed.status == DocumentStatus.COMPLETED
+    assert completed.duplicate_of == processed_document.id
+    assert completed.blob_uri == processed_document.blob_uri
+    assert service.storage_service.deleted == [uploaded_blob]
+
+
+def test_expired_direct_upload_is_refused(service):
+    document = _direct_upload(service, b"%PDF-1.7 scanned statement")
+    document.upload_expires_at = datetime(2000, 1, 1)
+    service.db.commit()
+
+    with pytest.raises(FileValidationError, match="expired"):
+        asyncio.run(service.complete_direct_upload(document.id))
+    assert service.db.get(Document, document.id).status == DocumentStatus.FAILED
+
+
+def test_resumable_upload_resumes_from_current_offset(service):
+    content = b"%PDF-1.7 " + b"x" * 91
+    session = service.create_upload_session(
+        filename="scan.pdf",
+        content_type="application/pdf",
+        file_size=len(content),
+        tenant_id="demo"
+    )
+
+    asyncio.run(service.upload_chunk(session.id, 0, content[:40]))
+
+    # A retry of the first chunk after a lost response is rejected with the offset to resume from
+    with pytest.raises(UploadSessionError, match="Expected offset 40"):
+        asyncio.run(service.upload_chunk(session.id, 0, content[:40]))
+    with pytest.raises(UploadSessionError, match="incomplete"):
+        asyncio.run(service.finalize_upload_session(session.id))
+
+    offset = UploadSessionResponse.model_validate(service.get_upload_session(session.id)).offset
+    asyncio.run(service.upload_chunk(session.id, offset, content[offset:]))
+
+    document, created = asyncio.run(service.finalize_upload_session(session.id))
+    assert created
+    assert document.status == DocumentStatus.UPLOADED
+    assert document.file_size_bytes == len(content)
+    assert service.storage_service.blobs[session.blob_name] == content
+
+    assert document.content_hash == hashlib.sha256(content).hexdigest()
+
+    # Finalize is idempotent
+    again, created = asyncio.run(service.finalize_upload_session(session.id))
+    assert again.id == document.id
+    assert not created
+
+
+def _uploaded_session(service, content, tenant_id="demo"):
+    session = service.create_upload_session(
+        filename="scan.pdf",
+        content_type="application/pdf",
+        file_size=len(content),
+        tenant_id=tenant_id
+    )
+    asyncio.run(service.upload_chunk(session.id, 0, content))
+    return session
+
+
+def test_concurrent_finalize_creates_one_document(service):
+    session = _uploaded_session(service, b"%PDF-1.7 " + b"x" * 91)
+    other = UploadService(sessionmaker(bind=service.db.get_bind())(), service.storage_service)
+
+    async def finalize_twice():
+        return await asyncio.gather(
+            service.finalize_upload_session(session.id),
+            other.finalize_upload_session(session.id)
+        )
+
+    (first, first_created), (second, second_created) = asyncio.run(finalize_twice())
+
+    assert first.id == second.id
+    assert sorted([first_created, second_created]) == [False, True]
+    assert service.db.query(Document).count() == 1
+
+
+def test_resumable_upload_of_processed_file_is_deduplicated(service, processed_document):
+    content = b"%PDF-1.7 " + b"x" * 91
+    processed_document.content_hash = hashlib.sha256(content).hexdigest()
+    service.db.commit()
+    session = _uploaded_session(service, content)
+
+    document, created = asyncio.run(service.finalize_upload_session(session.id))
+
+    assert created
+    assert document.status == DocumentStatus.COMPLETED
+    assert document.duplicate_of == processed_document.id
+    assert service.storage_service.deleted == [f"http://blob/{session.blob_name}"]